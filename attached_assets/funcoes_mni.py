@@ -357,21 +357,9 @@ def consultar_tipo_documento(tipo_documento):
     :return: Descrição do tipo de documento
     :author: Matheus Costa Barbosa - Analista de Sistemas - TJ/CE
     """
-   # URL do serviço SOAP
-   url = MNI_CONSULTA_URL
-
-   # Criar uma instância do cliente Zeep
-   client = Client(url)
-
-   # Chamar o método do serviço SOAP
-   response = client.service.consultarTodosTiposDocumentoProcessual()
-
-   #retornos = response['return']
-   # Verificar se há apenas um retorno ou vários retornos
-   if isinstance(response, list):
-      for retorno in response:
-         if tipo_documento == retorno.codigo:
-            return retorno.descricao
+   # Tabela carregada uma vez e indexada por código (tabelas_referencia)
+   from tabelas_referencia import tabelas_referencia
+   return tabelas_referencia.nome_tipo_documento(tipo_documento)
 
 def consultar_classe_processual(classe_processual, codigoLocalidade):
    """
@@ -384,24 +372,6 @@ def consultar_classe_processual(classe_processual, codigoLocalidade):
     :author: Matheus Costa Barbosa - Analista de Sistemas - TJ/CE
     """
 
-   # URL do serviço SOAP
-   url = MNI_CONSULTA_URL
-
-   # Construir o objeto de entrada da consulta
-   request_data = {
-      'arg0': {
-         'descricao': '?',
-         'id': str(codigoLocalidade)
-      }
-   }
-   # Criar uma instância do cliente Zeep
-   client = Client(url)
-
-   # Chamar o método do serviço SOAP
-   response = client.service.consultarClassesJudiciais(**request_data)
-
-   # Verificar se há apenas um retorno ou vários retornos
-   if isinstance(response, list):
-      for retorno in response:
-         if int(classe_processual) == int(retorno.codigo):
-            return retorno.descricao
+   # Tabela carregada uma vez por localidade e indexada por código (tabelas_referencia)
+   from tabelas_referencia import tabelas_referencia
+   return tabelas_referencia.nome_classe(classe_processual, codigoLocalidade)
@@ -0,0 +1,202 @@
+"""
+Avisos pendentes (intimações e citações) mantidos localmente por credencial.
+
+- A primeira consulta de uma credencial vai ao MNI (consultarAvisosPendentes);
+  a partir daí a credencial entra no agendador, que repete a consulta a cada
+  AVISOS_INTERVALO segundos em AVISOS_WORKERS threads, e as rotas respondem
+  do estado em memória, sem chamada SOAP.
+- Cada atualização é comparada à anterior: avisos novos recebem a data em que
+  foram detectados e a última mudança (novos e removidos, isto é, com ciência
+  dada) fica disponível na resposta.
+- As credenciais ficam apenas em memória, identificadas por chave_credencial;
+  uma credencial sem consultas há AVISOS_INATIVIDADE segundos deixa de ser
+  atualizada. Credenciais cuja primeira consulta falha não são guardadas.
+- Falhas de atualização mantêm os últimos avisos conhecidos (com o erro
+  informado na resposta) e espaçam as novas tentativas.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from cache_processos import chave_credencial
+from config import AVISOS_INATIVIDADE, AVISOS_INTERVALO, AVISOS_WORKERS
+from controle.exceptions import ExcecaoConsultaMNI
+from funcoes_mni import retorna_avisos_pendentes
+from utils import campo_mni, lista_mni
+
+logger = logging.getLogger(__name__)
+
+# Segundos entre buscas por credenciais com atualização vencida
+_VARREDURA = 5
+
+# Limite de espera após falhas: AVISOS_INTERVALO * 2 ** _MAX_EXPOENTE_FALHAS
+_MAX_EXPOENTE_FALHAS = 2
+
+
+def _texto(valor):
+    return '' if valor is None else str(valor)
+
+
+def _agora():
+    return datetime.utcnow().isoformat(timespec='seconds')
+
+
+def extrair_avisos(resposta):
+    """
+    Avisos da resposta do consultarAvisosPendentes, por idAviso.
+    Lança ExcecaoConsultaMNI se a consulta não teve sucesso.
+    """
+    if not campo_mni(resposta, 'sucesso', True):
+        raise ExcecaoConsultaMNI(campo_mni(resposta, 'mensagem') or 'Consulta de avisos sem sucesso')
+
+    avisos = {}
+    for aviso in lista_mni(campo_mni(resposta, 'aviso')):
+        id_aviso = _texto(campo_mni(aviso, 'idAviso'))
+        if not id_aviso:
+            continue
+        processo = campo_mni(aviso, 'processo')
+        destinatario = campo_mni(aviso, 'destinatario')
+        avisos[id_aviso] = {
+            'idAviso': id_aviso,
+            'tipoComunicacao': _texto(campo_mni(aviso, 'tipoComunicacao')),
+            'numeroProcesso': _texto(campo_mni(processo, 'numero')),
+            'classeProcessual': _texto(campo_mni(processo, 'classeProcessual')),
+            'orgaoJulgador': _texto(campo_mni(campo_mni(processo, 'orgaoJulgador'), 'nomeOrgao')),
+            'destinatario': _texto(campo_mni(campo_mni(destinatario, 'pessoa', destinatario), 'nome')),
+            'dataDisponibilizacao': _texto(campo_mni(aviso, 'dataDisponibilizacao')),
+        }
+    return avisos
+
+
+class EstadoAvisos:
+    """Últimos avisos conhecidos de uma credencial"""
+
+    def __init__(self, cpf, senha):
+        self.cpf = cpf
+        self.senha = senha
+        # Uma consulta ao MNI por vez para a mesma credencial
+        self.lock = threading.Lock()
+        self.avisos = {}
+        self.atualizado_em = None
+        self.alterado_em = None
+        self.ultima_mudanca = {'novos': [], 'removidos': []}
+        self.erro = None
+        self.falhas = 0
+        self.proxima = 0.0
+        self.agendado = False
+        self.ultimo_acesso = time.monotonic()
+
+    def resumo(self):
+        avisos = sorted(self.avisos.values(), key=lambda a: a['dataDisponibilizacao'], reverse=True)
+        return {
+            'avisos': avisos,
+            'total': len(avisos),
+            'atualizadoEm': self.atualizado_em,
+            'alteradoEm': self.alterado_em,
+            'ultimaMudanca': self.ultima_mudanca,
+            'erroAtualizacao': self.erro,
+        }
+
+
+class AvisosPendentes:
+    """Estado local dos avisos pendentes por credencial, com atualização agendada"""
+
+    def __init__(self):
+        self._estados = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._parar = threading.Event()
+
+    def iniciar(self, workers=AVISOS_WORKERS):
+        """Inicia o agendador das atualizações (0 workers: só consultas sob demanda)"""
+        if workers <= 0:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='avisos')
+        threading.Thread(target=self._laco, name='avisos-agendador', daemon=True).start()
+
+    def consultar(self, cpf, senha):
+        """
+        Avisos pendentes da credencial a partir do estado local. A primeira
+        consulta de uma credencial (ou sem agendador) é feita no MNI; lança
+        ExcecaoConsultaMNI se ela falhar.
+        """
+        chave = chave_credencial(cpf, senha)
+        with self._lock:
+            estado = self._estados.get(chave)
+            if estado is None:
+                estado = self._estados[chave] = EstadoAvisos(cpf, senha)
+        estado.ultimo_acesso = time.monotonic()
+
+        if estado.atualizado_em is None or (self._executor is None and time.monotonic() >= estado.proxima):
+            self.atualizar(estado)
+            if estado.atualizado_em is None:
+                with self._lock:
+                    self._estados.pop(chave, None)
+                raise ExcecaoConsultaMNI(estado.erro)
+        return estado.resumo()
+
+    def atualizar(self, estado):
+        """Consulta o MNI e aplica a diferença ao estado da credencial"""
+        with estado.lock:
+            if estado.atualizado_em is not None and time.monotonic() < estado.proxima:
+                # Atualizado por outra thread enquanto esta aguardava
+                return
+            try:
+                avisos = extrair_avisos(retorna_avisos_pendentes(estado.cpf, estado.senha))
+            except Exception as e:
+                estado.erro = str(e)
+                estado.falhas += 1
+                espera = AVISOS_INTERVALO * 2 ** min(estado.falhas - 1, _MAX_EXPOENTE_FALHAS)
+                estado.proxima = time.monotonic() + espera
+                logger.warning(f"Falha ao atualizar avisos pendentes: {str(e)}")
+                return
+
+            agora = _agora()
+            novos = [id_aviso for id_aviso in avisos if id_aviso not in estado.avisos]
+            removidos = [id_aviso for id_aviso in estado.avisos if id_aviso not in avisos]
+            for id_aviso, aviso in avisos.items():
+                anterior = estado.avisos.get(id_aviso)
+                aviso['detectadoEm'] = anterior['detectadoEm'] if anterior else agora
+
+            if estado.atualizado_em is None:
+                estado.alterado_em = agora
+            elif novos or removidos:
+                estado.alterado_em = agora
+                estado.ultima_mudanca = {'novos': novos, 'removidos': removidos}
+                logger.info(f"Avisos pendentes: {len(novos)} novo(s), {len(removidos)} removido(s)")
+
+            estado.avisos = avisos
+            estado.atualizado_em = agora
+            estado.erro = None
+            estado.falhas = 0
+            estado.proxima = time.monotonic() + AVISOS_INTERVALO
+
+    def _atualizar_agendado(self, estado):
+        try:
+            self.atualizar(estado)
+        finally:
+            estado.agendado = False
+
+    def _laco(self):
+        while not self._parar.wait(_VARREDURA):
+            try:
+                agora = time.monotonic()
+                with self._lock:
+                    for chave, estado in list(self._estados.items()):
+                        if agora - estado.ultimo_acesso > AVISOS_INATIVIDADE:
+                            del self._estados[chave]
+                    vencidos = [
+                        estado for estado in self._estados.values()
+                        if not estado.agendado and estado.atualizado_em is not None and estado.proxima <= agora
+                    ]
+                for estado in vencidos:
+                    estado.agendado = True
+                    self._executor.submit(self._atualizar_agendado, estado)
+            except Exception:
+                logger.exception("Erro no agendador de avisos pendentes")
+
+
+# Instância global dos avisos pendentes
+avisos_pendentes = AvisosPendentes()
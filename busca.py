@@ -0,0 +1,282 @@
+"""
+Índice local de busca textual (SQLite FTS5) sobre os processos já consultados.
+
+Conteúdo indexado, por processo:
+  - movimento: descrição e complementos de cada movimentação
+  - documento: descrição e tipo de cada documento
+  - texto: texto extraído dos documentos HTML/texto (textos.py)
+
+O índice é alimentado de forma incremental e fora do caminho das
+requisições: um único thread escritor aplica as atualizações, e um processo
+só é reindexado quando o digest do seu snapshot muda. As consultas usam uma
+conexão por thread e funcionam sem acesso ao MNI.
+
+Acesso: movimentos e documentos são indexados por credencial MNI
+(chave_credencial da consulta que trouxe o processo), e cada busca só
+retorna as entradas da credencial informada. O texto extraído de um
+documento é visível a quem tem a entrada desse documento indexada.
+
+Processos e documentos sigilosos (nivelSigilo > 0) não são indexados.
+"""
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import BUSCA_DB
+
+logger = logging.getLogger(__name__)
+
+# Versão do esquema (PRAGMA user_version); índices de versão anterior são recriados
+_VERSAO_ESQUEMA = 2
+
+_REMOVER_ESQUEMA = """
+DROP TRIGGER IF EXISTS entradas_ai;
+DROP TRIGGER IF EXISTS entradas_ad;
+DROP TABLE IF EXISTS entradas_fts;
+DROP TABLE IF EXISTS entradas;
+DROP TABLE IF EXISTS processos_indexados;
+"""
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS entradas (
+    id INTEGER PRIMARY KEY,
+    processo TEXT NOT NULL,
+    credencial TEXT NOT NULL DEFAULT '',
+    tipo TEXT NOT NULL,
+    referencia TEXT NOT NULL,
+    titulo TEXT NOT NULL DEFAULT '',
+    texto TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS ix_entradas_processo ON entradas (processo, tipo, referencia, credencial);
+
+CREATE TABLE IF NOT EXISTS processos_indexados (
+    processo TEXT NOT NULL,
+    credencial TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    indexado_em REAL NOT NULL,
+    PRIMARY KEY (processo, credencial)
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS entradas_fts USING fts5(
+    titulo, texto,
+    content='entradas', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS entradas_ai AFTER INSERT ON entradas BEGIN
+    INSERT INTO entradas_fts (rowid, titulo, texto) VALUES (new.id, new.titulo, new.texto);
+END;
+CREATE TRIGGER IF NOT EXISTS entradas_ad AFTER DELETE ON entradas BEGIN
+    INSERT INTO entradas_fts (entradas_fts, rowid, titulo, texto) VALUES ('delete', old.id, old.titulo, old.texto);
+END;
+"""
+
+_RE_TERMO = re.compile(r'[\w-]+\*?', re.UNICODE)
+
+
+def montar_consulta(texto):
+    """
+    Converte o texto livre do usuário em uma consulta FTS5 segura: cada
+    termo vira uma frase entre aspas (todos obrigatórios) e `*` no fim de um
+    termo faz busca por prefixo. Retorna None se não houver termos.
+    """
+    termos = []
+    for termo in _RE_TERMO.findall(texto or ''):
+        prefixo = termo.endswith('*')
+        termo = termo.rstrip('*').strip('-')
+        if termo:
+            termos.append(f'"{termo}"' + ('*' if prefixo else ''))
+    return ' '.join(termos) or None
+
+
+def _texto_complementos(mov):
+    partes = [mov.get('tipoMovimento', '')]
+    for comp in mov.get('complemento') or []:
+        if isinstance(comp, dict):
+            partes.extend([comp.get('nome', ''), comp.get('descricao', '')])
+        else:
+            partes.append(comp)
+    return ' '.join(str(p) for p in partes if p)
+
+
+def _entradas_processo(numero_processo, processo, credencial):
+    """
+    Linhas (processo, credencial, tipo, referencia, titulo, texto) de
+    movimentos e documentos; nenhuma se o processo for sigiloso.
+    """
+    if int((processo.get('dadosBasicos') or {}).get('nivelSigilo') or 0) > 0:
+        return
+
+    for i, mov in enumerate(processo.get('movimentos', [])):
+        yield (numero_processo, credencial, 'movimento', f"{mov.get('dataHora', '')}#{i}",
+               str(mov.get('descricao') or ''), _texto_complementos(mov))
+
+    for doc in processo.get('documentos', []):
+        vinculados = doc.get('documentosVinculados') or doc.get('documentos_vinculados') or []
+        for item in [doc] + list(vinculados):
+            if not item.get('idDocumento') or int(item.get('nivelSigilo') or 0) > 0:
+                continue
+            yield (numero_processo, credencial, 'documento', str(item['idDocumento']),
+                   str(item.get('descricao') or ''),
+                   str(item.get('tipoDocumentoNome') or item.get('tipoDocumento') or ''))
+
+
+class IndiceBusca:
+    """Índice FTS5 em disco com escrita serializada em segundo plano"""
+
+    def __init__(self, caminho=BUSCA_DB):
+        self.caminho = caminho
+        self._local = threading.local()
+        self._escritor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='indice-busca')
+        self._inicializado = False
+        self._lock = threading.Lock()
+
+    def _conexao(self):
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            pasta = os.path.dirname(self.caminho)
+            if pasta:
+                os.makedirs(pasta, exist_ok=True)
+            conexao = sqlite3.connect(self.caminho, timeout=30)
+            conexao.execute('PRAGMA journal_mode=WAL')
+            conexao.execute('PRAGMA synchronous=NORMAL')
+            with self._lock:
+                if not self._inicializado:
+                    if conexao.execute('PRAGMA user_version').fetchone()[0] < _VERSAO_ESQUEMA:
+                        # Entradas sem credencial não podem ser filtradas: o índice é refeito
+                        conexao.executescript(_REMOVER_ESQUEMA)
+                        conexao.execute(f'PRAGMA user_version = {_VERSAO_ESQUEMA}')
+                    conexao.executescript(_ESQUEMA)
+                    self._inicializado = True
+            self._local.conexao = conexao
+        return conexao
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+
+    def indexar_processo(self, numero_processo, processo, digest, credencial):
+        """
+        (Re)indexa movimentos e documentos do processo para a credencial
+        (chave_credencial) que o consultou, se o digest mudou.
+        """
+        conexao = self._conexao()
+        atual = conexao.execute(
+            'SELECT digest FROM processos_indexados WHERE processo = ? AND credencial = ?',
+            (numero_processo, credencial)
+        ).fetchone()
+        if atual and atual[0] == digest:
+            return False
+
+        with conexao:
+            conexao.execute(
+                "DELETE FROM entradas WHERE processo = ? AND credencial = ? AND tipo IN ('movimento', 'documento')",
+                (numero_processo, credencial)
+            )
+            conexao.executemany(
+                'INSERT INTO entradas (processo, credencial, tipo, referencia, titulo, texto) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                _entradas_processo(numero_processo, processo, credencial)
+            )
+            conexao.execute(
+                'INSERT OR REPLACE INTO processos_indexados (processo, credencial, digest, indexado_em) '
+                'VALUES (?, ?, ?, ?)',
+                (numero_processo, credencial, digest, time.time())
+            )
+        logger.debug(f"Processo {numero_processo} indexado para busca")
+        return True
+
+    def indexar_texto(self, numero_processo, id_documento, texto, titulo=''):
+        """Indexa (ou substitui) o texto extraído de um documento"""
+        conexao = self._conexao()
+        with conexao:
+            conexao.execute(
+                "DELETE FROM entradas WHERE processo = ? AND tipo = 'texto' AND referencia = ?",
+                (numero_processo, str(id_documento))
+            )
+            conexao.execute(
+                "INSERT INTO entradas (processo, tipo, referencia, titulo, texto) VALUES (?, 'texto', ?, ?, ?)",
+                (numero_processo, str(id_documento), titulo, texto)
+            )
+
+    def agendar_processo(self, numero_processo, processo, digest, credencial):
+        """Agenda a indexação do processo no thread escritor"""
+        return self._agendar(self.indexar_processo, numero_processo, processo, digest, credencial)
+
+    def agendar_texto(self, numero_processo, id_documento, texto, titulo=''):
+        """Agenda a indexação do texto de um documento no thread escritor"""
+        return self._agendar(self.indexar_texto, numero_processo, id_documento, texto, titulo)
+
+    def _agendar(self, funcao, *args):
+        futuro = self._escritor.submit(funcao, *args)
+        futuro.add_done_callback(self._registrar_erro)
+        return futuro
+
+    @staticmethod
+    def _registrar_erro(futuro):
+        if futuro.exception():
+            logger.error(f"Erro ao atualizar índice de busca: {futuro.exception()}")
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+
+    def buscar(self, consulta, credencial, limite=20, processo=None, tipo=None):
+        """
+        Retorna os resultados mais relevantes (bm25) para a consulta FTS5
+        entre as entradas visíveis à credencial (chave_credencial), cada um
+        com processo, tipo, referência, título e trecho destacado.
+        """
+        sql = """
+            SELECT e.processo, e.tipo, e.referencia, e.titulo,
+                   snippet(entradas_fts, -1, '[', ']', '…', 16) AS trecho,
+                   bm25(entradas_fts) AS relevancia
+            FROM entradas_fts
+            JOIN entradas e ON e.id = entradas_fts.rowid
+            WHERE entradas_fts MATCH ?
+              AND (e.credencial = ? OR (e.tipo = 'texto' AND EXISTS (
+                  SELECT 1 FROM entradas d
+                  WHERE d.processo = e.processo AND d.tipo = 'documento'
+                    AND d.referencia = e.referencia AND d.credencial = ?
+              )))
+        """
+        parametros = [consulta, credencial, credencial]
+        if processo:
+            sql += ' AND e.processo = ?'
+            parametros.append(processo)
+        if tipo:
+            sql += ' AND e.tipo = ?'
+            parametros.append(tipo)
+        sql += ' ORDER BY relevancia LIMIT ?'
+        parametros.append(limite)
+
+        resultados = []
+        for numero, tipo_entrada, referencia, titulo, trecho, relevancia in self._conexao().execute(sql, parametros):
+            resultado = {
+                'processo': numero,
+                'tipo': tipo_entrada,
+                'titulo': titulo,
+                'trecho': trecho,
+                'relevancia': round(-relevancia, 4),
+            }
+            if tipo_entrada == 'movimento':
+                resultado['dataHora'] = referencia.rsplit('#', 1)[0]
+            else:
+                resultado['idDocumento'] = referencia
+            resultados.append(resultado)
+        return resultados
+
+    def estatisticas(self):
+        conexao = self._conexao()
+        return {
+            'processos': conexao.execute('SELECT COUNT(*) FROM processos_indexados').fetchone()[0],
+            'entradas': conexao.execute('SELECT COUNT(*) FROM entradas').fetchone()[0],
+        }
+
+
+# Instância global do índice de busca
+indice_busca = IndiceBusca()
@@ -0,0 +1,83 @@
+"""
+Cache em memória dos processos já consultados e parseados.
+
+Cada entrada é um SnapshotProcesso imutável: os dados no formato de
+parse_processo_response (ou o recorte usado por /documentos/ids e /capa),
+o digest do conteúdo e os índices pré-computados.
+As rotas devem tratar o snapshot como somente leitura, pois ele é
+compartilhado entre requisições.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from config import CACHE_PROCESSO_TTL, CACHE_PROCESSO_MAX
+from movimentos import IndiceMovimentos
+from paginacao import ListaPaginada
+
+
+class SnapshotProcesso:
+    """Processo parseado, com digest e índices prontos para consulta"""
+
+    def __init__(self, numero, processo, mensagem=''):
+        self.numero = numero
+        self.processo = processo
+        self.mensagem = mensagem
+        self.criado_em = time.time()
+        self.digest = hashlib.sha256(
+            json.dumps(processo, sort_keys=True, default=str).encode('utf-8')
+        ).hexdigest()
+        self.movimentos = IndiceMovimentos(processo.get('movimentos', []))
+        self.documentos = ListaPaginada(processo.get('documentos', []), 'idDocumento')
+
+    def __repr__(self):
+        return f"<SnapshotProcesso {self.numero} {self.digest[:12]}>"
+
+
+def chave_credencial(cpf, senha):
+    """
+    Identificador das credenciais MNI usado nas chaves de cache, para que um
+    processo consultado com uma credencial não seja servido a outra.
+    """
+    return hashlib.sha256(f'{cpf}:{senha}'.encode('utf-8')).hexdigest()[:16]
+
+
+class CacheProcessos:
+    """Cache LRU com expiração por tempo, seguro para uso entre threads"""
+
+    def __init__(self, ttl=CACHE_PROCESSO_TTL, max_itens=CACHE_PROCESSO_MAX):
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        """Retorna o snapshot da chave, ou None se ausente ou expirado"""
+        with self._lock:
+            snapshot = self._itens.get(chave)
+            if snapshot is None:
+                return None
+            if time.time() - snapshot.criado_em > self.ttl:
+                del self._itens[chave]
+                return None
+            self._itens.move_to_end(chave)
+            return snapshot
+
+    def guardar(self, chave, snapshot):
+        """Armazena o snapshot, descartando os menos usados acima do limite"""
+        with self._lock:
+            self._itens[chave] = snapshot
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def invalidar(self, chave):
+        """Remove a chave do cache, se existir"""
+        with self._lock:
+            self._itens.pop(chave, None)
+
+
+# Instância global do cache de processos
+cache_processos = CacheProcessos()
@@ -0,0 +1,171 @@
+"""
+Linha de comando do MNI API.
+
+Comandos:
+  baixar    Baixa todos os documentos de um ou mais processos (retomável)
+  exportar  Exporta capa, movimentos e documentos para JSONL ou Parquet (retomável)
+
+Exemplos:
+  python cli.py baixar 0000000-00.0000.8.17.0001 0000001-00.0000.8.17.0001
+  python cli.py baixar --arquivo processos.txt --destino downloads --workers 8
+  python cli.py exportar --arquivo processos.txt --formato parquet --destino exportacao
+  cat processos.txt | python cli.py exportar --arquivo - --destino exportacao
+
+Em --arquivo, "-" lê os números da entrada padrão.
+
+As credenciais do MNI vêm de --cpf/--senha ou das variáveis de ambiente
+MNI_ID_CONSULTANTE e MNI_SENHA_CONSULTANTE (arquivo .env incluído).
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+
+from dotenv import load_dotenv
+
+# As variáveis do .env precisam estar carregadas antes da leitura de config.py
+load_dotenv()
+
+from config import (DOCUMENTOS_DIR, DOWNLOAD_TENTATIVAS, DOWNLOAD_WORKERS,  # noqa: E402
+                    EXPORTACAO_LOTE, EXPORTACAO_WORKERS)
+
+
+def ler_processos(numeros, arquivo=None):
+    """Junta os números informados na linha de comando e no arquivo (um por linha; "-" é a entrada padrão)"""
+    processos = list(numeros)
+    if arquivo:
+        f = sys.stdin if arquivo == '-' else open(arquivo, encoding='utf-8')
+        try:
+            processos.extend(linha.strip() for linha in f if linha.strip() and not linha.startswith('#'))
+        finally:
+            if f is not sys.stdin:
+                f.close()
+    return processos
+
+
+def imprimir_progresso(resumo):
+    """Linha de progresso reescrita no terminal a cada documento"""
+    sys.stderr.write(
+        f"\r{resumo['percentual']:5.1f}% | {resumo['baixados']} baixados, "
+        f"{resumo['pulados']} pulados, {resumo['falhas']} falhas de {resumo['total']} | "
+        f"{resumo['documentosPorSegundo']} doc/s, {resumo['megabytesPorSegundo']} MB/s"
+    )
+    sys.stderr.flush()
+
+
+def comando_baixar(args):
+    from downloader import BaixadorDocumentos
+
+    processos = ler_processos(args.processos, args.arquivo)
+    if not processos:
+        print('Nenhum processo informado', file=sys.stderr)
+        return 2
+
+    baixador = BaixadorDocumentos(
+        destino=args.destino,
+        cpf=args.cpf or os.getenv('MNI_ID_CONSULTANTE'),
+        senha=args.senha or os.getenv('MNI_SENHA_CONSULTANTE'),
+        workers=args.workers,
+        tentativas=args.tentativas,
+        ao_progredir=None if args.silencioso else imprimir_progresso,
+    )
+    try:
+        resumo = baixador.baixar(processos)
+    except KeyboardInterrupt:
+        # Os documentos já concluídos estão no manifesto; basta executar de novo
+        baixador.cancelado.set()
+        print('\nInterrompido; execute novamente para retomar.', file=sys.stderr)
+        return 130
+
+    if not args.silencioso:
+        sys.stderr.write('\n')
+    print(json.dumps(resumo, ensure_ascii=False, indent=2))
+    return 1 if resumo['falhas'] or resumo['processosComErro'] else 0
+
+
+def imprimir_progresso_exportacao(resumo):
+    """Linha de progresso da exportação reescrita no terminal a cada processo"""
+    sys.stderr.write(
+        f"\r{resumo['percentual']:5.1f}% | {resumo['exportados']} exportados, "
+        f"{resumo['pulados']} pulados, {resumo['erros']} erros de {resumo['total']} | "
+        f"{resumo['processosPorSegundo']} proc/s, {resumo['linhasPorSegundo']} linhas/s"
+    )
+    sys.stderr.flush()
+
+
+def comando_exportar(args):
+    from exportador import ExportadorProcessos
+
+    processos = ler_processos(args.processos, args.arquivo)
+    if not processos:
+        print('Nenhum processo informado', file=sys.stderr)
+        return 2
+
+    try:
+        exportador = ExportadorProcessos(
+            destino=args.destino,
+            formato=args.formato,
+            cpf=args.cpf or os.getenv('MNI_ID_CONSULTANTE'),
+            senha=args.senha or os.getenv('MNI_SENHA_CONSULTANTE'),
+            workers=args.workers,
+            lote=args.lote,
+            ao_progredir=None if args.silencioso else imprimir_progresso_exportacao,
+        )
+    except (RuntimeError, ValueError) as e:
+        print(str(e), file=sys.stderr)
+        return 2
+
+    try:
+        resumo = exportador.exportar(processos)
+    except KeyboardInterrupt:
+        # Os lotes já gravados estão no checkpoint; basta executar de novo
+        exportador.cancelado.set()
+        print('\nInterrompido; execute novamente para retomar.', file=sys.stderr)
+        return 130
+
+    if not args.silencioso:
+        sys.stderr.write('\n')
+    print(json.dumps(resumo, ensure_ascii=False, indent=2))
+    return 1 if resumo['processosComErro'] or resumo['numerosInvalidos'] else 0
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description='Ferramentas de linha de comando do MNI API')
+    parser.add_argument('-v', '--verbose', action='store_true', help='exibe logs detalhados')
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    baixar = subparsers.add_parser('baixar', help='baixa todos os documentos de processos')
+    baixar.add_argument('processos', nargs='*', help='números dos processos')
+    baixar.add_argument('--arquivo', help='arquivo com um número de processo por linha')
+    baixar.add_argument('--destino', default=DOCUMENTOS_DIR, help='pasta do armazém e do manifesto')
+    baixar.add_argument('--workers', type=int, default=DOWNLOAD_WORKERS, help='downloads simultâneos')
+    baixar.add_argument('--tentativas', type=int, default=DOWNLOAD_TENTATIVAS, help='tentativas por documento')
+    baixar.add_argument('--cpf', help='CPF do consultante MNI')
+    baixar.add_argument('--senha', help='senha do consultante MNI')
+    baixar.add_argument('--silencioso', action='store_true', help='não exibe o progresso')
+    baixar.set_defaults(executar=comando_baixar)
+
+    exportar = subparsers.add_parser('exportar', help='exporta processos para JSONL ou Parquet')
+    exportar.add_argument('processos', nargs='*', help='números dos processos (com ou sem pontuação)')
+    exportar.add_argument('--arquivo', help='arquivo com um número de processo por linha ("-" para stdin)')
+    exportar.add_argument('--destino', default='exportacao', help='pasta da exportação e do checkpoint')
+    exportar.add_argument('--formato', choices=('jsonl', 'parquet'), default='jsonl', help='formato de saída')
+    exportar.add_argument('--workers', type=int, default=EXPORTACAO_WORKERS, help='consultas simultâneas ao MNI')
+    exportar.add_argument('--lote', type=int, default=EXPORTACAO_LOTE, help='processos gravados por checkpoint')
+    exportar.add_argument('--cpf', help='CPF do consultante MNI')
+    exportar.add_argument('--senha', help='senha do consultante MNI')
+    exportar.add_argument('--silencioso', action='store_true', help='não exibe o progresso')
+    exportar.set_defaults(executar=comando_exportar)
+
+    return parser
+
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+    return args.executar(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
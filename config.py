@@ -1,3 +1,4 @@
+import json
 import os
 
 # -------------------------------------------------------------------------
@@ -16,6 +17,75 @@ MNI_CONSULTA_URL = os.getenv(
     "https://pje.tjpe.jus.br/1g/ConsultaPJe?wsdl"
 )
 
+# -------------------------------------------------------------------------
+# Roteamento do MNI por tribunal (J.TR do número CNJ). Tribunais sem
+# endpoint conhecido usam MNI_URL / MNI_CONSULTA_URL.
+#   MNI_TIMEOUT: segundos máximos de cada chamada SOAP (teto dos timeouts
+#     adaptativos, ver LATENCIA_*)
+#   MNI_CONEXOES_POR_TRIBUNAL: conexões HTTP mantidas no pool de cada tribunal
+#   MNI_MAX_POR_TRIBUNAL: chamadas SOAP simultâneas por tribunal (por instância)
+#   MNI_TRIBUNAIS: JSON com endpoint e ajustes por tribunal, ex.:
+#     {"8.17": {"url": "...", "url_consulta": "...", "url_2g": "...",
+#               "url_consulta_2g": "...", "timeout": 90,
+#               "max_conexoes": 20, "max_simultaneas": 8}}
+#     Sem url_2g, o 2º grau é derivado da URL do 1º (pje1grau -> pje2grau,
+#     /1g/ -> /2g/, pje1g. -> pje2g.), quando possível, só para tribunais com
+#     URL própria; os não mapeados usam apenas o endpoint padrão (MNI_URL).
+#   MNI_INSTANCIAS_MAX: processos cuja instância (1º/2º grau) fica lembrada
+#   MNI_DESCOBERTA_WORKERS: threads que consultam as instâncias em paralelo
+#     na primeira chamada de cada processo
+# -------------------------------------------------------------------------
+MNI_TIMEOUT = float(os.getenv('MNI_TIMEOUT', 120))
+MNI_CONEXOES_POR_TRIBUNAL = int(os.getenv('MNI_CONEXOES_POR_TRIBUNAL', 10))
+MNI_MAX_POR_TRIBUNAL = int(os.getenv('MNI_MAX_POR_TRIBUNAL', 10))
+MNI_TRIBUNAIS = json.loads(os.getenv('MNI_TRIBUNAIS') or '{}')
+MNI_INSTANCIAS_MAX = int(os.getenv('MNI_INSTANCIAS_MAX', 10000))
+MNI_DESCOBERTA_WORKERS = int(os.getenv('MNI_DESCOBERTA_WORKERS', 16))
+
+# -------------------------------------------------------------------------
+# Timeouts adaptativos do MNI, a partir das latências observadas por
+# endpoint (tribunal/instância) e operação (GET /metricas):
+#   LATENCIA_JANELA / LATENCIA_FATIAS: segundos considerados no histograma,
+#     divididos em fatias que expiram separadamente
+#   LATENCIA_AMOSTRAS_MIN: amostras até o timeout deixar de ser o MNI_TIMEOUT
+#   LATENCIA_PERCENTIL / LATENCIA_FATOR: timeout de leitura = percentil x fator
+#   LATENCIA_TIMEOUT_MIN: piso do timeout de leitura (o teto é MNI_TIMEOUT)
+#   LATENCIA_CONEXAO_MIN / _MAX: limites do timeout de conexão (mediana x fator)
+# -------------------------------------------------------------------------
+LATENCIA_JANELA = float(os.getenv('LATENCIA_JANELA', 1800))
+LATENCIA_FATIAS = int(os.getenv('LATENCIA_FATIAS', 6))
+LATENCIA_AMOSTRAS_MIN = int(os.getenv('LATENCIA_AMOSTRAS_MIN', 20))
+LATENCIA_PERCENTIL = float(os.getenv('LATENCIA_PERCENTIL', 99))
+LATENCIA_FATOR = float(os.getenv('LATENCIA_FATOR', 2))
+LATENCIA_TIMEOUT_MIN = float(os.getenv('LATENCIA_TIMEOUT_MIN', 10))
+LATENCIA_CONEXAO_MIN = float(os.getenv('LATENCIA_CONEXAO_MIN', 3))
+LATENCIA_CONEXAO_MAX = float(os.getenv('LATENCIA_CONEXAO_MAX', 15))
+
+# -------------------------------------------------------------------------
+# Admissão das chamadas ao MNI (por processo da aplicação). Além do limite
+# por tribunal (MNI_MAX_POR_TRIBUNAL):
+#   ADMISSAO_MAX_GLOBAL: chamadas em andamento somando todos os tribunais
+#   ADMISSAO_FILA_MAX: requisições aguardando vaga; as demais recebem 503
+#   ADMISSAO_RESERVA_REQUISICOES: vagas globais que chamadas sem prazo
+#     (jobs, monitoramento, downloads) não ocupam, reservadas às requisições
+#   ADMISSAO_ESPERA: segundos máximos de espera por vaga
+#   ADMISSAO_RETRY_AFTER: segundos informados no Retry-After do 503
+# -------------------------------------------------------------------------
+ADMISSAO_MAX_GLOBAL = int(os.getenv('ADMISSAO_MAX_GLOBAL', 32))
+ADMISSAO_FILA_MAX = int(os.getenv('ADMISSAO_FILA_MAX', 16))
+ADMISSAO_ESPERA = float(os.getenv('ADMISSAO_ESPERA', 2))
+ADMISSAO_RESERVA_REQUISICOES = int(os.getenv('ADMISSAO_RESERVA_REQUISICOES', 8))
+ADMISSAO_RETRY_AFTER = int(os.getenv('ADMISSAO_RETRY_AFTER', 5))
+
+# -------------------------------------------------------------------------
+# Prazo das requisições (cabeçalhos X-Request-Timeout / X-Request-Deadline),
+# que limita os timeouts das chamadas ao MNI feitas durante a requisição:
+#   PRAZO_PADRAO: segundos quando o cliente não informa prazo
+#   PRAZO_MAXIMO: limite para o prazo informado pelo cliente
+# -------------------------------------------------------------------------
+PRAZO_PADRAO = float(os.getenv('PRAZO_PADRAO', 60))
+PRAZO_MAXIMO = float(os.getenv('PRAZO_MAXIMO', 300))
+
 # Credenciais para consulta MNI (CPF e Senha). No Railway configure:
 #   MNI_ID_CONSULTANTE="06293234456"
 #   MNI_SENHA_CONSULTANTE="Simb@280303"
@@ -27,3 +97,144 @@ MNI_SENHA_CONSULTANTE = os.getenv('MNI_SENHA_CONSULTANTE', None)
 # -------------------------------------------------------------------------
 SECRET_KEY = os.getenv('SECRET_KEY', 'dev')  # redefina em produção
 UPLOAD_FOLDER = 'downloads'
+
+# -------------------------------------------------------------------------
+# Cache local de processos consultados (snapshot já parseado):
+#   CACHE_PROCESSO_TTL: segundos até o snapshot expirar
+#   CACHE_PROCESSO_MAX: quantidade máxima de processos mantidos em memória
+# -------------------------------------------------------------------------
+CACHE_PROCESSO_TTL = int(os.getenv('CACHE_PROCESSO_TTL', 300))
+CACHE_PROCESSO_MAX = int(os.getenv('CACHE_PROCESSO_MAX', 256))
+
+# -------------------------------------------------------------------------
+# Compressão de respostas (gzip e, se instalados, brotli/zstd):
+#   COMPRESSAO_MIN_BYTES: respostas menores que isso são enviadas sem compressão
+#   COMPRESSAO_NIVEL: nível de compressão gzip (1-9)
+# -------------------------------------------------------------------------
+COMPRESSAO_MIN_BYTES = int(os.getenv('COMPRESSAO_MIN_BYTES', 1024))
+COMPRESSAO_NIVEL = int(os.getenv('COMPRESSAO_NIVEL', 6))
+
+# -------------------------------------------------------------------------
+# Armazenamento local dos binários de documentos já baixados do MNI.
+# Cada processo tem uma pasta com os arquivos e seus metadados (.json).
+# -------------------------------------------------------------------------
+DOCUMENTOS_DIR = os.getenv('DOCUMENTOS_DIR', 'documentos')
+
+# Limpeza do armazém (0 desativa cada limite):
+#   DOCUMENTOS_TTL: segundos sem uso até o documento ser removido
+#   DOCUMENTOS_MAX_MB: tamanho máximo, incluindo cópias integrais e textos
+#     extraídos; acima dele saem os de uso mais antigo
+#   DOCUMENTOS_LIMPEZA_INTERVALO: segundos mínimos entre duas limpezas
+DOCUMENTOS_TTL = int(os.getenv('DOCUMENTOS_TTL', 30 * 24 * 3600))
+DOCUMENTOS_MAX_MB = int(os.getenv('DOCUMENTOS_MAX_MB', 10240))
+DOCUMENTOS_LIMPEZA_INTERVALO = int(os.getenv('DOCUMENTOS_LIMPEZA_INTERVALO', 600))
+
+# Quantidade de documentos baixados em paralelo (cópia integral, exportações)
+DOWNLOAD_WORKERS = int(os.getenv('DOWNLOAD_WORKERS', 4))
+
+# Documentos mesclados de uma vez na cópia integral (com pikepdf); acima disso
+# a cópia é montada em lotes intermediários, limitando os arquivos abertos
+COPIA_LOTE = int(os.getenv('COPIA_LOTE', 200))
+
+# Downloads cujo conteúdo não confere com o hash informado pelo MNI são
+# descartados e baixados de novo, até esta quantidade de tentativas
+INTEGRIDADE_TENTATIVAS = int(os.getenv('INTEGRIDADE_TENTATIVAS', 3))
+
+# -------------------------------------------------------------------------
+# Download em massa de documentos (cli.py baixar / POST /api/v1/downloads):
+#   DOWNLOAD_MAX_POR_TRIBUNAL: downloads simultâneos em um mesmo tribunal
+#   DOWNLOAD_TENTATIVAS: tentativas por documento antes de registrar falha
+#   DOWNLOAD_ESPERA_BASE: espera (s) antes da 2ª tentativa; dobra a cada nova
+# -------------------------------------------------------------------------
+DOWNLOAD_MAX_POR_TRIBUNAL = int(os.getenv('DOWNLOAD_MAX_POR_TRIBUNAL', 4))
+DOWNLOAD_TENTATIVAS = int(os.getenv('DOWNLOAD_TENTATIVAS', 3))
+DOWNLOAD_ESPERA_BASE = float(os.getenv('DOWNLOAD_ESPERA_BASE', 1.0))
+
+# -------------------------------------------------------------------------
+# Extração de texto de documentos HTML/texto (pool de processos):
+#   EXTRACAO_WORKERS: processos dedicados à extração
+#   TEXTO_ESPERA: segundos que a rota de texto aguarda uma extração em andamento
+# -------------------------------------------------------------------------
+EXTRACAO_WORKERS = int(os.getenv('EXTRACAO_WORKERS', 2))
+TEXTO_ESPERA = float(os.getenv('TEXTO_ESPERA', 10))
+
+# Índice local de busca textual (SQLite FTS5) sobre os processos consultados
+BUSCA_DB = os.getenv('BUSCA_DB', os.path.join(DOCUMENTOS_DIR, '_busca.sqlite3'))
+
+# -------------------------------------------------------------------------
+# Consulta em lote (POST /api/v1/processos/batch):
+#   BATCH_MAX_PROCESSOS: números aceitos por requisição
+#   BATCH_WORKERS: consultas simultâneas ao MNI por requisição
+#   CONSULTA_MAX_POR_TRIBUNAL: consultas simultâneas a um mesmo tribunal
+# -------------------------------------------------------------------------
+BATCH_MAX_PROCESSOS = int(os.getenv('BATCH_MAX_PROCESSOS', 500))
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', 16))
+CONSULTA_MAX_POR_TRIBUNAL = int(os.getenv('CONSULTA_MAX_POR_TRIBUNAL', 4))
+
+# -------------------------------------------------------------------------
+# Fila de jobs (POST /api/v1/jobs) para operações longas:
+#   JOBS_WORKERS: threads executoras por instância (0 desativa a execução)
+#   JOBS_INTERVALO: segundos entre buscas por jobs pendentes
+#   JOBS_HEARTBEAT_EXPIRA: segundos sem sinal de vida até um job em
+#     execução ser considerado abandonado e voltar para a fila
+# -------------------------------------------------------------------------
+JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', 2))
+JOBS_INTERVALO = float(os.getenv('JOBS_INTERVALO', 2))
+JOBS_HEARTBEAT_EXPIRA = int(os.getenv('JOBS_HEARTBEAT_EXPIRA', 300))
+
+# -------------------------------------------------------------------------
+# Exportação em massa (python cli.py exportar):
+#   EXPORTACAO_WORKERS: consultas simultâneas ao MNI
+#   EXPORTACAO_LOTE: processos gravados (e registrados no checkpoint) por vez
+# -------------------------------------------------------------------------
+EXPORTACAO_WORKERS = int(os.getenv('EXPORTACAO_WORKERS', 8))
+EXPORTACAO_LOTE = int(os.getenv('EXPORTACAO_LOTE', 50))
+
+# -------------------------------------------------------------------------
+# Monitoramento de processos (POST /api/v1/monitoramentos):
+#   MONITORAMENTO_WORKERS: verificações simultâneas por instância (0 desativa)
+#   MONITORAMENTO_VARREDURA: segundos entre buscas por verificações vencidas
+#   MONITORAMENTO_INTERVALO_PADRAO / _MINIMO: minutos entre verificações
+#   MONITORAMENTO_COMPLETA_HORAS: horas entre consultas completas; nas
+#     demais, o MNI retorna só o que mudou desde a data de referência
+#   MONITORAMENTO_MARGEM_HORAS: folga subtraída da data de referência
+# -------------------------------------------------------------------------
+MONITORAMENTO_WORKERS = int(os.getenv('MONITORAMENTO_WORKERS', 4))
+MONITORAMENTO_VARREDURA = float(os.getenv('MONITORAMENTO_VARREDURA', 30))
+MONITORAMENTO_INTERVALO_PADRAO = int(os.getenv('MONITORAMENTO_INTERVALO_PADRAO', 60))
+MONITORAMENTO_INTERVALO_MINIMO = int(os.getenv('MONITORAMENTO_INTERVALO_MINIMO', 15))
+MONITORAMENTO_COMPLETA_HORAS = int(os.getenv('MONITORAMENTO_COMPLETA_HORAS', 24))
+MONITORAMENTO_MARGEM_HORAS = int(os.getenv('MONITORAMENTO_MARGEM_HORAS', 24))
+
+# -------------------------------------------------------------------------
+# Stream de eventos do monitoramento (GET /api/v1/monitoramentos/eventos/stream):
+#   EVENTOS_STREAM_ESPERA: segundos máximos entre consultas ao banco (eventos
+#     de outras instâncias) e entre mensagens de keep-alive
+#   EVENTOS_STREAM_DURACAO: segundos até a conexão ser encerrada; o cliente
+#     reconecta com Last-Event-ID
+#   TOKEN_STREAM_VALIDADE: segundos de validade do token de stream (parâmetro
+#     `token`, para o EventSource do navegador, que não envia X-API-KEY)
+# -------------------------------------------------------------------------
+EVENTOS_STREAM_ESPERA = float(os.getenv('EVENTOS_STREAM_ESPERA', 15))
+EVENTOS_STREAM_DURACAO = float(os.getenv('EVENTOS_STREAM_DURACAO', 300))
+TOKEN_STREAM_VALIDADE = int(os.getenv('TOKEN_STREAM_VALIDADE', 900))
+
+# -------------------------------------------------------------------------
+# Avisos pendentes (GET /api/v1/avisos-pendentes), mantidos por credencial:
+#   AVISOS_INTERVALO: segundos entre consultas ao MNI de uma credencial
+#   AVISOS_WORKERS: consultas simultâneas do agendador (0 desativa o
+#     agendador; cada requisição passa a consultar o MNI após o intervalo)
+#   AVISOS_INATIVIDADE: segundos sem requisições até a credencial deixar
+#     de ser atualizada
+# -------------------------------------------------------------------------
+AVISOS_INTERVALO = int(os.getenv('AVISOS_INTERVALO', 300))
+AVISOS_WORKERS = int(os.getenv('AVISOS_WORKERS', 4))
+AVISOS_INATIVIDADE = int(os.getenv('AVISOS_INATIVIDADE', 86400))
+
+# -------------------------------------------------------------------------
+# Tabelas de referência (tipos de documento e classes judiciais do PJe):
+#   TABELAS_TTL: segundos até uma tabela ser recarregada (em segundo plano)
+#   TABELAS_DIR: diretório das tabelas persistidas entre reinícios
+# -------------------------------------------------------------------------
+TABELAS_TTL = int(os.getenv('TABELAS_TTL', 86400))
+TABELAS_DIR = os.getenv('TABELAS_DIR', os.path.join(DOCUMENTOS_DIR, '_tabelas'))
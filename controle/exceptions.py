@@ -1,3 +1,29 @@
 class ExcecaoConsultaMNI(Exception):
     """Exception raised for errors during MNI consultation."""
     pass
+
+
+class ExcecaoPrazoEsgotado(ExcecaoConsultaMNI):
+    """Exception raised when the HTTP request deadline expires before or during an MNI call."""
+    pass
+
+
+class ExcecaoSobrecarga(ExcecaoConsultaMNI):
+    """Exception raised when an MNI call is refused because too many calls are already in flight."""
+
+    def __init__(self, mensagem, retry_after):
+        super().__init__(mensagem)
+        self.retry_after = retry_after
+
+
+class ExcecaoIntegridadeDocumento(Exception):
+    """Exception raised when a downloaded document does not match the hash informed by the MNI."""
+
+    def __init__(self, id_documento, algoritmo, esperado, obtido):
+        super().__init__(
+            f"Documento {id_documento} corrompido: {algoritmo} esperado {esperado}, obtido {obtido}"
+        )
+        self.id_documento = id_documento
+        self.algoritmo = algoritmo
+        self.esperado = esperado
+        self.obtido = obtido
@@ -0,0 +1,183 @@
+"""
+Cópia integral do processo: todos os documentos PDF mesclados em um único
+arquivo, na ordem dos autos.
+
+Pipeline:
+  1. lista ordenada de documentos a partir do processo em cache
+  2. busca concorrente (limitada) dos binários para o armazém local
+  3. mesclagem a partir dos arquivos em disco: com pikepdf, em lotes de
+     COPIA_LOTE documentos (lotes mesclados em arquivos intermediários e estes
+     concatenados), e o conteúdo das páginas é copiado dos arquivos de origem
+     durante a gravação, sem manter todos os PDFs em memória; sem pikepdf,
+     o PyPDF2 carrega todos os PDFs antes de gravar
+  4. o PDF resultante fica em cache, identificado pelos hashes dos documentos,
+     com a lista dos PDFs inválidos (omitidos na mesclagem) em um .json ao lado
+
+Documentos que não são PDF (HTML, imagens, etc.) seguem a política informada:
+  - 'omitir' (padrão): ficam fora da cópia e são listados em `omitidos`
+  - 'erro': a cópia não é gerada (ExcecaoDocumentoNaoPdf)
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+from PyPDF2 import PdfMerger
+
+from config import COPIA_LOTE, DOCUMENTOS_DIR
+from documentos import armazem_documentos, buscar_documentos, listar_documentos_ordenados
+
+try:
+    import pikepdf
+except ImportError:  # pikepdf é opcional; sem ele a mesclagem usa o PyPDF2, toda em memória
+    pikepdf = None
+
+logger = logging.getLogger(__name__)
+
+POLITICAS_NAO_PDF = ('omitir', 'erro')
+
+COPIAS_DIR = os.path.join(DOCUMENTOS_DIR, '_copias')
+
+
+class ExcecaoDocumentoNaoPdf(Exception):
+    """Documento fora do formato PDF com a política 'erro'"""
+
+    def __init__(self, ids):
+        super().__init__(f"Documentos que não são PDF: {', '.join(ids)}")
+        self.ids = ids
+
+
+def _chave_copia(partes):
+    """Identifica a cópia pela sequência de (idDocumento, sha256) que a compõe"""
+    base = '\n'.join(f'{id_documento}:{sha256}' for id_documento, sha256 in partes)
+    return hashlib.sha256(base.encode('utf-8')).hexdigest()
+
+
+def _mesclar_pikepdf(partes, destino, omitidos):
+    """
+    Mescla `partes` [(id_documento, caminho)] em `destino`. As origens ficam
+    abertas até a gravação, que lê o conteúdo das páginas direto delas; por
+    isso no máximo COPIA_LOTE arquivos são mesclados de uma vez.
+    """
+    if len(partes) > COPIA_LOTE:
+        lotes = []
+        try:
+            for inicio in range(0, len(partes), COPIA_LOTE):
+                fd, caminho_lote = tempfile.mkstemp(dir=os.path.dirname(destino), prefix='.lote-')
+                os.close(fd)
+                lotes.append(caminho_lote)
+                _mesclar_pikepdf(partes[inicio:inicio + COPIA_LOTE], caminho_lote, omitidos)
+            _mesclar_pikepdf([(None, caminho) for caminho in lotes], destino, omitidos)
+        finally:
+            for caminho_lote in lotes:
+                os.unlink(caminho_lote)
+        return
+
+    copia = pikepdf.Pdf.new()
+    origens = []
+    try:
+        for id_documento, caminho in partes:
+            try:
+                origem = pikepdf.open(caminho)
+            except pikepdf.PdfError as e:
+                logger.warning(f"PDF inválido no documento {id_documento}: {str(e)}")
+                omitidos.append(id_documento)
+                continue
+            origens.append(origem)
+            copia.pages.extend(origem.pages)
+        copia.save(destino)
+    finally:
+        for origem in origens:
+            origem.close()
+        copia.close()
+
+
+def _mesclar_pypdf2(partes, destino, omitidos):
+    """Mescla `partes` [(id_documento, caminho)] em `destino` com o PyPDF2 (tudo em memória)"""
+    merger = PdfMerger()
+    try:
+        for id_documento, caminho in partes:
+            try:
+                merger.append(caminho, import_outline=False)
+            except Exception as e:
+                logger.warning(f"PDF inválido no documento {id_documento}: {str(e)}")
+                omitidos.append(id_documento)
+        with open(destino, 'wb') as f:
+            merger.write(f)
+    finally:
+        merger.close()
+
+
+def _ler_invalidos(caminho_copia):
+    """IDs omitidos na mesclagem da cópia em cache (PDFs inválidos)"""
+    try:
+        with open(f'{os.path.splitext(caminho_copia)[0]}.json', encoding='utf-8') as f:
+            return json.load(f)['invalidos']
+    except (OSError, ValueError, KeyError):
+        return []
+
+
+def gerar_copia_integral(num_processo, processo, cpf=None, senha=None, politica_nao_pdf='omitir'):
+    """
+    Gera (ou reaproveita do cache) a cópia integral do processo.
+    Parâmetros:
+      - processo: dados do processo no formato de parse_processo_response
+      - politica_nao_pdf: 'omitir' ou 'erro'
+    Retorna: (caminho_pdf, omitidos), em que omitidos é a lista de IDs fora da
+    cópia (não PDF ou com erro de download). caminho_pdf é None se nenhum
+    documento PDF foi encontrado.
+    """
+    documentos = listar_documentos_ordenados(processo)
+    ids = [str(doc['idDocumento']) for doc in documentos]
+    hashes = {str(doc['idDocumento']): doc.get('hash') for doc in documentos}
+
+    pdfs = []
+    omitidos = []
+    nao_pdf = []
+    for id_documento, local, erro in buscar_documentos(num_processo, ids, cpf, senha, hashes=hashes):
+        if erro or not local:
+            omitidos.append(id_documento)
+            continue
+        caminho, metadados = local
+        if metadados['mimetype'] != 'application/pdf':
+            nao_pdf.append(id_documento)
+            continue
+        pdfs.append((id_documento, caminho, metadados['sha256']))
+
+    if nao_pdf and politica_nao_pdf == 'erro':
+        raise ExcecaoDocumentoNaoPdf(nao_pdf)
+    omitidos.extend(nao_pdf)
+
+    if not pdfs:
+        return None, omitidos
+
+    caminho_copia = os.path.join(COPIAS_DIR, f'{_chave_copia((i, h) for i, _, h in pdfs)}.pdf')
+    try:
+        # Marca o uso da cópia para a limpeza do armazém (documentos.CACHES_DERIVADOS)
+        os.utime(caminho_copia)
+    except FileNotFoundError:
+        pass
+    else:
+        logger.debug(f"Cópia integral de {num_processo} servida do cache")
+        return caminho_copia, omitidos + _ler_invalidos(caminho_copia)
+
+    os.makedirs(COPIAS_DIR, exist_ok=True)
+    partes = [(id_documento, caminho) for id_documento, caminho, _ in pdfs]
+    invalidos = []
+    fd, caminho_tmp = tempfile.mkstemp(dir=COPIAS_DIR, prefix='.parcial-')
+    os.close(fd)
+    try:
+        mesclar = _mesclar_pikepdf if pikepdf else _mesclar_pypdf2
+        mesclar(partes, caminho_tmp, invalidos)
+        # Os omitidos na mesclagem ficam ao lado da cópia, antes dela aparecer no cache
+        with open(f'{os.path.splitext(caminho_copia)[0]}.json', 'w', encoding='utf-8') as f:
+            json.dump({'invalidos': invalidos}, f)
+        os.replace(caminho_tmp, caminho_copia)
+    except BaseException:
+        if os.path.exists(caminho_tmp):
+            os.unlink(caminho_tmp)
+        raise
+    armazem_documentos.agendar_limpeza()
+
+    return caminho_copia, omitidos + invalidos
@@ -0,0 +1,37 @@
+"""
+Cifragem das credenciais MNI guardadas no banco para uso em segundo plano
+(fila de jobs, monitoramento de processos). A chave Fernet é derivada da
+SECRET_KEY da aplicação; trocar a SECRET_KEY invalida as credenciais salvas.
+"""
+import base64
+import hashlib
+import json
+import logging
+
+from cryptography.fernet import Fernet, InvalidToken
+
+logger = logging.getLogger(__name__)
+
+
+def _fernet(segredo):
+    return Fernet(base64.urlsafe_b64encode(hashlib.sha256(segredo.encode('utf-8')).digest()))
+
+
+def cifrar_credenciais(segredo, cpf, senha):
+    """Texto cifrado com CPF e senha, ou None se as credenciais estão incompletas"""
+    if not cpf or not senha:
+        return None
+    return _fernet(segredo).encrypt(json.dumps([cpf, senha]).encode('utf-8')).decode('ascii')
+
+
+def decifrar_credenciais(segredo, valor):
+    """(cpf, senha) de um texto cifrado por cifrar_credenciais; (None, None) se inválido"""
+    if not valor:
+        return None, None
+    try:
+        cpf, senha = json.loads(_fernet(segredo).decrypt(valor.encode('ascii')))
+    except (InvalidToken, ValueError):
+        # SECRET_KEY alterada desde a gravação
+        logger.error("Não foi possível decifrar as credenciais MNI salvas")
+        return None, None
+    return cpf, senha
@@ -0,0 +1,526 @@
+"""
+Armazenamento local e entrega dos binários de documentos do MNI.
+
+O binário de cada documento é gravado uma única vez no armazém local
+(DOCUMENTOS_DIR/<processo>/<idDocumento><extensão>), com escrita atômica e
+um arquivo de metadados ao lado. As rotas de download servem o arquivo do
+armazém com send_file condicional, que responde a Range/If-Range e envia
+Content-Length, sem arquivos temporários por requisição.
+
+Integridade: quando o MNI informa o `hash` do documento, o digest é calculado
+durante a própria gravação (sem segunda leitura) e o arquivo só entra no
+armazém se conferir; caso contrário o documento é baixado de novo. O resultado
+fica nos metadados, e documentos já verificados não são relidos.
+
+Acesso: os metadados guardam as credenciais MNI (chave_credencial) para as
+quais o tribunal entregou o documento. Um documento armazenado só é servido a
+essas credenciais; para qualquer outra ele é pedido de novo ao MNI, que decide
+se ela tem acesso (documentos em sigilo, processos de outras partes).
+
+Limpeza: documentos sem uso há mais de DOCUMENTOS_TTL segundos são removidos
+e, se o armazém passar de DOCUMENTOS_MAX_MB, os menos usados saem primeiro.
+Os caches derivados dos documentos (cópias integrais e textos extraídos) entram
+na mesma conta de idade e tamanho.
+"""
+import base64
+import binascii
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import send_file
+
+import core
+from cache_processos import chave_credencial
+from config import (DOCUMENTOS_DIR, DOCUMENTOS_LIMPEZA_INTERVALO, DOCUMENTOS_MAX_MB, DOCUMENTOS_TTL,
+                    DOWNLOAD_WORKERS, INTEGRIDADE_TENTATIVAS, MNI_ID_CONSULTANTE, MNI_SENHA_CONSULTANTE)
+from controle.exceptions import ExcecaoConsultaMNI, ExcecaoIntegridadeDocumento, ExcecaoPrazoEsgotado
+from funcoes_mni import retorna_documento_processo
+
+logger = logging.getLogger(__name__)
+
+# Tamanho dos blocos gravados em disco
+TAMANHO_BLOCO = 1024 * 1024
+
+_RE_NOME_INSEGURO = re.compile(r'[^\w.-]')
+
+# Pastas do armazém com caches derivados dos documentos, limpas junto com eles:
+# copia_integral.COPIAS_DIR e textos.TEXTOS_DIR
+CACHES_DERIVADOS = ('_copias', '_textos')
+
+# Algoritmo do hash informado pelo MNI, identificado pelo tamanho do digest em bytes
+_ALGORITMOS_POR_TAMANHO = {16: 'md5', 20: 'sha1', 32: 'sha256'}
+
+
+def _nome_seguro(valor):
+    """Evita que número do processo ou ID de documento saiam da pasta do armazém"""
+    return _RE_NOME_INSEGURO.sub('_', str(valor)).lstrip('.') or '_'
+
+
+def credencial_documento(cpf=None, senha=None):
+    """Chave da credencial que pede o documento (sem credencial vale a do consultante padrão)"""
+    return chave_credencial(cpf or MNI_ID_CONSULTANTE, senha or MNI_SENHA_CONSULTANTE)
+
+
+def normalizar_hash(valor):
+    """
+    Interpreta o hash informado pelo MNI (hexadecimal ou base64).
+    Retorna (algoritmo, digest em hexadecimal) ou None se ausente/irreconhecível.
+    """
+    if not isinstance(valor, str) or not valor.strip():
+        return None
+    valor = valor.strip()
+    try:
+        digest = bytes.fromhex(valor)
+    except ValueError:
+        try:
+            digest = base64.b64decode(valor, validate=True)
+        except (binascii.Error, ValueError):
+            return None
+    algoritmo = _ALGORITMOS_POR_TAMANHO.get(len(digest))
+    if not algoritmo:
+        return None
+    return algoritmo, digest.hex()
+
+
+def detectar_mimetype(conteudo):
+    """Identifica o mimetype pelos primeiros bytes quando o MNI não o informa"""
+    inicio = bytes(conteudo[:8])
+    if inicio.startswith(b'%PDF'):
+        return 'application/pdf'
+    if inicio.startswith(b'\x89PNG'):
+        return 'image/png'
+    if inicio.startswith(b'\xff\xd8'):
+        return 'image/jpeg'
+    if inicio.startswith(b'PK'):
+        return 'application/zip'
+    if inicio.lstrip().lower().startswith((b'<html', b'<!doct', b'<p', b'<div')):
+        return 'text/html'
+    return 'application/octet-stream'
+
+
+def obter_conteudo_documento(num_processo, id_documento, cpf=None, senha=None):
+    """
+    Busca o binário de um documento no MNI e normaliza os formatos de retorno
+    de retorna_documento_processo.
+    Retorna: (conteudo, mimetype); conteudo vazio se o documento não existir.
+    Lança ExcecaoConsultaMNI em caso de erro do MNI.
+    """
+    resposta = retorna_documento_processo(num_processo, id_documento, cpf, senha)
+
+    mimetype = ''
+    if isinstance(resposta, dict):
+        if 'msg_erro' in resposta:
+            raise ExcecaoConsultaMNI(resposta['msg_erro'])
+        mimetype = resposta.get('mimetype') or ''
+        conteudo = resposta.get('conteudo') or b''
+    elif hasattr(resposta, 'conteudo'):
+        mimetype = getattr(resposta, 'mimetype', '') or ''
+        conteudo = resposta.conteudo or b''
+    else:
+        conteudo = resposta or b''
+
+    if isinstance(conteudo, str):
+        conteudo = conteudo.encode('utf-8')
+    if conteudo and not mimetype:
+        mimetype = detectar_mimetype(conteudo)
+    return conteudo, mimetype
+
+
+class ArmazemDocumentos:
+    """Armazém em disco dos binários de documentos, indexado por processo e ID"""
+
+    def __init__(self, diretorio=DOCUMENTOS_DIR, ttl=DOCUMENTOS_TTL, max_mb=DOCUMENTOS_MAX_MB,
+                 intervalo_limpeza=DOCUMENTOS_LIMPEZA_INTERVALO):
+        self.diretorio = diretorio
+        self.ttl = ttl
+        self.max_bytes = max_mb * 1024 * 1024
+        self.intervalo_limpeza = intervalo_limpeza
+        self._ultima_limpeza = time.monotonic()
+        self._lock_limpeza = threading.Lock()
+
+    def _pasta(self, num_processo):
+        return os.path.join(self.diretorio, _nome_seguro(num_processo))
+
+    def _caminho_metadados(self, num_processo, id_documento):
+        return os.path.join(self._pasta(num_processo), f'{_nome_seguro(id_documento)}.json')
+
+    def caminho_arquivo(self, num_processo, arquivo):
+        """Caminho no armazém de um arquivo de documento do processo"""
+        return os.path.join(self._pasta(num_processo), arquivo)
+
+    def _ler_metadados(self, caminho_metadados):
+        try:
+            with open(caminho_metadados, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def localizar(self, num_processo, id_documento):
+        """Retorna (caminho, metadados) do documento armazenado, ou None"""
+        caminho_metadados = self._caminho_metadados(num_processo, id_documento)
+        metadados = self._ler_metadados(caminho_metadados)
+        if not metadados:
+            return None
+        caminho = self.caminho_arquivo(num_processo, metadados['arquivo'])
+        if not os.path.exists(caminho):
+            return None
+        try:
+            # O horário dos metadados marca o último uso, para a limpeza
+            os.utime(caminho_metadados)
+        except OSError:
+            pass
+        return caminho, metadados
+
+    def remover(self, num_processo, id_documento):
+        """Remove o documento e seus metadados do armazém"""
+        local = self.localizar(num_processo, id_documento)
+        caminhos = [self._caminho_metadados(num_processo, id_documento)]
+        if local:
+            caminhos.append(local[0])
+        for caminho in caminhos:
+            try:
+                os.unlink(caminho)
+            except FileNotFoundError:
+                pass
+
+    def conferir(self, num_processo, id_documento, hash_esperado=None):
+        """
+        Retorna (caminho, metadados) do documento armazenado se ele confere com
+        o hash do MNI, ou None se ausente ou divergente (o arquivo divergente é
+        removido). Documentos já verificados com o mesmo hash não são relidos,
+        e hashes SHA-256 são comparados com o digest calculado na gravação.
+        """
+        local = self.localizar(num_processo, id_documento)
+        esperado = normalizar_hash(hash_esperado)
+        if not local or not esperado:
+            return local
+
+        caminho, metadados = local
+        algoritmo, digest = esperado
+        if metadados.get('verificado') and metadados.get('hashMni') == digest:
+            return local
+
+        if algoritmo == 'sha256':
+            obtido = metadados['sha256']
+        else:
+            calculo = hashlib.new(algoritmo)
+            with open(caminho, 'rb') as f:
+                for bloco in iter(lambda: f.read(TAMANHO_BLOCO), b''):
+                    calculo.update(bloco)
+            obtido = calculo.hexdigest()
+
+        if obtido != digest:
+            logger.warning(f"Documento {id_documento} no armazém não confere com o hash do MNI; descartado")
+            self.remover(num_processo, id_documento)
+            return None
+
+        metadados.update({'algoritmoHash': algoritmo, 'hashMni': digest, 'verificado': True})
+        self._gravar_metadados(num_processo, id_documento, metadados)
+        return local
+
+    def salvar(self, num_processo, id_documento, blocos, mimetype, hash_esperado=None, credencial=None):
+        """
+        Grava o documento a partir de bytes ou de um iterável de blocos,
+        calculando o SHA-256 (e, se informado, o hash do MNI) durante a escrita.
+        A gravação é atômica: o arquivo só aparece no armazém quando completo
+        e, havendo hash do MNI, somente se conferir.
+        `credencial` (credencial_documento) é a credencial com que o MNI
+        entregou o conteúdo; as anteriores são mantidas se o conteúdo não mudou.
+        Retorna: (caminho, metadados)
+        Lança ExcecaoIntegridadeDocumento se o conteúdo não confere com o hash.
+        """
+        if isinstance(blocos, (bytes, bytearray, memoryview)):
+            dados = memoryview(blocos)
+            blocos = (dados[i:i + TAMANHO_BLOCO] for i in range(0, len(dados), TAMANHO_BLOCO))
+
+        pasta = self._pasta(num_processo)
+        os.makedirs(pasta, exist_ok=True)
+        extensao = core.mime_to_extension.get(mimetype, '.bin')
+        arquivo = f'{_nome_seguro(id_documento)}{extensao}'
+        caminho = os.path.join(pasta, arquivo)
+
+        esperado = normalizar_hash(hash_esperado)
+        sha256 = hashlib.sha256()
+        verificacao = hashlib.new(esperado[0]) if esperado and esperado[0] != 'sha256' else None
+        tamanho = 0
+        fd, caminho_tmp = tempfile.mkstemp(dir=pasta, prefix='.parcial-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for bloco in blocos:
+                    sha256.update(bloco)
+                    if verificacao:
+                        verificacao.update(bloco)
+                    tamanho += len(bloco)
+                    f.write(bloco)
+            if esperado:
+                obtido = (verificacao or sha256).hexdigest()
+                if obtido != esperado[1]:
+                    raise ExcecaoIntegridadeDocumento(id_documento, esperado[0], esperado[1], obtido)
+            os.replace(caminho_tmp, caminho)
+        except BaseException:
+            os.unlink(caminho_tmp)
+            raise
+
+        anteriores = self._ler_metadados(self._caminho_metadados(num_processo, id_documento)) or {}
+        credenciais = anteriores.get('credenciais', []) if anteriores.get('sha256') == sha256.hexdigest() else []
+        if credencial and credencial not in credenciais:
+            credenciais = credenciais + [credencial]
+
+        metadados = {
+            'idDocumento': str(id_documento),
+            'arquivo': arquivo,
+            'mimetype': mimetype,
+            'extensao': extensao,
+            'tamanho': tamanho,
+            'sha256': sha256.hexdigest(),
+            'algoritmoHash': esperado[0] if esperado else None,
+            'hashMni': esperado[1] if esperado else None,
+            'verificado': bool(esperado),
+            'credenciais': credenciais,
+        }
+        self._gravar_metadados(num_processo, id_documento, metadados)
+        self.agendar_limpeza()
+        return caminho, metadados
+
+    def _gravar_metadados(self, num_processo, id_documento, metadados):
+        caminho = self._caminho_metadados(num_processo, id_documento)
+        fd, caminho_tmp = tempfile.mkstemp(dir=os.path.dirname(caminho), prefix='.parcial-')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(metadados, f, ensure_ascii=False)
+            os.replace(caminho_tmp, caminho)
+        except BaseException:
+            os.unlink(caminho_tmp)
+            raise
+
+    # ------------------------------------------------------------------
+    # Limpeza por idade e tamanho
+    # ------------------------------------------------------------------
+
+    def agendar_limpeza(self):
+        """Dispara a limpeza em segundo plano, no máximo uma vez por intervalo"""
+        if not self.ttl and not self.max_bytes:
+            return
+        with self._lock_limpeza:
+            if time.monotonic() - self._ultima_limpeza < self.intervalo_limpeza:
+                return
+            self._ultima_limpeza = time.monotonic()
+        threading.Thread(target=self.limpar, name='armazem-limpeza', daemon=True).start()
+
+    def _documentos_armazenados(self):
+        """Gera (ultimo_uso, tamanho, num_processo, id_documento) de cada documento"""
+        try:
+            pastas = os.scandir(self.diretorio)
+        except FileNotFoundError:
+            return
+        with pastas:
+            for pasta in pastas:
+                # Pastas com _ são de outros componentes; as de CACHES_DERIVADOS são
+                # limpas em _arquivos_derivados
+                if not pasta.is_dir() or pasta.name.startswith(('_', '.')):
+                    continue
+                for entrada in os.scandir(pasta.path):
+                    if entrada.name.startswith('.') or not entrada.name.endswith('.json'):
+                        continue
+                    metadados = self._ler_metadados(entrada.path)
+                    if not metadados or 'arquivo' not in metadados:
+                        continue
+                    try:
+                        ultimo_uso = entrada.stat().st_mtime
+                        tamanho = os.path.getsize(os.path.join(pasta.path, metadados['arquivo']))
+                    except OSError:
+                        continue
+                    yield ultimo_uso, tamanho, pasta.name, metadados['idDocumento']
+
+    def _arquivos_derivados(self, nome):
+        """
+        Gera (ultimo_uso, tamanho, caminhos) de cada entrada de um cache derivado.
+        Arquivos com o mesmo nome-base (ex.: cópia .pdf e seu .json) formam uma entrada.
+        """
+        entradas = {}
+        try:
+            arquivos = os.scandir(os.path.join(self.diretorio, nome))
+        except FileNotFoundError:
+            return
+        with arquivos:
+            for arquivo in arquivos:
+                # .parcial-*: gravação em andamento
+                if arquivo.name.startswith('.') or not arquivo.is_file():
+                    continue
+                try:
+                    info = arquivo.stat()
+                except OSError:
+                    continue
+                entrada = entradas.setdefault(os.path.splitext(arquivo.name)[0], [0.0, 0, []])
+                entrada[0] = max(entrada[0], info.st_mtime)
+                entrada[1] += info.st_size
+                entrada[2].append(arquivo.path)
+        for ultimo_uso, tamanho, caminhos in entradas.values():
+            yield ultimo_uso, tamanho, caminhos
+
+    def _entradas_armazenadas(self):
+        """Gera (ultimo_uso, tamanho, remover) dos documentos e dos caches derivados"""
+        for ultimo_uso, tamanho, num_processo, id_documento in self._documentos_armazenados():
+            yield ultimo_uso, tamanho, lambda n=num_processo, i=id_documento: self._remover_documento(n, i)
+        for nome in CACHES_DERIVADOS:
+            for ultimo_uso, tamanho, caminhos in self._arquivos_derivados(nome):
+                yield ultimo_uso, tamanho, lambda c=caminhos: _remover_arquivos(c)
+
+    def _remover_documento(self, num_processo, id_documento):
+        self.remover(num_processo, id_documento)
+        try:
+            os.rmdir(self._pasta(num_processo))
+        except OSError:
+            pass
+
+    def limpar(self):
+        """
+        Remove os documentos e as entradas dos caches derivados sem uso há mais
+        de `ttl` segundos e, acima de `max_bytes`, os de uso mais antigo.
+        Retorna a quantidade removida.
+        """
+        limite = time.time() - self.ttl if self.ttl else None
+        entradas = sorted(self._entradas_armazenadas(), key=lambda entrada: entrada[0])
+        total = sum(tamanho for _, tamanho, _ in entradas)
+        removidos = 0
+        for ultimo_uso, tamanho, remover in entradas:
+            expirado = limite is not None and ultimo_uso < limite
+            if not expirado and (not self.max_bytes or total <= self.max_bytes):
+                break
+            remover()
+            total -= tamanho
+            removidos += 1
+        if removidos:
+            logger.info(f"Armazém de documentos: {removidos} arquivos removidos na limpeza")
+        return removidos
+
+
+def _remover_arquivos(caminhos):
+    # O .json de uma cópia sai por último: sem a cópia, ele não é mais lido
+    for caminho in sorted(caminhos, key=lambda c: c.endswith('.json')):
+        try:
+            os.unlink(caminho)
+        except FileNotFoundError:
+            pass
+
+
+# Instância global do armazém de documentos
+armazem_documentos = ArmazemDocumentos()
+
+
+def obter_documento_local(num_processo, id_documento, cpf=None, senha=None, hash_esperado=None):
+    """
+    Retorna (caminho, metadados) do documento, baixando-o do MNI para o
+    armazém se ainda não estiver lá. Retorna None se o documento não existir.
+    O documento armazenado só é reaproveitado se o MNI já o entregou à mesma
+    credencial; do contrário é pedido ao MNI com a credencial informada.
+    Com `hash_esperado`, downloads divergentes são repetidos até
+    INTEGRIDADE_TENTATIVAS vezes antes de lançar ExcecaoIntegridadeDocumento.
+    """
+    credencial = credencial_documento(cpf, senha)
+    local = armazem_documentos.conferir(num_processo, id_documento, hash_esperado)
+    if local and credencial in local[1].get('credenciais', ()):
+        logger.debug(f"Documento {id_documento} servido do armazém local")
+        return local
+
+    for tentativa in range(1, INTEGRIDADE_TENTATIVAS + 1):
+        conteudo, mimetype = obter_conteudo_documento(num_processo, id_documento, cpf, senha)
+        if not conteudo:
+            return None
+        try:
+            return armazem_documentos.salvar(
+                num_processo, id_documento, conteudo, mimetype, hash_esperado, credencial=credencial
+            )
+        except ExcecaoIntegridadeDocumento as e:
+            logger.warning(f"{str(e)} (tentativa {tentativa}/{INTEGRIDADE_TENTATIVAS})")
+            if tentativa == INTEGRIDADE_TENTATIVAS:
+                raise
+
+
+def enviar_documento(num_processo, id_documento, cpf=None, senha=None, download_name=None, hash_esperado=None):
+    """
+    Resposta Flask com o binário do documento, com suporte a Range/If-Range.
+    Retorna None se o documento não existir. `hash_esperado` (hash do MNI)
+    é conferido como em obter_documento_local.
+    """
+    local = obter_documento_local(num_processo, id_documento, cpf, senha, hash_esperado)
+    if not local:
+        return None
+    caminho, metadados = local
+    return send_file(
+        caminho,
+        mimetype=metadados['mimetype'],
+        as_attachment=True,
+        download_name=download_name or f"{id_documento}{metadados['extensao']}",
+        conditional=True,
+        etag=metadados['sha256'],
+    )
+
+
+def listar_documentos_ordenados(processo):
+    """
+    Lista plana dos documentos do processo na ordem dos autos: cada documento
+    principal seguido dos seus vinculados. Aceita tanto o formato de
+    parse_processo_response quanto o de extract_mni_data.
+    """
+    documentos = []
+    vistos = set()
+    for doc in processo.get('documentos', []):
+        vinculados = doc.get('documentosVinculados') or doc.get('documentos_vinculados') or []
+        for item in [doc] + list(vinculados):
+            id_documento = str(item.get('idDocumento') or '')
+            if id_documento and id_documento not in vistos:
+                vistos.add(id_documento)
+                documentos.append(item)
+    return documentos
+
+
+def buscar_documentos(num_processo, ids, cpf=None, senha=None, max_workers=DOWNLOAD_WORKERS, hashes=None):
+    """
+    Garante os documentos no armazém local buscando até `max_workers` em
+    paralelo, e gera (id_documento, local, erro) na ordem de `ids`.
+    `hashes` (ID -> hash do MNI) habilita a verificação de integridade.
+    No máximo 2 * max_workers documentos ficam em andamento, de modo que o
+    consumo de memória não depende do tamanho do processo.
+    """
+    proximos = iter(ids)
+    hashes = hashes or {}
+    pendentes = deque()
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def submeter():
+        id_documento = next(proximos, None)
+        if id_documento is not None:
+            # O download leva o prazo da requisição (prazos.py) para a thread do pool
+            futuro = executor.submit(
+                contextvars.copy_context().run,
+                obter_documento_local, num_processo, id_documento, cpf, senha, hashes.get(id_documento)
+            )
+            pendentes.append((id_documento, futuro))
+
+    try:
+        for _ in range(max_workers * 2):
+            submeter()
+        while pendentes:
+            id_documento, futuro = pendentes.popleft()
+            submeter()
+            try:
+                yield id_documento, futuro.result(), None
+            except ExcecaoPrazoEsgotado:
+                # Cliente desistiu: os downloads restantes são cancelados
+                raise
+            except Exception as e:
+                logger.error(f"Erro ao buscar documento {id_documento}: {str(e)}")
+                yield id_documento, None, str(e)
+    finally:
+        # Se o consumidor desistir (ex.: cliente desconectou), nada novo é iniciado
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,263 @@
+"""
+Download em massa de documentos de processos: concorrente e retomável.
+
+- Concorrência limitada: `workers` downloads no total e no máximo
+  DOWNLOAD_MAX_POR_TRIBUNAL simultâneos em um mesmo tribunal (limite
+  compartilhado entre todos os downloads em andamento no processo).
+- Retomada: cada documento concluído é registrado em um manifesto JSONL em
+  disco (<destino>/manifesto.jsonl), com hash e tamanho. Ao reiniciar, os
+  documentos já registrados são pulados sem nova consulta ao MNI.
+- Tentativas: cada documento é tentado até DOWNLOAD_TENTATIVAS vezes, com
+  espera exponencial; falhas definitivas também vão para o manifesto e são
+  tentadas de novo na próxima execução.
+- Integridade: o conteúdo é conferido com o hash informado pelo MNI durante
+  a gravação; divergências contam como falha da tentativa (novo download).
+  Documentos já verificados com o mesmo hash são pulados sem releitura.
+- Texto: documentos HTML/texto gravados têm a extração de texto agendada
+  no pool de processos de textos.py.
+- Progresso: contadores de documentos, bytes e vazão, consultáveis durante
+  a execução (API) ou repassados a um callback (CLI).
+
+Uso no CLI: python cli.py baixar <numero_processo> [...]
+Uso na API: POST /api/v1/jobs com tipo "download" (jobs.py)
+"""
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from config import (DOCUMENTOS_DIR, DOWNLOAD_ESPERA_BASE, DOWNLOAD_MAX_POR_TRIBUNAL,
+                    DOWNLOAD_TENTATIVAS, DOWNLOAD_WORKERS)
+from documentos import ArmazemDocumentos, credencial_documento, normalizar_hash, obter_conteudo_documento
+from funcoes_mni import codigo_tribunal, retorna_processo
+from middleware import LimitesTribunal
+from textos import extrator_textos
+from utils import extract_all_document_ids
+
+logger = logging.getLogger(__name__)
+
+NOME_MANIFESTO = 'manifesto.jsonl'
+
+
+class ManifestoDownload:
+    """Manifesto JSONL com o resultado de cada documento, uma linha por evento"""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._concluidos = self._carregar()
+
+    def _carregar(self):
+        concluidos = {}
+        try:
+            with open(self.caminho, encoding='utf-8') as f:
+                for linha in f:
+                    try:
+                        registro = json.loads(linha)
+                    except ValueError:
+                        # Última linha truncada por uma interrupção: ignorada
+                        continue
+                    chave = (registro.get('processo'), registro.get('idDocumento'))
+                    if registro.get('status') == 'ok':
+                        concluidos[chave] = registro
+                    else:
+                        concluidos.pop(chave, None)
+        except FileNotFoundError:
+            pass
+        return concluidos
+
+    def concluido(self, num_processo, id_documento):
+        """Registro do documento se ele já foi concluído, senão None"""
+        return self._concluidos.get((num_processo, str(id_documento)))
+
+    def registrar(self, registro):
+        """Acrescenta o registro ao manifesto, garantindo-o em disco"""
+        registro = dict(registro, registradoEm=datetime.now().isoformat(timespec='seconds'))
+        linha = json.dumps(registro, ensure_ascii=False) + '\n'
+        with self._lock:
+            os.makedirs(os.path.dirname(self.caminho) or '.', exist_ok=True)
+            with open(self.caminho, 'a', encoding='utf-8') as f:
+                f.write(linha)
+                f.flush()
+                os.fsync(f.fileno())
+            chave = (registro['processo'], registro['idDocumento'])
+            if registro['status'] == 'ok':
+                self._concluidos[chave] = registro
+            else:
+                self._concluidos.pop(chave, None)
+
+
+# Limite por tribunal compartilhado por todos os downloads em andamento
+limites_tribunal = LimitesTribunal(DOWNLOAD_MAX_POR_TRIBUNAL)
+
+
+class ProgressoDownload:
+    """Contadores de progresso e vazão de um download em massa"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.inicio = time.monotonic()
+        self.processos = 0
+        self.total = 0
+        self.baixados = 0
+        self.pulados = 0
+        self.falhas = 0
+        self.bytes = 0
+
+    def adicionar(self, quantidade):
+        with self._lock:
+            self.processos += 1
+            self.total += quantidade
+
+    def registrar(self, situacao, tamanho=0):
+        with self._lock:
+            if situacao == 'baixado':
+                self.baixados += 1
+                self.bytes += tamanho
+            elif situacao == 'pulado':
+                self.pulados += 1
+            else:
+                self.falhas += 1
+
+    def resumo(self):
+        with self._lock:
+            decorrido = max(time.monotonic() - self.inicio, 1e-6)
+            finalizados = self.baixados + self.pulados + self.falhas
+            return {
+                'processos': self.processos,
+                'total': self.total,
+                'baixados': self.baixados,
+                'pulados': self.pulados,
+                'falhas': self.falhas,
+                'pendentes': self.total - finalizados,
+                'percentual': round(100.0 * finalizados / self.total, 1) if self.total else 0.0,
+                'bytes': self.bytes,
+                'decorridoSegundos': round(decorrido, 1),
+                'documentosPorSegundo': round(self.baixados / decorrido, 2),
+                'megabytesPorSegundo': round(self.bytes / decorrido / (1024 * 1024), 2),
+            }
+
+
+class BaixadorDocumentos:
+    """
+    Baixa todos os documentos de uma lista de processos para o armazém em
+    `destino`, registrando cada conclusão no manifesto para retomada.
+    """
+
+    def __init__(self, destino=DOCUMENTOS_DIR, cpf=None, senha=None, workers=DOWNLOAD_WORKERS,
+                 tentativas=DOWNLOAD_TENTATIVAS, ao_progredir=None):
+        # O download em massa não dispara a limpeza do armazém: é um espelho pedido explicitamente
+        self.armazem = ArmazemDocumentos(destino, ttl=0, max_mb=0)
+        self.manifesto = ManifestoDownload(os.path.join(destino, NOME_MANIFESTO))
+        self.cpf = cpf
+        self.senha = senha
+        self.workers = workers
+        self.tentativas = max(1, tentativas)
+        self.ao_progredir = ao_progredir
+        self.progresso = ProgressoDownload()
+        self.cancelado = threading.Event()
+
+    def listar_documentos(self, num_processo):
+        """(ID, hash do MNI) de todos os documentos do processo (incluindo vinculados), em ordem"""
+        resposta = retorna_processo(num_processo, cpf=self.cpf, senha=self.senha)
+        dados = extract_all_document_ids(resposta, num_processo=num_processo, cpf=self.cpf, senha=self.senha)
+        if not dados['sucesso']:
+            raise RuntimeError(dados.get('mensagem') or 'Falha ao listar documentos')
+        return [
+            (str(doc['idDocumento']), doc.get('hash') or None)
+            for doc in dados['documentos'] if doc.get('idDocumento')
+        ]
+
+    def baixar(self, processos):
+        """
+        Baixa os documentos de todos os processos e retorna o resumo final.
+        Processos cuja lista de documentos não pôde ser obtida são reportados em
+        `processosComErro`.
+        """
+        erros_processo = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futuros = []
+            for num_processo in dict.fromkeys(processos):
+                if self.cancelado.is_set():
+                    break
+                try:
+                    documentos = self.listar_documentos(num_processo)
+                except Exception as e:
+                    logger.error(f"Erro ao listar documentos de {num_processo}: {str(e)}")
+                    erros_processo[num_processo] = str(e)
+                    continue
+                self.progresso.adicionar(len(documentos))
+                tribunal = codigo_tribunal(num_processo)
+                futuros.extend(
+                    executor.submit(self._baixar_documento, num_processo, id_documento, hash_mni, tribunal)
+                    for id_documento, hash_mni in documentos
+                )
+            for futuro in futuros:
+                futuro.result()
+
+        resumo = self.progresso.resumo()
+        resumo['processosComErro'] = erros_processo
+        return resumo
+
+    def _baixar_documento(self, num_processo, id_documento, hash_mni, tribunal):
+        if self.cancelado.is_set():
+            return
+        if self._ja_concluido(num_processo, id_documento, hash_mni):
+            self._registrar_progresso('pulado')
+            return
+
+        erro = None
+        for tentativa in range(self.tentativas):
+            if tentativa:
+                time.sleep(DOWNLOAD_ESPERA_BASE * 2 ** (tentativa - 1))
+            if self.cancelado.is_set():
+                return
+            try:
+                with limites_tribunal.semaforo(tribunal):
+                    conteudo, mimetype = obter_conteudo_documento(num_processo, id_documento, self.cpf, self.senha)
+                if not conteudo:
+                    erro = 'Documento sem conteúdo'
+                    continue
+                caminho, metadados = self.armazem.salvar(
+                    num_processo, id_documento, conteudo, mimetype, hash_mni,
+                    credencial=credencial_documento(self.cpf, self.senha)
+                )
+                self.manifesto.registrar(dict(metadados, processo=num_processo, status='ok'))
+                extrator_textos.agendar(caminho, metadados, num_processo)
+                self._registrar_progresso('baixado', metadados['tamanho'])
+                return
+            except Exception as e:
+                erro = str(e)
+                logger.warning(f"Tentativa {tentativa + 1}/{self.tentativas} do documento {id_documento} falhou: {erro}")
+
+        self.manifesto.registrar({
+            'processo': num_processo,
+            'idDocumento': id_documento,
+            'status': 'erro',
+            'erro': erro,
+        })
+        self._registrar_progresso('falha')
+
+    def _ja_concluido(self, num_processo, id_documento, hash_mni=None):
+        """
+        Consulta o manifesto e, se ausente ou não verificado com o hash atual
+        do MNI, o armazém (documento baixado por outra rota ou antes do hash).
+        """
+        registro = self.manifesto.concluido(num_processo, id_documento)
+        esperado = normalizar_hash(hash_mni)
+        if registro and os.path.exists(self.armazem.caminho_arquivo(num_processo, registro['arquivo'])):
+            if not esperado or (registro.get('verificado') and registro.get('hashMni') == esperado[1]):
+                return True
+        local = self.armazem.conferir(num_processo, id_documento, hash_mni)
+        if local:
+            self.manifesto.registrar(dict(local[1], processo=num_processo, status='ok'))
+            return True
+        return False
+
+    def _registrar_progresso(self, situacao, tamanho=0):
+        self.progresso.registrar(situacao, tamanho)
+        if self.ao_progredir:
+            self.ao_progredir(self.progresso.resumo())
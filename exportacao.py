@@ -0,0 +1,114 @@
+"""
+Exportação dos documentos de um processo.
+
+ZIP em streaming: o arquivo é montado por um gerador à medida que os
+documentos chegam da busca concorrente. Cada bloco escrito pelo zipfile é
+repassado ao cliente, sem manter o ZIP inteiro em disco ou em memória.
+Formatos já comprimidos (PDF, imagens, Office, ZIP) entram sem recompressão.
+"""
+import json
+import logging
+import time
+import zipfile
+
+from documentos import TAMANHO_BLOCO, buscar_documentos, listar_documentos_ordenados
+
+logger = logging.getLogger(__name__)
+
+# Mimetypes gravados sem compressão (ZIP_STORED) por já serem comprimidos
+MIMETYPES_JA_COMPRIMIDOS = {
+    'application/pdf',
+    'image/jpeg',
+    'image/png',
+    'application/zip',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+class _SaidaStream:
+    """Destino não pesquisável para o zipfile; acumula os bytes até serem drenados"""
+
+    def __init__(self):
+        self._blocos = []
+
+    def write(self, dados):
+        self._blocos.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def drenar(self):
+        dados = b''.join(self._blocos)
+        self._blocos = []
+        return dados
+
+
+def gerar_zip_documentos(num_processo, processo, cpf=None, senha=None):
+    """
+    Gera o ZIP com todos os documentos do processo, em blocos de bytes.
+    Cada documento é nomeado como <idDocumento><extensão>; ao final é
+    incluído o manifest.json com os metadados e eventuais erros de download.
+    """
+    documentos = listar_documentos_ordenados(processo)
+    por_id = {str(doc['idDocumento']): doc for doc in documentos}
+    hashes = {id_documento: doc.get('hash') for id_documento, doc in por_id.items()}
+    data_hora = time.localtime()[:6]
+
+    saida = _SaidaStream()
+    manifesto = []
+    with zipfile.ZipFile(saida, 'w', allowZip64=True) as zf:
+        for id_documento, local, erro in buscar_documentos(num_processo, list(por_id), cpf, senha, hashes=hashes):
+            doc = por_id[id_documento]
+            item = {
+                'idDocumento': id_documento,
+                'descricao': doc.get('descricao', ''),
+                'tipoDocumento': doc.get('tipoDocumentoNome') or doc.get('tipoDocumento', ''),
+                'dataHora': doc.get('dataHoraInclusao') or doc.get('dataHora', ''),
+            }
+            if not local:
+                item['erro'] = erro or 'Documento não encontrado'
+                manifesto.append(item)
+                continue
+
+            caminho, metadados = local
+            zinfo = zipfile.ZipInfo(metadados['arquivo'], date_time=data_hora)
+            zinfo.file_size = metadados['tamanho']
+            if metadados['mimetype'] in MIMETYPES_JA_COMPRIMIDOS:
+                zinfo.compress_type = zipfile.ZIP_STORED
+            else:
+                zinfo.compress_type = zipfile.ZIP_DEFLATED
+
+            with zf.open(zinfo, 'w') as destino, open(caminho, 'rb') as origem:
+                for bloco in iter(lambda: origem.read(TAMANHO_BLOCO), b''):
+                    destino.write(bloco)
+                    dados = saida.drenar()
+                    if dados:
+                        yield dados
+
+            item.update({
+                'arquivo': metadados['arquivo'],
+                'mimetype': metadados['mimetype'],
+                'tamanho': metadados['tamanho'],
+                'sha256': metadados['sha256'],
+                'verificado': metadados.get('verificado', False),
+            })
+            manifesto.append(item)
+            dados = saida.drenar()
+            if dados:
+                yield dados
+
+        zf.writestr(
+            'manifest.json',
+            json.dumps({
+                'numeroProcesso': num_processo,
+                'totalDocumentos': len(manifesto),
+                'documentos': manifesto,
+            }, ensure_ascii=False, indent=2),
+            compress_type=zipfile.ZIP_DEFLATED,
+        )
+
+    dados = saida.drenar()
+    if dados:
+        yield dados
@@ -0,0 +1,500 @@
+"""
+Exportação em massa de processos para JSONL ou Parquet, retomável.
+
+- Entrada: números CNJ com ou sem pontuação, normalizados com
+  format_process_number; números inválidos são reportados e ignorados.
+- Consulta: concorrente (`workers` consultas ao MNI no total e no máximo
+  CONSULTA_MAX_POR_TRIBUNAL em um mesmo tribunal), com os números
+  intercalados por tribunal.
+- Saída: três tabelas achatadas, uma linha por registro:
+    capa        dados básicos, órgão julgador, assuntos e polos do processo
+    movimentos  uma linha por movimentação
+    documentos  uma linha por documento (vinculados incluídos)
+  Em JSONL, um arquivo por tabela (<destino>/<tabela>.jsonl). Em Parquet,
+  um dataset por tabela particionado por tribunal
+  (<destino>/<tabela>/tribunal=8.17/lote-000001-0.parquet).
+- Retomada: os processos são gravados em lotes de EXPORTACAO_LOTE; após cada
+  lote, uma linha é acrescentada ao checkpoint (<destino>/checkpoint.jsonl)
+  com os processos exportados. Ao reiniciar, os processos do checkpoint são
+  pulados e o que foi gravado depois do último lote registrado (execução
+  interrompida no meio de um lote) é descartado, de modo que nenhum
+  processo aparece duas vezes na saída. Processos com erro são tentados de
+  novo na próxima execução. Sem checkpoint, a exportação começa do zero.
+
+Uso no CLI: python cli.py exportar --arquivo processos.txt --formato parquet
+"""
+import glob
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from config import CONSULTA_MAX_POR_TRIBUNAL, EXPORTACAO_LOTE, EXPORTACAO_WORKERS
+from controle.exceptions import ExcecaoConsultaMNI
+from core import format_process_number
+from funcoes_mni import codigo_tribunal, intercalar_por_tribunal, retorna_processo
+from middleware import LimitesTribunal
+from utils import campo_mni, lista_mni
+
+try:
+    import pyarrow
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow é opcional (somente para o formato parquet)
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+NOME_CHECKPOINT = 'checkpoint.jsonl'
+
+FORMATOS = ('jsonl', 'parquet')
+
+# Colunas de cada tabela exportada e seus tipos (esquema fixo, igual em
+# todos os lotes e nos dois formatos)
+COLUNAS = {
+    'capa': {
+        'processo': str,
+        'tribunal': str,
+        'classeProcessual': str,
+        'codigoLocalidade': str,
+        'competencia': str,
+        'dataAjuizamento': str,
+        'valorCausa': float,
+        'nivelSigilo': int,
+        'orgaoJulgador': str,
+        'codigoOrgao': str,
+        'instancia': str,
+        'assuntos': str,
+        'poloAtivo': str,
+        'poloPassivo': str,
+        'quantidadeMovimentos': int,
+        'quantidadeDocumentos': int,
+    },
+    'movimentos': {
+        'processo': str,
+        'tribunal': str,
+        'sequencia': int,
+        'dataHora': str,
+        'codigoNacional': str,
+        'codigoLocal': str,
+        'descricao': str,
+        'complementos': str,
+        'idDocumentoVinculado': str,
+    },
+    'documentos': {
+        'processo': str,
+        'tribunal': str,
+        'sequencia': int,
+        'idDocumento': str,
+        'idDocumentoPrincipal': str,
+        'tipoDocumento': str,
+        'descricao': str,
+        'dataHora': str,
+        'mimetype': str,
+        'nivelSigilo': int,
+        'hash': str,
+    },
+}
+
+SEPARADOR = '; '
+
+
+def normalizar_numeros(entradas):
+    """
+    Normaliza os números com format_process_number, sem repetições e na
+    ordem de entrada. Retorna (válidos, inválidos).
+    """
+    validos, invalidos = {}, []
+    for entrada in entradas:
+        entrada = entrada.strip()
+        if not entrada:
+            continue
+        try:
+            validos.setdefault(format_process_number(entrada), None)
+        except ValueError:
+            invalidos.append(entrada)
+    return list(validos), invalidos
+
+
+# ----------------------------------------------------------------------
+# Achatamento da resposta do MNI
+# ----------------------------------------------------------------------
+
+def _converter(valor, tipo):
+    if valor is None or valor == '':
+        return None
+    try:
+        return tipo(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def _linha(tabela, dados):
+    """Linha com todas as colunas da tabela, nos tipos do esquema"""
+    return {coluna: _converter(dados.get(coluna), tipo) for coluna, tipo in COLUNAS[tabela].items()}
+
+
+def _nomes_polo(polos, tipo_polo):
+    nomes = []
+    for polo in polos:
+        if campo_mni(polo, 'polo') != tipo_polo:
+            continue
+        for parte in lista_mni(campo_mni(polo, 'parte')):
+            nome = campo_mni(campo_mni(parte, 'pessoa'), 'nome') or campo_mni(parte, 'nome')
+            if nome:
+                nomes.append(str(nome))
+    return SEPARADOR.join(nomes)
+
+
+def _descricao_assunto(assunto):
+    local = campo_mni(assunto, 'assuntoLocal')
+    codigo = campo_mni(assunto, 'codigoNacional') or campo_mni(local, 'codigoAssunto')
+    descricao = campo_mni(assunto, 'descricao') or campo_mni(local, 'descricao')
+    return ' - '.join(str(parte) for parte in (codigo, descricao) if parte)
+
+
+def _linhas_movimentos(numero, tribunal, movimentos):
+    for sequencia, mov in enumerate(movimentos, 1):
+        nacional = campo_mni(mov, 'movimentoNacional')
+        local = campo_mni(mov, 'movimentoLocal')
+        complementos = lista_mni(campo_mni(mov, 'complemento')) + lista_mni(campo_mni(nacional, 'complemento'))
+        yield _linha('movimentos', {
+            'processo': numero,
+            'tribunal': tribunal,
+            'sequencia': sequencia,
+            'dataHora': campo_mni(mov, 'dataHora'),
+            'codigoNacional': campo_mni(nacional, 'codigoNacional'),
+            'codigoLocal': campo_mni(local, 'codigoMovimento'),
+            'descricao': campo_mni(local, 'descricao') or campo_mni(mov, 'descricao'),
+            'complementos': SEPARADOR.join(str(c) for c in complementos if c),
+            'idDocumentoVinculado': SEPARADOR.join(str(i) for i in lista_mni(campo_mni(mov, 'idDocumentoVinculado'))),
+        })
+
+
+def _linhas_documentos(numero, tribunal, documentos):
+    sequencia = 0
+
+    def linhas(doc, id_principal=None):
+        nonlocal sequencia
+        sequencia += 1
+        yield _linha('documentos', {
+            'processo': numero,
+            'tribunal': tribunal,
+            'sequencia': sequencia,
+            'idDocumento': campo_mni(doc, 'idDocumento'),
+            'idDocumentoPrincipal': id_principal or campo_mni(doc, 'idDocumentoVinculado'),
+            'tipoDocumento': campo_mni(doc, 'tipoDocumento'),
+            'descricao': campo_mni(doc, 'descricao'),
+            'dataHora': campo_mni(doc, 'dataHora'),
+            'mimetype': campo_mni(doc, 'mimetype'),
+            'nivelSigilo': campo_mni(doc, 'nivelSigilo'),
+            'hash': campo_mni(doc, 'hash'),
+        })
+        for vinculado in lista_mni(campo_mni(doc, 'documentoVinculado')):
+            yield from linhas(vinculado, campo_mni(doc, 'idDocumento'))
+
+    for doc in documentos:
+        yield from linhas(doc)
+
+
+def achatar_processo(numero, resposta):
+    """
+    Converte a resposta do consultarProcesso nas linhas das tabelas exportadas.
+    Retorna {'capa': [...], 'movimentos': [...], 'documentos': [...]}.
+    """
+    if not campo_mni(resposta, 'sucesso', True):
+        raise ExcecaoConsultaMNI(campo_mni(resposta, 'mensagem') or 'Consulta ao MNI sem sucesso')
+    processo = campo_mni(resposta, 'processo')
+    if processo is None:
+        raise ExcecaoConsultaMNI('Resposta do MNI sem processo')
+
+    tribunal = codigo_tribunal(numero)
+    dados = campo_mni(processo, 'dadosBasicos', processo)
+    orgao = campo_mni(dados, 'orgaoJulgador')
+    polos = lista_mni(campo_mni(dados, 'polo'))
+    movimentos = list(_linhas_movimentos(numero, tribunal, lista_mni(campo_mni(processo, 'movimento'))))
+    documentos = list(_linhas_documentos(numero, tribunal, lista_mni(campo_mni(processo, 'documento'))))
+
+    capa = _linha('capa', {
+        'processo': numero,
+        'tribunal': tribunal,
+        'classeProcessual': campo_mni(dados, 'classeProcessual'),
+        'codigoLocalidade': campo_mni(dados, 'codigoLocalidade'),
+        'competencia': campo_mni(dados, 'competencia'),
+        'dataAjuizamento': campo_mni(dados, 'dataAjuizamento'),
+        'valorCausa': campo_mni(dados, 'valorCausa'),
+        'nivelSigilo': campo_mni(dados, 'nivelSigilo'),
+        'orgaoJulgador': campo_mni(orgao, 'nomeOrgao'),
+        'codigoOrgao': campo_mni(orgao, 'codigoOrgao'),
+        'instancia': campo_mni(orgao, 'instancia'),
+        'assuntos': SEPARADOR.join(filter(None, map(_descricao_assunto, lista_mni(campo_mni(dados, 'assunto'))))),
+        'poloAtivo': _nomes_polo(polos, 'AT'),
+        'poloPassivo': _nomes_polo(polos, 'PA'),
+        'quantidadeMovimentos': len(movimentos),
+        'quantidadeDocumentos': len(documentos),
+    })
+    return {'capa': [capa], 'movimentos': movimentos, 'documentos': documentos}
+
+
+# ----------------------------------------------------------------------
+# Checkpoint e escritores
+# ----------------------------------------------------------------------
+
+class CheckpointExportacao:
+    """Checkpoint JSONL com uma linha por lote gravado"""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.exportados = set()
+        self.ultimo = None
+        self._carregar()
+
+    def _carregar(self):
+        try:
+            with open(self.caminho, encoding='utf-8') as f:
+                for linha in f:
+                    try:
+                        registro = json.loads(linha)
+                    except ValueError:
+                        # Última linha truncada por uma interrupção: ignorada
+                        continue
+                    self.exportados.update(registro.get('processos', []))
+                    self.ultimo = registro
+        except FileNotFoundError:
+            pass
+
+    @property
+    def formato(self):
+        return self.ultimo['formato'] if self.ultimo else None
+
+    @property
+    def proximo_lote(self):
+        return self.ultimo['lote'] + 1 if self.ultimo else 1
+
+    def registrar(self, registro):
+        """Acrescenta o registro do lote ao checkpoint, garantindo-o em disco"""
+        registro = dict(registro, registradoEm=datetime.now().isoformat(timespec='seconds'))
+        with open(self.caminho, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.exportados.update(registro['processos'])
+        self.ultimo = registro
+
+
+class EscritorJSONL:
+    """Um arquivo JSONL por tabela; o checkpoint guarda o tamanho de cada um"""
+
+    def __init__(self, destino):
+        self.destino = destino
+
+    def caminho(self, tabela):
+        return os.path.join(self.destino, f'{tabela}.jsonl')
+
+    def preparar(self, ultimo):
+        """Descarta o que foi gravado depois do último lote registrado no checkpoint"""
+        tamanhos = (ultimo or {}).get('tamanhos', {})
+        for tabela in COLUNAS:
+            with open(self.caminho(tabela), 'ab') as f:
+                f.truncate(tamanhos.get(tabela, 0))
+
+    def gravar(self, numero_lote, linhas):
+        tamanhos = {}
+        for tabela in COLUNAS:
+            with open(self.caminho(tabela), 'ab') as f:
+                for linha in linhas[tabela]:
+                    f.write(json.dumps(linha, ensure_ascii=False).encode('utf-8') + b'\n')
+                f.flush()
+                os.fsync(f.fileno())
+                tamanhos[tabela] = f.tell()
+        return {'tamanhos': tamanhos}
+
+
+class EscritorParquet:
+    """Um dataset Parquet por tabela, particionado por tribunal, um arquivo por lote"""
+
+    _TIPOS = {str: 'string', int: 'int64', float: 'float64'}
+    _RE_LOTE = re.compile(r'lote-(\d+)-')
+
+    def __init__(self, destino):
+        if pyarrow is None:
+            raise RuntimeError('A exportação em Parquet requer o pacote pyarrow (pip install pyarrow)')
+        self.destino = destino
+        self.esquemas = {
+            tabela: pyarrow.schema([
+                (coluna, getattr(pyarrow, self._TIPOS[tipo])()) for coluna, tipo in colunas.items()
+            ])
+            for tabela, colunas in COLUNAS.items()
+        }
+
+    def preparar(self, ultimo):
+        """Remove os arquivos de lotes que não chegaram a ser registrados no checkpoint"""
+        ultimo_lote = ultimo['lote'] if ultimo else 0
+        for caminho in glob.glob(os.path.join(self.destino, '*', '*', 'lote-*.parquet')):
+            correspondencia = self._RE_LOTE.match(os.path.basename(caminho))
+            if correspondencia and int(correspondencia.group(1)) > ultimo_lote:
+                os.remove(caminho)
+
+    def gravar(self, numero_lote, linhas):
+        for tabela, esquema in self.esquemas.items():
+            if not linhas[tabela]:
+                continue
+            pq.write_to_dataset(
+                pyarrow.Table.from_pylist(linhas[tabela], schema=esquema),
+                root_path=os.path.join(self.destino, tabela),
+                partition_cols=['tribunal'],
+                basename_template=f'lote-{numero_lote:06d}-{{i}}.parquet',
+            )
+        return {}
+
+
+ESCRITORES = {'jsonl': EscritorJSONL, 'parquet': EscritorParquet}
+
+
+# ----------------------------------------------------------------------
+# Exportação
+# ----------------------------------------------------------------------
+
+# Limite por tribunal compartilhado por todas as exportações em andamento
+limites_exportacao = LimitesTribunal(CONSULTA_MAX_POR_TRIBUNAL)
+
+
+class ProgressoExportacao:
+    """Contadores de progresso e vazão de uma exportação"""
+
+    def __init__(self, total, pulados):
+        self._lock = threading.Lock()
+        self.inicio = time.monotonic()
+        self.total = total
+        self.pulados = pulados
+        self.exportados = 0
+        self.erros = 0
+        self.linhas = dict.fromkeys(COLUNAS, 0)
+
+    def registrar(self, linhas=None):
+        with self._lock:
+            if linhas is None:
+                self.erros += 1
+                return
+            self.exportados += 1
+            for tabela, registros in linhas.items():
+                self.linhas[tabela] += len(registros)
+
+    def resumo(self):
+        with self._lock:
+            decorrido = max(time.monotonic() - self.inicio, 1e-6)
+            finalizados = self.exportados + self.pulados + self.erros
+            return {
+                'total': self.total,
+                'exportados': self.exportados,
+                'pulados': self.pulados,
+                'erros': self.erros,
+                'pendentes': self.total - finalizados,
+                'percentual': round(100.0 * finalizados / self.total, 1) if self.total else 0.0,
+                'linhas': dict(self.linhas),
+                'decorridoSegundos': round(decorrido, 1),
+                'processosPorSegundo': round(self.exportados / decorrido, 2),
+                'linhasPorSegundo': round(sum(self.linhas.values()) / decorrido, 1),
+            }
+
+
+class ExportadorProcessos:
+    """
+    Consulta os processos no MNI e grava capa, movimentos e documentos em
+    `destino`, no `formato` escolhido, registrando cada lote no checkpoint.
+    """
+
+    def __init__(self, destino, formato='jsonl', cpf=None, senha=None, workers=EXPORTACAO_WORKERS,
+                 lote=EXPORTACAO_LOTE, ao_progredir=None):
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato inválido; use um de: {', '.join(FORMATOS)}")
+        os.makedirs(destino, exist_ok=True)
+        self.destino = destino
+        self.formato = formato
+        self.checkpoint = CheckpointExportacao(os.path.join(destino, NOME_CHECKPOINT))
+        if self.checkpoint.formato not in (None, formato):
+            raise ValueError(
+                f"{destino} contém uma exportação em {self.checkpoint.formato}; "
+                f"use outro destino ou o mesmo formato"
+            )
+        self.escritor = ESCRITORES[formato](destino)
+        self.cpf = cpf
+        self.senha = senha
+        self.workers = workers
+        self.lote = max(1, lote)
+        self.ao_progredir = ao_progredir
+        self.progresso = None
+        self.cancelado = threading.Event()
+
+    def consultar(self, numero):
+        """Linhas das tabelas exportadas para um processo"""
+        with limites_exportacao.semaforo(codigo_tribunal(numero)):
+            resposta = retorna_processo(numero, cpf=self.cpf, senha=self.senha, cache=False,
+                                        incluir_documentos=True)
+        return achatar_processo(numero, resposta)
+
+    def exportar(self, entradas):
+        """
+        Exporta os processos ainda não registrados no checkpoint e retorna o
+        resumo final, com os números inválidos e os processos com erro.
+        """
+        numeros, invalidos = normalizar_numeros(entradas)
+        pendentes = [numero for numero in numeros if numero not in self.checkpoint.exportados]
+        self.progresso = ProgressoExportacao(len(numeros), len(numeros) - len(pendentes))
+        self.escritor.preparar(self.checkpoint.ultimo)
+
+        erros = {}
+        lote = {'linhas': {tabela: [] for tabela in COLUNAS}, 'processos': []}
+        executor = ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(pendentes))))
+        try:
+            futuros = {
+                executor.submit(self.consultar, numero): numero
+                for numero in intercalar_por_tribunal(pendentes)
+            }
+            for futuro in as_completed(futuros):
+                numero = futuros[futuro]
+                try:
+                    linhas = futuro.result()
+                except Exception as e:
+                    logger.error(f"Erro ao exportar {numero}: {str(e)}")
+                    erros[numero] = str(e)
+                    self._registrar_progresso(None)
+                else:
+                    for tabela, registros in linhas.items():
+                        lote['linhas'][tabela].extend(registros)
+                    lote['processos'].append(numero)
+                    self._registrar_progresso(linhas)
+
+                if len(lote['processos']) >= self.lote:
+                    self._gravar_lote(lote)
+                if self.cancelado.is_set():
+                    break
+        finally:
+            # Interrompida ou não, o que já foi consultado é gravado e registrado
+            executor.shutdown(wait=False, cancel_futures=True)
+            if lote['processos']:
+                self._gravar_lote(lote)
+
+        resumo = self.progresso.resumo()
+        resumo['processosComErro'] = erros
+        resumo['numerosInvalidos'] = invalidos
+        return resumo
+
+    def _gravar_lote(self, lote):
+        numero_lote = self.checkpoint.proximo_lote
+        extra = self.escritor.gravar(numero_lote, lote['linhas'])
+        self.checkpoint.registrar(dict(
+            extra, lote=numero_lote, formato=self.formato, processos=lote['processos']
+        ))
+        logger.debug(f"Lote {numero_lote} gravado com {len(lote['processos'])} processo(s)")
+        lote['processos'] = []
+        for registros in lote['linhas'].values():
+            registros.clear()
+
+    def _registrar_progresso(self, linhas):
+        self.progresso.registrar(linhas)
+        if self.ao_progredir:
+            self.ao_progredir(self.progresso.resumo())
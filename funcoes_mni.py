@@ -3,13 +3,26 @@ import json
 import sys
 import time
 import requests
+from requests.adapters import HTTPAdapter
 from zeep import Client
 from zeep.helpers import serialize_object
+from zeep.transports import Transport
 from easydict import EasyDict
-from config import MNI_URL, MNI_SENHA_CONSULTANTE, MNI_CONSULTA_URL, MNI_ID_CONSULTANTE
+from config import (MNI_URL, MNI_SENHA_CONSULTANTE, MNI_CONSULTA_URL, MNI_ID_CONSULTANTE, MNI_TIMEOUT,
+                    MNI_CONEXOES_POR_TRIBUNAL, MNI_MAX_POR_TRIBUNAL, MNI_TRIBUNAIS, MNI_INSTANCIAS_MAX,
+                    MNI_DESCOBERTA_WORKERS, ADMISSAO_MAX_GLOBAL, ADMISSAO_FILA_MAX, ADMISSAO_ESPERA,
+                    ADMISSAO_RESERVA_REQUISICOES, ADMISSAO_RETRY_AFTER)
 import logging
+import contextvars
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 import pandas as pd
-from controle.exceptions import ExcecaoConsultaMNI
+from controle.exceptions import ExcecaoConsultaMNI, ExcecaoPrazoEsgotado, ExcecaoSobrecarga
+from latencias import latencias_mni
+from prazos import limitar_timeout, restante, verificar_prazo
+from utils import campo_mni
 import itertools
 import base64
 from concurrent.futures import ThreadPoolExecutor
@@ -20,17 +33,492 @@ from datetime import datetime, date
 logger = logging.getLogger(__name__)
 
 
-def retorna_processo(numero_processo, cpf=None, senha=None, cache=True, timeout=60, incluir_documentos=False):
+def _digitos(numero_processo):
+    return ''.join(c for c in str(numero_processo or '') if c.isdigit())
+
+
+def codigo_tribunal(numero_processo):
+    """
+    Extrai o código do tribunal (J.TR, ex.: '8.17') do número CNJ do processo,
+    aceito com ou sem pontuação. Retorna None se o número for inválido.
+    """
+    digitos = _digitos(numero_processo)
+    if len(digitos) != 20:
+        return None
+    return f"{digitos[13]}.{digitos[14:16]}"
+
+
+def intercalar_por_tribunal(numeros):
+    """
+    Agrupa os números por tribunal e os intercala (um de cada tribunal por vez),
+    para que um tribunal com muitos processos não ocupe todos os workers
+    enquanto os demais esperam.
+    """
+    grupos = {}
+    for numero in numeros:
+        grupos.setdefault(codigo_tribunal(numero), []).append(numero)
+    filas = list(grupos.values())
+    intercalados = []
+    for i in range(max((len(fila) for fila in filas), default=0)):
+        intercalados.extend(fila[i] for fila in filas if i < len(fila))
+    return intercalados
+
+
+# Endpoints MNI conhecidos por tribunal (J.TR); MNI_TRIBUNAIS sobrepõe ou estende
+TRIBUNAL_WSDL_MAP = {
+    '8.06': 'https://pje.tjce.jus.br/pje1grau/intercomunicacao?wsdl',  # TJCE
+    '8.02': 'https://pje.tjal.jus.br/pje1grau/intercomunicacao?wsdl',  # TJAL
+    '8.05': 'https://pje.tjba.jus.br/pje1grau/intercomunicacao?wsdl',  # TJBA
+    '8.13': 'https://pje.tjmg.jus.br/pje/intercomunicacao?wsdl',      # TJMG
+    '8.26': 'https://pje.tjsp.jus.br/pje/intercomunicacao?wsdl',      # TJSP
+    '8.15': 'https://pje.tjpb.jus.br/pje1grau/intercomunicacao?wsdl', # TJPB
+    '8.17': 'https://pje.tjpe.jus.br/1g/intercomunicacao?wsdl',       # TJPE
+    '8.18': 'https://pje.tjpr.jus.br/pje1grau/intercomunicacao?wsdl', # TJPR
+    '8.19': 'https://pje.tjrj.jus.br/pje1grau/intercomunicacao?wsdl', # TJRJ
+    '8.20': 'https://pje.tjrn.jus.br/pje1grau/intercomunicacao?wsdl', # TJRN
+    '8.21': 'https://pje.tjrs.jus.br/pje1grau/intercomunicacao?wsdl', # TJRS
+    '8.24': 'https://pje.tjsc.jus.br/pje1grau/intercomunicacao?wsdl', # TJSC
+    '8.25': 'https://pje.tjse.jus.br/pje1grau/intercomunicacao?wsdl', # TJSE
+    '4.01': 'https://pje1g.trf1.jus.br/pje/intercomunicacao?wsdl',    # TRF1
+    '4.02': 'https://pje.trf2.jus.br/pje/intercomunicacao?wsdl',      # TRF2
+    '4.03': 'https://pje1g.trf3.jus.br/pje/intercomunicacao?wsdl',    # TRF3
+    '4.04': 'https://pje.trf4.jus.br/pje/intercomunicacao?wsdl',      # TRF4
+    '4.05': 'https://pje.trf5.jus.br/pje/intercomunicacao?wsdl',      # TRF5
+}
+
+# Instâncias do PJe de cada tribunal, na ordem de preferência
+INSTANCIAS = ('1g', '2g')
+
+# Timeout (s) das chamadas SOAP feitas no contexto atual (ver EndpointTribunal.chamada)
+_timeout_chamada = contextvars.ContextVar('timeout_chamada_mni', default=None)
+
+
+# Nome da operação no corpo do envelope SOAP (quando o SOAPAction vem vazio)
+_OPERACAO_ENVELOPE = re.compile(rb'<(?:[\w-]+:)?Body[^>]*>\s*<(?:[\w-]+:)?([\w-]+)')
+
+
+def _operacao_soap(headers, mensagem):
+    acao = str(headers.get('SOAPAction') or '').strip('"').rstrip('/')
+    if acao:
+        return acao.rsplit('/', 1)[-1]
+    encontrada = _OPERACAO_ENVELOPE.search(mensagem[:4096] if isinstance(mensagem, bytes) else b'')
+    return encontrada.group(1).decode() if encontrada else 'desconhecida'
+
+
+class _TransporteTribunal(Transport):
+    """
+    Transport do zeep de um endpoint: mede cada chamada SOAP (latencias_mni)
+    e usa o timeout definido para a chamada ou, sem ele, o adaptativo, sempre
+    limitado ao prazo restante da requisição (prazos).
+    """
+
+    def __init__(self, rotulo, teto, **kwargs):
+        super().__init__(**kwargs)
+        self.rotulo = rotulo
+        self.teto = teto
+
+    def timeout(self, operacao):
+        """Timeout (s, ou tupla conexão/leitura) da próxima chamada da operação"""
+        timeout = _timeout_chamada.get() or latencias_mni.timeouts(self.rotulo, operacao, self.teto) or self.teto
+        return limitar_timeout(timeout)
+
+    def post(self, address, message, headers):
+        operacao = _operacao_soap(headers, message)
+        timeout = self.timeout(operacao)
+        inicio = time.monotonic()
+        try:
+            resposta = self.session.post(address, data=message, headers=headers, timeout=timeout)
+        except requests.Timeout as e:
+            segundos = restante()
+            if segundos is not None and segundos <= 0:
+                # Timeout imposto pelo prazo da requisição, não pela latência do tribunal
+                raise ExcecaoPrazoEsgotado('Prazo da requisição esgotado durante a chamada ao MNI') from e
+            latencias_mni.registrar(self.rotulo, operacao, time.monotonic() - inicio, timeout=True)
+            raise
+        latencias_mni.registrar(self.rotulo, operacao, time.monotonic() - inicio)
+        return resposta
+
+
+class ControleAdmissao:
+    """
+    Admissão das chamadas ao MNI (por instância da aplicação): no máximo
+    ADMISSAO_MAX_GLOBAL chamadas em andamento somando todos os tribunais e
+    `max_simultaneas` em cada endpoint. Sem vaga, até ADMISSAO_FILA_MAX
+    chamadas de requisições HTTP esperam por até ADMISSAO_ESPERA segundos
+    (ou até o fim do prazo); além disso são recusadas com ExcecaoSobrecarga,
+    para que a API responda 503 em vez de acumular workers bloqueados.
+    Chamadas sem prazo (jobs, monitoramento, pools) esperam a vaga sem
+    contar na fila e têm prioridade menor: não usam as
+    ADMISSAO_RESERVA_REQUISICOES vagas globais reservadas às requisições e
+    não ocupam uma vaga do endpoint enquanto houver requisição aguardando por ele.
+    """
+
+    def __init__(self, maximo=ADMISSAO_MAX_GLOBAL, fila_max=ADMISSAO_FILA_MAX, espera=ADMISSAO_ESPERA,
+                 reserva=ADMISSAO_RESERVA_REQUISICOES):
+        self.maximo = maximo
+        self.fila_max = fila_max
+        self.espera = espera
+        self.reserva = max(0, reserva)
+        self.em_andamento = 0
+        self.aguardando = 0
+        self.aguardando_segundo_plano = 0
+        self.recusadas = 0
+        self._por_endpoint = {}
+        self._requisicoes_aguardando = {}
+        self._condicao = threading.Condition()
+
+    def _tem_vaga(self, endpoint, requisicao):
+        maximo = self.maximo
+        if not requisicao:
+            if self._requisicoes_aguardando.get(endpoint.rotulo):
+                return False
+            # Ao menos uma vaga, para que jobs não fiquem parados com limites pequenos
+            maximo = max(1, maximo - self.reserva)
+        return (self.em_andamento < maximo
+                and self._por_endpoint.get(endpoint.rotulo, 0) < endpoint.max_simultaneas)
+
+    def _recusar(self, endpoint):
+        self.recusadas += 1
+        logger.warning(f"Chamada ao MNI ({endpoint.rotulo}) recusada: {self.em_andamento} em andamento, "
+                       f"{self.aguardando} aguardando")
+        raise ExcecaoSobrecarga(f'Muitas consultas em andamento ao tribunal {endpoint.tribunal or "padrão"}; '
+                                f'tente novamente em {ADMISSAO_RETRY_AFTER} segundos', ADMISSAO_RETRY_AFTER)
+
+    def _aguardar_segundo_plano(self, endpoint):
+        self.aguardando_segundo_plano += 1
+        try:
+            while not self._tem_vaga(endpoint, False):
+                self._condicao.wait()
+        finally:
+            self.aguardando_segundo_plano -= 1
+
+    def _aguardar_vaga(self, endpoint, segundos):
+        if self.aguardando >= self.fila_max:
+            self._recusar(endpoint)
+        limite = time.monotonic() + min(self.espera, max(segundos, 0))
+        rotulo = endpoint.rotulo
+        self.aguardando += 1
+        self._requisicoes_aguardando[rotulo] = self._requisicoes_aguardando.get(rotulo, 0) + 1
+        try:
+            while not self._tem_vaga(endpoint, True):
+                falta = limite - time.monotonic()
+                if falta <= 0:
+                    verificar_prazo()
+                    self._recusar(endpoint)
+                self._condicao.wait(falta)
+        finally:
+            self.aguardando -= 1
+            self._requisicoes_aguardando[rotulo] -= 1
+            # Chamadas de segundo plano retidas por esta requisição podem seguir
+            self._condicao.notify_all()
+
+    @contextmanager
+    def admitir(self, endpoint):
+        """Ocupa uma vaga global e do endpoint durante a chamada"""
+        segundos = restante()
+        with self._condicao:
+            if not self._tem_vaga(endpoint, segundos is not None):
+                if segundos is None:
+                    self._aguardar_segundo_plano(endpoint)
+                else:
+                    self._aguardar_vaga(endpoint, segundos)
+            self.em_andamento += 1
+            self._por_endpoint[endpoint.rotulo] = self._por_endpoint.get(endpoint.rotulo, 0) + 1
+        try:
+            yield
+        finally:
+            with self._condicao:
+                self.em_andamento -= 1
+                self._por_endpoint[endpoint.rotulo] -= 1
+                self._condicao.notify_all()
+
+    def resumo(self):
+        with self._condicao:
+            return {
+                'emAndamento': self.em_andamento,
+                'aguardando': self.aguardando,
+                'aguardandoSegundoPlano': self.aguardando_segundo_plano,
+                'recusadas': self.recusadas,
+                'maximo': self.maximo,
+                'reservaRequisicoes': self.reserva,
+                'porEndpoint': {rotulo: n for rotulo, n in self._por_endpoint.items() if n},
+            }
+
+
+# Instância global do controle de admissão das chamadas ao MNI
+controle_admissao = ControleAdmissao()
+
+
+class EndpointTribunal:
+    """
+    Endpoint MNI de um tribunal e instância: clientes zeep (WSDL lido uma
+    única vez), pool de conexões HTTP próprio, timeout máximo (os efetivos
+    se adaptam às latências observadas) e limite de chamadas simultâneas
+    (aplicado pelo controle_admissao).
+    """
+
+    def __init__(self, tribunal, url, url_consulta, instancia='1g', timeout=MNI_TIMEOUT,
+                 max_conexoes=MNI_CONEXOES_POR_TRIBUNAL, max_simultaneas=MNI_MAX_POR_TRIBUNAL):
+        self.tribunal = tribunal
+        self.instancia = instancia
+        self.rotulo = f"{tribunal or 'padrao'}/{instancia}"
+        self.url = url
+        self.url_consulta = url_consulta
+        self.timeout = timeout
+        self.max_simultaneas = max_simultaneas
+        sessao = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=2, pool_maxsize=max_conexoes)
+        sessao.mount('https://', adaptador)
+        sessao.mount('http://', adaptador)
+        self.transporte = _TransporteTribunal(self.rotulo, timeout, session=sessao, timeout=timeout,
+                                              operation_timeout=timeout)
+        self._clientes = {}
+        self._lock = threading.Lock()
+
+    def _cliente(self, url):
+        cliente = self._clientes.get(url)
+        if cliente is None:
+            with self._lock:
+                cliente = self._clientes.get(url)
+                if cliente is None:
+                    cliente = self._clientes[url] = Client(wsdl=url, transport=self.transporte)
+        return cliente
+
+    def cliente(self):
+        """Cliente zeep do serviço de intercomunicação"""
+        return self._cliente(self.url)
+
+    def cliente_consulta(self):
+        """Cliente zeep do serviço ConsultaPJe"""
+        return self._cliente(self.url_consulta)
+
+    @contextmanager
+    def chamada(self, consulta=False, timeout=None):
+        """
+        Obtém vaga no controle de admissão e fornece o cliente (ConsultaPJe
+        se `consulta`); `timeout` (s) substitui o adaptativo. Levanta
+        ExcecaoSobrecarga se não houver vaga a tempo.
+        """
+        with controle_admissao.admitir(self):
+            token = _timeout_chamada.set(timeout)
+            try:
+                yield self.cliente_consulta() if consulta else self.cliente()
+            finally:
+                _timeout_chamada.reset(token)
+
+
+def _url_segundo_grau(url):
+    """URL do PJe de 2º grau derivada da do 1º grau (None se não houver padrão conhecido)"""
+    for primeiro, segundo in (('pje1grau', 'pje2grau'), ('/1g/', '/2g/'), ('pje1g.', 'pje2g.')):
+        if primeiro in url:
+            return url.replace(primeiro, segundo)
+    return None
+
+
+def _resposta_com_sucesso(resposta):
+    """Resposta do MNI que não informa sucesso=False (processo encontrado na instância)"""
+    return resposta is not None and bool(campo_mni(resposta, 'sucesso', True))
+
+
+class RoteadorMNI:
+    """
+    Resolve o tribunal do número CNJ e mantém um EndpointTribunal por URL de
+    WSDL (tribunais sem mapeamento compartilham o endpoint padrão, MNI_URL).
+    O 2º grau só é consultado nos tribunais mapeados (derivado da URL do 1º
+    grau) ou com `url_2g` em MNI_TRIBUNAIS. A instância em que cada processo foi
+    encontrado é lembrada (até MNI_INSTANCIAS_MAX processos); na primeira
+    chamada, as instâncias candidatas são consultadas em paralelo e vale a
+    primeira resposta com sucesso.
+    """
+
+    def __init__(self, mapa=TRIBUNAL_WSDL_MAP, ajustes=MNI_TRIBUNAIS, max_instancias=MNI_INSTANCIAS_MAX):
+        self.mapa = mapa
+        self.ajustes = ajustes
+        self.max_instancias = max_instancias
+        self._endpoints = {}
+        self._endpoints_por_url = {}
+        self._instancias = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def mapeado(self, tribunal):
+        """Se o tribunal tem URL própria (TRIBUNAL_WSDL_MAP ou `url` em MNI_TRIBUNAIS)"""
+        return bool(tribunal) and bool(self.mapa.get(tribunal) or (self.ajustes.get(tribunal) or {}).get('url'))
+
+    def url(self, tribunal, instancia='1g'):
+        """URL do WSDL de intercomunicação do tribunal (MNI_URL se desconhecido); None se não há a instância"""
+        ajuste = self.ajustes.get(tribunal) or {}
+        url = ajuste.get('url') or self.mapa.get(tribunal) or MNI_URL
+        if instancia == '2g':
+            # O 2º grau de MNI_URL não é o do tribunal desconhecido: só com URL própria
+            if ajuste.get('url_2g'):
+                return ajuste['url_2g']
+            return _url_segundo_grau(url) if self.mapeado(tribunal) else None
+        return url
+
+    def url_consulta(self, tribunal, instancia='1g'):
+        """URL do WSDL do ConsultaPJe do tribunal"""
+        ajuste = self.ajustes.get(tribunal) or {}
+        url = self.url(tribunal, instancia)
+        configurada = ajuste.get('url_consulta' if instancia == '1g' else 'url_consulta_2g')
+        if configurada or not url:
+            return configurada or None
+        if url == MNI_URL:
+            return MNI_CONSULTA_URL
+        return url.replace('intercomunicacao', 'ConsultaPJe')
+
+    def instancias(self, tribunal):
+        """Instâncias do tribunal com endpoint conhecido, na ordem de preferência"""
+        return [instancia for instancia in INSTANCIAS if self.url(tribunal, instancia)]
+
+    def endpoint(self, tribunal, instancia='1g'):
+        """
+        Endpoint do tribunal (J.TR) na instância; tribunal None para o endpoint
+        padrão. Tribunais com as mesmas URLs compartilham o endpoint (e o WSDL
+        carregado), de modo que os não mapeados usam todos o padrão.
+        """
+        chave = (tribunal, instancia)
+        endpoint = self._endpoints.get(chave)
+        if endpoint is None:
+            with self._lock:
+                endpoint = self._endpoints.get(chave)
+                if endpoint is None:
+                    urls = (self.url(tribunal, instancia), self.url_consulta(tribunal, instancia))
+                    endpoint = self._endpoints_por_url.get(urls)
+                    if endpoint is None:
+                        ajuste = self.ajustes.get(tribunal) or {}
+                        endpoint = self._endpoints_por_url[urls] = EndpointTribunal(
+                            tribunal if self.mapeado(tribunal) else None, *urls,
+                            instancia=instancia,
+                            timeout=float(ajuste.get('timeout', MNI_TIMEOUT)),
+                            max_conexoes=int(ajuste.get('max_conexoes', MNI_CONEXOES_POR_TRIBUNAL)),
+                            max_simultaneas=int(ajuste.get('max_simultaneas', MNI_MAX_POR_TRIBUNAL)),
+                        )
+                        logger.info(f"Endpoint MNI {endpoint.rotulo}: {endpoint.url}")
+                    self._endpoints[chave] = endpoint
+        return endpoint
+
+    def metricas(self):
+        """Latências e timeouts em vigor por endpoint e operação, e a ocupação da admissão"""
+        with self._lock:
+            endpoints = list(self._endpoints_por_url.values())
+        return {
+            'latencias': latencias_mni.resumo({endpoint.rotulo: endpoint.timeout for endpoint in endpoints}),
+            'admissao': controle_admissao.resumo(),
+        }
+
+    def instancia_processo(self, numero_processo):
+        """Instância em que o processo foi encontrado por último (None se desconhecida)"""
+        with self._lock:
+            return self._instancias.get(_digitos(numero_processo))
+
+    def _lembrar_instancia(self, numero_processo, instancia):
+        with self._lock:
+            chave = _digitos(numero_processo)
+            self._instancias[chave] = instancia
+            self._instancias.move_to_end(chave)
+            while len(self._instancias) > self.max_instancias:
+                self._instancias.popitem(last=False)
+
+    def _esquecer_instancia(self, numero_processo):
+        with self._lock:
+            self._instancias.pop(_digitos(numero_processo), None)
+
+    def para_processo(self, numero_processo):
+        """Endpoint do processo: instância lembrada ou 1º grau (o padrão se o número for inválido)"""
+        return self.endpoint(codigo_tribunal(numero_processo), self.instancia_processo(numero_processo) or '1g')
+
+    def executar(self, numero_processo, operacao, consulta=False, timeout=None, sucesso=_resposta_com_sucesso):
+        """
+        Executa `operacao(cliente)` no endpoint do processo e retorna a resposta.
+        Com a instância ainda desconhecida (ou se ela deixou de encontrar o
+        processo), consulta as instâncias candidatas em paralelo, fica com a
+        primeira resposta em que `sucesso(resposta)` e lembra a instância.
+        """
+        tribunal = codigo_tribunal(numero_processo)
+        instancia = self.instancia_processo(numero_processo)
+        if instancia:
+            with self.endpoint(tribunal, instancia).chamada(consulta=consulta, timeout=timeout) as cliente:
+                resposta = operacao(cliente)
+            if sucesso(resposta):
+                return resposta
+            self._esquecer_instancia(numero_processo)
+
+        candidatas = self.instancias(tribunal)
+        if len(candidatas) == 1 or tribunal is None:
+            with self.endpoint(tribunal, candidatas[0]).chamada(consulta=consulta, timeout=timeout) as cliente:
+                return operacao(cliente)
+        return self._descobrir(numero_processo, tribunal, candidatas, operacao, consulta, timeout, sucesso)
+
+    def _descobrir(self, numero_processo, tribunal, candidatas, operacao, consulta, timeout, sucesso):
+        encerrada = threading.Event()
+
+        def consultar(instancia):
+            # Instâncias que ainda não começaram depois de uma resposta com sucesso não são consultadas
+            if encerrada.is_set():
+                return None
+            with self.endpoint(tribunal, instancia).chamada(consulta=consulta, timeout=timeout) as cliente:
+                return operacao(cliente)
+
+        # Cada consulta leva uma cópia do contexto (prazo da requisição) para a thread do executor
+        executor = self._executor_descoberta()
+        futuros = {
+            executor.submit(contextvars.copy_context().run, consultar, instancia): instancia
+            for instancia in candidatas
+        }
+        respostas, erros = {}, []
+        try:
+            for futuro in concurrent.futures.as_completed(futuros):
+                instancia = futuros[futuro]
+                try:
+                    resposta = futuro.result()
+                except Exception as e:
+                    erros.append(e)
+                    continue
+                if sucesso(resposta):
+                    encerrada.set()
+                    self._lembrar_instancia(numero_processo, instancia)
+                    logger.debug(f"Processo {numero_processo} encontrado no {instancia} do tribunal {tribunal}")
+                    return resposta
+                respostas[instancia] = resposta
+        finally:
+            encerrada.set()
+            for futuro in futuros:
+                futuro.cancel()
+
+        # Nenhuma instância encontrou o processo: resposta da instância preferida, se houver
+        for instancia in candidatas:
+            if instancia in respostas:
+                return respostas[instancia]
+        raise erros[0]
+
+    def _executor_descoberta(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=MNI_DESCOBERTA_WORKERS,
+                                                    thread_name_prefix='mni-descoberta')
+            return self._executor
+
+
+# Instância global do roteamento MNI
+roteador_mni = RoteadorMNI()
+
+
+def retorna_processo(numero_processo, cpf=None, senha=None, cache=True, timeout=None, incluir_documentos=False,
+                     data_referencia=None):
     """
     Retorna o dicionário bruto do processo MNI (consultarProcesso).
-    Usa Zeep para chamada SOAP e parse via serialize_object ou xmltodict.
+    Usa Zeep para chamada SOAP (no endpoint do tribunal do processo, ver
+    roteador_mni) e parse via serialize_object ou xmltodict.
     Parâmetros:
       - numero_processo: str, número no formato 'NNNNNNN-NN.AAAA.8.XX.YYYY'
       - cpf: opcional, CPF do consultante. Se None, pega de MNI_ID_CONSULTANTE.
       - senha: opcional, Senha do consultante. Se None, pega de MNI_SENHA_CONSULTANTE.
       - cache: bool, se usar cache local (pandas/HDF5). Se True, tenta ler de cache antes de chamar MNI.
-      - timeout: int, timeout em segundos para a chamada SOAP.
+      - timeout: opcional, timeout em segundos da chamada SOAP (padrão: o do tribunal).
       - incluir_documentos: bool, se True inclui dados completos dos documentos na resposta.
+      - data_referencia: opcional, 'AAAAMMDDHHMMSS'; o MNI retorna apenas movimentos e
+        documentos posteriores a essa data (o cabeçalho vem completo). Não usa o cache.
     Retorna: dicionário Python com todos os campos brutos do processo.
     """
     if not cpf:
@@ -38,6 +526,10 @@ def retorna_processo(numero_processo, cpf=None, senha=None, cache=True, timeout=
     if not senha:
         senha = MNI_SENHA_CONSULTANTE
 
+    # Respostas parciais (com data de referência) não vão para o cache
+    if data_referencia:
+        cache = False
+
     # Parte de cache com pandas/HDF
     try:
         cache_file = f'cache_{numero_processo.replace("/", "_")}.h5'
@@ -49,22 +541,22 @@ def retorna_processo(numero_processo, cpf=None, senha=None, cache=True, timeout=
     except Exception as e:
         logger.debug(f"Falha ao ler cache: {e}")
 
-    # Monta o client Zeep para o WSDL
-    try:
-        client = Client(wsdl=MNI_URL)
-    except Exception as e:
-        logger.exception("Falha ao criar cliente Zeep")
-        raise ExcecaoConsultaMNI("Erro ao inicializar cliente SOAP")
+    parametros = {}
+    if data_referencia:
+        parametros['dataReferencia'] = data_referencia
 
     try:
-        resposta = client.service.consultarProcesso(
+        resposta = roteador_mni.executar(numero_processo, lambda client: client.service.consultarProcesso(
             idConsultante=cpf,
             senhaConsultante=senha,
             numeroProcesso=numero_processo,
             movimentos=True,
             incluirCabecalho=True,
-            incluirDocumentos=incluir_documentos
-        )
+            incluirDocumentos=incluir_documentos,
+            **parametros
+        ), timeout=timeout)
+    except (ExcecaoPrazoEsgotado, ExcecaoSobrecarga):
+        raise
     except Exception as e:
         logger.exception("Falha ao chamar consultarProcesso")
         raise ExcecaoConsultaMNI(f"Erro na chamada SOAP: {e}")
@@ -76,7 +568,7 @@ def retorna_processo(numero_processo, cpf=None, senha=None, cache=True, timeout=
         # Fallback: parse via xmltodict
         try:
             import xmltodict
-            xml_envelope = client.wsdl.transport._last_received["envelope"]
+            xml_envelope = roteador_mni.para_processo(numero_processo).cliente().wsdl.transport._last_received["envelope"]
             dados_brutos = xmltodict.parse(xml_envelope)
         except Exception as ex:
             logger.exception("Falha ao parsear resposta SOAP via xmltodict")
@@ -93,6 +585,37 @@ def retorna_processo(numero_processo, cpf=None, senha=None, cache=True, timeout=
     return dados_brutos
 
 
+
+def retorna_avisos_pendentes(cpf=None, senha=None, data_referencia=None):
+    """
+    Retorna o dicionário bruto da resposta do consultarAvisosPendentes
+    (intimações e citações ainda sem ciência do consultante).
+    Parâmetros:
+      - cpf, senha: credenciais MNI (padrão: MNI_ID_CONSULTANTE / MNI_SENHA_CONSULTANTE)
+      - data_referencia: opcional, 'AAAAMMDDHHMMSS'; apenas avisos posteriores a essa data
+    """
+    if not cpf:
+        cpf = MNI_ID_CONSULTANTE
+    if not senha:
+        senha = MNI_SENHA_CONSULTANTE
+
+    parametros = {}
+    if data_referencia:
+        parametros['dataReferencia'] = data_referencia
+
+    try:
+        with roteador_mni.endpoint(None).chamada() as client:
+            resposta = client.service.consultarAvisosPendentes(
+                idConsultante=cpf,
+                senhaConsultante=senha,
+                **parametros
+            )
+    except Exception as e:
+        logger.exception("Falha ao chamar consultarAvisosPendentes")
+        raise ExcecaoConsultaMNI(f"Erro na chamada SOAP de avisos pendentes: {e}")
+
+    return serialize_object(resposta)
+
 def retorna_documento_processo(num_processo, id_doc, cpf=None, senha=None):
     """
     Faz a chamada SOAP consultarTeorComunicacao para obter o binário de um documento.
@@ -108,13 +631,14 @@ def retorna_documento_processo(num_processo, id_doc, cpf=None, senha=None):
         senha = MNI_SENHA_CONSULTANTE
 
     try:
-        client = Client(wsdl=MNI_CONSULTA_URL)
-        resposta = client.service.consultarTeorComunicacao(
+        resposta = roteador_mni.executar(num_processo, lambda client: client.service.consultarTeorComunicacao(
             numeroProcesso=num_processo,
             idComunicacao=id_doc,
             idConsultante=cpf,
             senhaConsultante=senha
-        )
+        ), consulta=True)
+    except (ExcecaoPrazoEsgotado, ExcecaoSobrecarga):
+        raise
     except Exception as e:
         logger.exception("Falha ao chamar consultarTeorComunicacao")
         raise ExcecaoConsultaMNI(f"Erro na chamada SOAP de documento: {e}")
@@ -144,12 +668,13 @@ def retorna_peticao_inicial_e_anexos(num_processo, cpf=None, senha=None):
         senha = MNI_SENHA_CONSULTANTE
 
     try:
-        client = Client(wsdl=MNI_URL)
-        resposta = client.service.consultarPeticaoInicialComAnexos(
+        resposta = roteador_mni.executar(num_processo, lambda client: client.service.consultarPeticaoInicialComAnexos(
             numeroProcesso=num_processo,
             idConsultante=cpf,
             senhaConsultante=senha
-        )
+        ))
+    except (ExcecaoPrazoEsgotado, ExcecaoSobrecarga):
+        raise
     except Exception as e:
         logger.exception("Falha ao chamar consultarPeticaoInicialComAnexos")
         raise ExcecaoConsultaMNI(f"Erro na chamada SOAP de petição: {e}")
@@ -160,7 +685,7 @@ def retorna_peticao_inicial_e_anexos(num_processo, cpf=None, senha=None):
         # Se serialize falhar, converte via xmltodict
         try:
             import xmltodict
-            xml_data = client.wsdl.transport._last_received["envelope"]
+            xml_data = roteador_mni.para_processo(num_processo).cliente().wsdl.transport._last_received["envelope"]
             return xmltodict.parse(xml_data)
         except Exception:
             return {}
@@ -0,0 +1,256 @@
+"""
+Fila de jobs para operações longas (download em massa, cópia integral,
+consulta em lote), fora dos workers que atendem requisições.
+
+- Os jobs ficam na tabela `job` do banco (models.Job) e sobrevivem a
+  reinícios: um job 'executando' sem sinal de vida há JOBS_HEARTBEAT_EXPIRA
+  segundos volta para 'pendente'.
+- Cada instância da aplicação roda JOBS_WORKERS threads que buscam jobs
+  pendentes; a reserva é atômica (UPDATE ... WHERE status = 'pendente'), de
+  modo que vários workers do gunicorn podem compartilhar a mesma fila.
+- As credenciais MNI do job são gravadas cifradas (Fernet, chave derivada da
+  SECRET_KEY) e apagadas ao final.
+- Os executores de cada tipo de job são registrados com @registrar_executor;
+  recebem um ContextoJob com parâmetros, credenciais, progresso e cancelamento.
+"""
+import datetime
+import logging
+import os
+import threading
+import time
+
+from config import DOCUMENTOS_DIR, JOBS_HEARTBEAT_EXPIRA, JOBS_INTERVALO, JOBS_WORKERS
+from credenciais import cifrar_credenciais, decifrar_credenciais
+from database import db
+from downloader import BaixadorDocumentos
+from models import Job
+
+logger = logging.getLogger(__name__)
+
+JOBS_DIR = os.path.join(DOCUMENTOS_DIR, '_jobs')
+
+STATUS_FINAIS = ('concluido', 'falhou', 'cancelado')
+
+# Intervalo mínimo (s) entre gravações de progresso / consultas de cancelamento
+_INTERVALO_ATUALIZACAO = 1.0
+
+# Executores registrados por tipo de job, com os parâmetros obrigatórios
+EXECUTORES = {}
+_PARAMETROS_OBRIGATORIOS = {}
+
+
+class JobCancelado(Exception):
+    """Levantada pelo executor quando o cancelamento do job foi solicitado"""
+
+
+def registrar_executor(tipo, obrigatorios=()):
+    """Decorator que registra a função executora de um tipo de job"""
+    def decorator(funcao):
+        EXECUTORES[tipo] = funcao
+        _PARAMETROS_OBRIGATORIOS[tipo] = obrigatorios
+        return funcao
+    return decorator
+
+
+def validar_job(tipo, parametros):
+    """Lança ValueError se o tipo não existe ou faltam parâmetros obrigatórios"""
+    if tipo not in EXECUTORES:
+        raise ValueError(f"Tipo de job inválido; use um de: {', '.join(sorted(EXECUTORES))}")
+    if not isinstance(parametros, dict):
+        raise ValueError('parametros deve ser um objeto')
+    faltando = [nome for nome in _PARAMETROS_OBRIGATORIOS[tipo] if not parametros.get(nome)]
+    if faltando:
+        raise ValueError(f"Parâmetros obrigatórios ausentes: {', '.join(faltando)}")
+
+
+def _agora():
+    return datetime.datetime.utcnow()
+
+
+class ContextoJob:
+    """Interface do executor com o job: parâmetros, credenciais, progresso e cancelamento"""
+
+    def __init__(self, fila, job_id, parametros, cpf, senha):
+        self.fila = fila
+        self.job_id = job_id
+        self.parametros = parametros
+        self.cpf = cpf
+        self.senha = senha
+        self.diretorio = os.path.join(JOBS_DIR, str(job_id))
+        self._ultima_gravacao = 0.0
+        self._ultima_consulta = 0.0
+        self._cancelado = False
+
+    def progresso(self, dados, forcar=False):
+        """Grava o progresso do job (no máximo uma vez por segundo, salvo `forcar`)"""
+        agora = time.monotonic()
+        if forcar or agora - self._ultima_gravacao >= _INTERVALO_ATUALIZACAO:
+            self._ultima_gravacao = agora
+            self.fila.atualizar(self.job_id, progresso=dados, heartbeat_at=_agora())
+
+    def cancelado(self):
+        """Indica se o cancelamento foi solicitado (consulta o banco no máximo uma vez por segundo)"""
+        agora = time.monotonic()
+        if not self._cancelado and agora - self._ultima_consulta >= _INTERVALO_ATUALIZACAO:
+            self._ultima_consulta = agora
+            self._cancelado = self.fila.cancelamento_solicitado(self.job_id)
+        return self._cancelado
+
+    def verificar_cancelamento(self):
+        """Levanta JobCancelado se o cancelamento foi solicitado"""
+        if self.cancelado():
+            raise JobCancelado()
+
+
+class FilaJobs:
+    """Fila de jobs persistida no banco, com threads executoras"""
+
+    def __init__(self):
+        self.app = None
+        self._threads = []
+        self._parar = threading.Event()
+
+    def init_app(self, app, workers=JOBS_WORKERS):
+        self.app = app
+        if workers <= 0:
+            return
+        for i in range(workers):
+            thread = threading.Thread(target=self._laco, name=f'jobs-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    # ------------------------------------------------------------------
+    # Operações sobre jobs (usadas pelas rotas)
+    # ------------------------------------------------------------------
+
+    def criar(self, api_key, tipo, parametros, cpf=None, senha=None):
+        """Enfileira um job do `tipo` para o dono da `api_key`"""
+        job = Job(
+            user_id=api_key.user_id,
+            api_key_id=api_key.id,
+            tipo=tipo,
+            parametros=parametros,
+            credenciais=cifrar_credenciais(self.app.config['SECRET_KEY'], cpf, senha),
+        )
+        db.session.add(job)
+        db.session.commit()
+        return job
+
+    def cancelar(self, job):
+        """
+        Cancela um job pendente imediatamente; um job em execução é
+        sinalizado e interrompido pelo executor no próximo ponto de verificação.
+        """
+        if job.status == 'pendente':
+            job.status = 'cancelado'
+            job.finished_at = _agora()
+            job.credenciais = None
+        elif job.status == 'executando':
+            job.cancelamento_solicitado = True
+        db.session.commit()
+        return job
+
+    # ------------------------------------------------------------------
+    # Execução
+    # ------------------------------------------------------------------
+
+    def atualizar(self, job_id, **campos):
+        with self.app.app_context():
+            db.session.query(Job).filter(Job.id == job_id).update(campos, synchronize_session=False)
+            db.session.commit()
+
+    def cancelamento_solicitado(self, job_id):
+        with self.app.app_context():
+            return bool(db.session.query(Job.cancelamento_solicitado).filter(Job.id == job_id).scalar())
+
+    def _recuperar_abandonados(self):
+        """Devolve à fila jobs 'executando' cujo worker parou de dar sinal de vida"""
+        limite = _agora() - datetime.timedelta(seconds=JOBS_HEARTBEAT_EXPIRA)
+        recuperados = db.session.query(Job).filter(
+            Job.status == 'executando', Job.heartbeat_at < limite
+        ).update({'status': 'pendente'}, synchronize_session=False)
+        db.session.commit()
+        if recuperados:
+            logger.warning(f"{recuperados} job(s) abandonado(s) devolvido(s) à fila")
+
+    def _reservar(self):
+        """Reserva atomicamente o job pendente mais antigo; retorna seu ID ou None"""
+        candidatos = db.session.query(Job.id).filter(
+            Job.status == 'pendente', Job.tipo.in_(list(EXECUTORES))
+        ).order_by(Job.created_at).limit(5).all()
+        for (job_id,) in candidatos:
+            agora = _agora()
+            reservado = db.session.query(Job).filter(
+                Job.id == job_id, Job.status == 'pendente'
+            ).update({'status': 'executando', 'started_at': agora, 'heartbeat_at': agora},
+                     synchronize_session=False)
+            db.session.commit()
+            if reservado:
+                return job_id
+        return None
+
+    def _laco(self):
+        while not self._parar.is_set():
+            try:
+                with self.app.app_context():
+                    self._recuperar_abandonados()
+                    job_id = self._reservar()
+                if job_id is not None:
+                    self._executar(job_id)
+                    continue
+            except Exception:
+                logger.exception("Erro no laço da fila de jobs")
+            self._parar.wait(JOBS_INTERVALO)
+
+    def _executar(self, job_id):
+        with self.app.app_context():
+            job = db.session.get(Job, job_id)
+            tipo, parametros = job.tipo, dict(job.parametros or {})
+            cpf, senha = decifrar_credenciais(self.app.config['SECRET_KEY'], job.credenciais)
+
+        contexto = ContextoJob(self, job_id, parametros, cpf, senha)
+        logger.info(f"Job {job_id} ({tipo}) iniciado")
+
+        # Sinal de vida independente do progresso (ex.: mesclagem longa de PDFs)
+        finalizado = threading.Event()
+
+        def sinal_de_vida():
+            while not finalizado.wait(JOBS_HEARTBEAT_EXPIRA / 3):
+                self.atualizar(job_id, heartbeat_at=_agora())
+
+        threading.Thread(target=sinal_de_vida, name=f'job-{job_id}-heartbeat', daemon=True).start()
+
+        campos = {'credenciais': None}
+        try:
+            resultado, artefato = EXECUTORES[tipo](contexto)
+            campos.update(status='concluido', resultado=resultado, artefato=artefato)
+        except JobCancelado:
+            campos.update(status='cancelado')
+        except Exception as e:
+            logger.exception(f"Job {job_id} ({tipo}) falhou")
+            campos.update(status='falhou', erro=str(e))
+        finally:
+            finalizado.set()
+        campos['finished_at'] = _agora()
+        self.atualizar(job_id, **campos)
+        logger.info(f"Job {job_id} ({tipo}) finalizado: {campos['status']}")
+
+
+# Instância global da fila de jobs
+fila_jobs = FilaJobs()
+
+
+@registrar_executor('download', obrigatorios=('processos',))
+def executar_download(contexto):
+    """Download em massa dos documentos de `processos` para o armazém local"""
+    baixador = BaixadorDocumentos(cpf=contexto.cpf, senha=contexto.senha)
+
+    def ao_progredir(resumo):
+        contexto.progresso(resumo)
+        if contexto.cancelado():
+            baixador.cancelado.set()
+
+    baixador.ao_progredir = ao_progredir
+    resultado = baixador.baixar(contexto.parametros['processos'])
+    contexto.verificar_cancelamento()
+    return resultado, None
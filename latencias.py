@@ -0,0 +1,152 @@
+"""
+Latências das chamadas ao MNI por endpoint (tribunal e instância) e
+operação, e os timeouts adaptativos derivados delas.
+
+- Cada chamada SOAP registra sua duração em um histograma deslizante
+  (LATENCIA_JANELA segundos, em LATENCIA_FATIAS fatias que expiram
+  separadamente), com faixas logarítmicas de 50 ms a ~10 min.
+- Timeout de leitura: percentil LATENCIA_PERCENTIL da operação no endpoint
+  multiplicado por LATENCIA_FATOR, limitado a [LATENCIA_TIMEOUT_MIN, teto],
+  onde o teto é o timeout configurado do endpoint (MNI_TIMEOUT ou
+  MNI_TRIBUNAIS). Timeout de conexão: mediana do endpoint (todas as
+  operações) vezes LATENCIA_FATOR, limitada a [LATENCIA_CONEXAO_MIN,
+  LATENCIA_CONEXAO_MAX].
+- Com menos de LATENCIA_AMOSTRAS_MIN amostras vale o timeout configurado.
+- Uma chamada que estoura o timeout entra no histograma com a duração do
+  timeout, para que um endpoint lento (mas saudável) tenha o limite elevado.
+"""
+import bisect
+import threading
+import time
+
+from config import (LATENCIA_AMOSTRAS_MIN, LATENCIA_CONEXAO_MAX, LATENCIA_CONEXAO_MIN, LATENCIA_FATIAS,
+                    LATENCIA_FATOR, LATENCIA_JANELA, LATENCIA_PERCENTIL, LATENCIA_TIMEOUT_MIN)
+
+# Limites superiores (s) das faixas do histograma: 50 ms * 1.25^i
+FAIXAS = [round(0.05 * 1.25 ** i, 3) for i in range(53)]
+
+
+class HistogramaLatencia:
+    """Histograma de durações nos últimos `janela` segundos, em `fatias` rotativas"""
+
+    def __init__(self, janela=LATENCIA_JANELA, fatias=LATENCIA_FATIAS):
+        self.duracao_fatia = janela / fatias
+        self._fatias = [[0] * (len(FAIXAS) + 1) for _ in range(fatias)]
+        self._inicio_fatias = [0.0] * fatias
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def _fatia_atual(self, agora):
+        numero = int(agora // self.duracao_fatia)
+        i = numero % len(self._fatias)
+        inicio = numero * self.duracao_fatia
+        if self._inicio_fatias[i] != inicio:
+            # Fatia de uma volta anterior da janela: descarta as contagens antigas
+            self._fatias[i] = [0] * (len(FAIXAS) + 1)
+            self._inicio_fatias[i] = inicio
+        return self._fatias[i]
+
+    def registrar(self, duracao, timeout=False):
+        with self._lock:
+            self._fatia_atual(time.monotonic())[bisect.bisect_left(FAIXAS, duracao)] += 1
+            if timeout:
+                self.timeouts += 1
+
+    def contagens(self):
+        """Contagens por faixa somadas sobre as fatias ainda dentro da janela"""
+        with self._lock:
+            agora = time.monotonic()
+            limite = agora - self.duracao_fatia * len(self._fatias)
+            total = [0] * (len(FAIXAS) + 1)
+            for inicio, fatia in zip(self._inicio_fatias, self._fatias):
+                if inicio > limite:
+                    total = [a + b for a, b in zip(total, fatia)]
+            return total
+
+
+def somar(contagens):
+    return [sum(valores) for valores in zip(*contagens)] if contagens else [0] * (len(FAIXAS) + 1)
+
+
+def percentil(contagens, p):
+    """Limite superior da faixa que contém o percentil `p` (0-100); None sem amostras"""
+    total = sum(contagens)
+    if not total:
+        return None
+    alvo = total * p / 100
+    acumulado = 0
+    for i, quantidade in enumerate(contagens):
+        acumulado += quantidade
+        if acumulado >= alvo:
+            return FAIXAS[min(i, len(FAIXAS) - 1)]
+    return FAIXAS[-1]
+
+
+def _limitar(valor, minimo, maximo):
+    return max(minimo, min(valor, maximo))
+
+
+class LatenciasMNI:
+    """Histogramas de latência por (endpoint, operação) e timeouts derivados"""
+
+    def __init__(self):
+        self._histogramas = {}
+        self._lock = threading.Lock()
+
+    def _histograma(self, endpoint, operacao):
+        chave = (endpoint, operacao)
+        histograma = self._histogramas.get(chave)
+        if histograma is None:
+            with self._lock:
+                histograma = self._histogramas.setdefault(chave, HistogramaLatencia())
+        return histograma
+
+    def registrar(self, endpoint, operacao, duracao, timeout=False):
+        self._histograma(endpoint, operacao).registrar(duracao, timeout)
+
+    def _contagens_endpoint(self, endpoint):
+        with self._lock:
+            histogramas = [h for (t, _), h in self._histogramas.items() if t == endpoint]
+        return somar([h.contagens() for h in histogramas])
+
+    def timeouts(self, endpoint, operacao, teto):
+        """
+        (conexão, leitura) em segundos para a operação no endpoint, ou None
+        enquanto não há amostras suficientes.
+        """
+        contagens = self._histograma(endpoint, operacao).contagens()
+        if sum(contagens) < LATENCIA_AMOSTRAS_MIN:
+            return None
+        leitura = _limitar(percentil(contagens, LATENCIA_PERCENTIL) * LATENCIA_FATOR,
+                           min(LATENCIA_TIMEOUT_MIN, teto), teto)
+        mediana = percentil(self._contagens_endpoint(endpoint), 50)
+        conexao = _limitar(mediana * LATENCIA_FATOR, LATENCIA_CONEXAO_MIN, LATENCIA_CONEXAO_MAX)
+        return min(conexao, leitura), leitura
+
+    def resumo(self, tetos=None):
+        """Percentis, timeouts estourados e timeouts em vigor por endpoint e operação"""
+        tetos = tetos or {}
+        with self._lock:
+            chaves = sorted(self._histogramas, key=lambda c: (c[0] or '', c[1]))
+        resumo = []
+        for endpoint, operacao in chaves:
+            histograma = self._histograma(endpoint, operacao)
+            contagens = histograma.contagens()
+            item = {
+                'endpoint': endpoint,
+                'operacao': operacao,
+                'amostras': sum(contagens),
+                'p50': percentil(contagens, 50),
+                'p90': percentil(contagens, 90),
+                'p99': percentil(contagens, 99),
+                'timeoutsEstourados': histograma.timeouts,
+            }
+            if endpoint in tetos:
+                adaptativo = self.timeouts(endpoint, operacao, tetos[endpoint])
+                item['timeoutConexao'], item['timeoutLeitura'] = adaptativo or (None, tetos[endpoint])
+            resumo.append(item)
+        return resumo
+
+
+# Instância global das latências do MNI
+latencias_mni = LatenciasMNI()
@@ -1,23 +1,39 @@
 import os
 import logging
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, Response, jsonify, request, send_file, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
 import requests
-from zeep import Client
-from zeep.transports import Transport
 from lxml import etree
 from flask_login import LoginManager
 from routes.api import api as api_bp
 from routes.web import web as web_bp
 from routes.auth import auth as auth_bp
 import database
+from avisos import avisos_pendentes
+from cache_processos import cache_processos
+from middleware import LimitesTribunal, init_compressao, sem_compressao, validate_processo_number
+from funcoes_mni import codigo_tribunal, intercalar_por_tribunal, roteador_mni
+from copia_integral import POLITICAS_NAO_PDF, ExcecaoDocumentoNaoPdf, gerar_copia_integral
+from exportacao import gerar_zip_documentos
+from controle.exceptions import ExcecaoConsultaMNI, ExcecaoPrazoEsgotado, ExcecaoSobrecarga
+from jobs import fila_jobs, registrar_executor
+from monitoramento import monitor_processos
+from movimentos import ler_limite_data
+from paginacao import ler_limite
+from prazos import gerador_com_prazo, init_prazos
+from processos import chave_snapshot_processo, obter_snapshot_processo
+from projecao import parse_campos, aplicar_projecao
+from respostas import calcular_etag, linha_ndjson, resposta_json, resposta_nao_modificada
+from config import BATCH_MAX_PROCESSOS, BATCH_WORKERS, CONSULTA_MAX_POR_TRIBUNAL
 import base64
+import contextvars
 from datetime import datetime
 import json
 import io
-from PyPDF2 import PdfMerger
 import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -57,6 +73,21 @@ app.register_blueprint(web_bp)
 app.register_blueprint(api_bp)
 app.register_blueprint(auth_bp, url_prefix='/auth')
 
+# Compressão gzip/brotli/zstd negociada via Accept-Encoding para todas as rotas
+init_compressao(app)
+
+# Prazo da requisição (X-Request-Timeout / X-Request-Deadline) para as chamadas ao MNI
+init_prazos(app)
+
+@app.errorhandler(ExcecaoSobrecarga)
+def sobrecarga_mni(e):
+    """Chamada ao MNI recusada pelo controle de admissão (ver funcoes_mni.ControleAdmissao)"""
+    return jsonify({
+        'sucesso': False,
+        'erro': 'SOBRECARGA',
+        'mensagem': str(e)
+    }), 503, {'Retry-After': str(e.retry_after)}
+
 with app.app_context():
     # Import models to ensure tables are created
     import models  # noqa: F401
@@ -67,95 +98,140 @@ logger.debug("Rotas registradas:")
 for rule in app.url_map.iter_rules():
     logger.debug(f"{rule.endpoint}: {rule.rule}")
 
-# Mapeamento de tribunais por código
-TRIBUNAL_WSDL_MAP = {
-    '8.06': 'https://pje.tjce.jus.br/pje1grau/intercomunicacao?wsdl',  # TJCE
-    '8.02': 'https://pje.tjal.jus.br/pje1grau/intercomunicacao?wsdl',  # TJAL
-    '8.05': 'https://pje.tjba.jus.br/pje1grau/intercomunicacao?wsdl',  # TJBA
-    '8.13': 'https://pje.tjmg.jus.br/pje/intercomunicacao?wsdl',      # TJMG
-    '8.26': 'https://pje.tjsp.jus.br/pje/intercomunicacao?wsdl',      # TJSP
-    '8.15': 'https://pje.tjpb.jus.br/pje1grau/intercomunicacao?wsdl', # TJPB
-    '8.17': 'https://pje.tjpe.jus.br/pje1grau/intercomunicacao?wsdl', # TJPE
-    '8.18': 'https://pje.tjpr.jus.br/pje1grau/intercomunicacao?wsdl', # TJPR
-    '8.19': 'https://pje.tjrj.jus.br/pje1grau/intercomunicacao?wsdl', # TJRJ
-    '8.20': 'https://pje.tjrn.jus.br/pje1grau/intercomunicacao?wsdl', # TJRN
-    '8.21': 'https://pje.tjrs.jus.br/pje1grau/intercomunicacao?wsdl', # TJRS
-    '8.24': 'https://pje.tjsc.jus.br/pje1grau/intercomunicacao?wsdl', # TJSC
-    '8.25': 'https://pje.tjse.jus.br/pje1grau/intercomunicacao?wsdl', # TJSE
-    '4.01': 'https://pje1g.trf1.jus.br/pje/intercomunicacao?wsdl',    # TRF1
-    '4.02': 'https://pje.trf2.jus.br/pje/intercomunicacao?wsdl',      # TRF2
-    '4.03': 'https://pje1g.trf3.jus.br/pje/intercomunicacao?wsdl',    # TRF3
-    '4.04': 'https://pje.trf4.jus.br/pje/intercomunicacao?wsdl',      # TRF4
-    '4.05': 'https://pje.trf5.jus.br/pje/intercomunicacao?wsdl',      # TRF5
-}
-
 def get_tribunal_from_numero_cnj(numero_processo):
     """Extrai o código do tribunal do número CNJ do processo"""
-    try:
-        # Remove pontos e traços se houver
-        numero_limpo = numero_processo.replace('.', '').replace('-', '')
-        
-        # O código do tribunal está nas posições 13-16 (0-indexed)
-        if len(numero_limpo) >= 16:
-            codigo_tribunal = f"{numero_limpo[13]}.{numero_limpo[14:16]}"
-            return codigo_tribunal
-        
+    codigo = codigo_tribunal(numero_processo)
+    if not codigo:
         logger.error(f"Número do processo inválido: {numero_processo}")
-        return None
-    except Exception as e:
-        logger.error(f"Erro ao extrair tribunal: {str(e)}")
-        return None
+    return codigo
 
 def get_wsdl_url(numero_processo):
     """Obtém a URL WSDL do tribunal correto baseado no número do processo"""
-    codigo_tribunal = get_tribunal_from_numero_cnj(numero_processo)
-    if codigo_tribunal and codigo_tribunal in TRIBUNAL_WSDL_MAP:
-        return TRIBUNAL_WSDL_MAP[codigo_tribunal]
+    return roteador_mni.url(get_tribunal_from_numero_cnj(numero_processo))
+
+# Consultas simultâneas ao MNI por tribunal nas consultas em lote
+limites_consulta_tribunal = LimitesTribunal(CONSULTA_MAX_POR_TRIBUNAL)
+
+def _consultar_item_lote(numero_processo, cpf, senha):
+    with limites_consulta_tribunal.semaforo(codigo_tribunal(numero_processo)):
+        return obter_snapshot_processo(numero_processo, cpf, senha)
+
+def gerar_consulta_lote(numeros, cpf, senha, campos=None):
+    """
+    Gera as linhas NDJSON da consulta em lote: primeiro os números inválidos e
+    os processos já em cache, depois os demais à medida que as consultas ao MNI
+    (concorrentes, limitadas por tribunal) terminam. A última linha é o resumo.
+    """
+    inicio = time.monotonic()
+    contagem = {'cache': 0, 'consultados': 0, 'erros': 0}
+
+    def item(numero, snapshot=None, erro=None, mensagem=None, cache=False):
+        if snapshot is None:
+            contagem['erros'] += 1
+            return linha_ndjson({'numero': numero, 'sucesso': False, 'erro': erro, 'mensagem': mensagem})
+        contagem['cache' if cache else 'consultados'] += 1
+        return linha_ndjson({
+            'numero': numero,
+            'sucesso': True,
+            'cache': cache,
+            'processo': aplicar_projecao(snapshot.processo, campos)
+        })
+
+    pendentes = []
+    for numero in numeros:
+        valido, mensagem = validate_processo_number(numero)
+        if not valido:
+            yield item(numero, erro='NUMERO_INVALIDO', mensagem=mensagem)
+            continue
+        snapshot = cache_processos.obter(chave_snapshot_processo(numero, cpf, senha))
+        if snapshot:
+            yield item(numero, snapshot, cache=True)
+        else:
+            pendentes.append(numero)
+
+    if pendentes:
+        executor = ThreadPoolExecutor(max_workers=min(BATCH_WORKERS, len(pendentes)))
+        try:
+            # Cada consulta leva o prazo da requisição (prazos.py) para a thread do pool
+            futuros = {
+                executor.submit(contextvars.copy_context().run, _consultar_item_lote, numero, cpf, senha): numero
+                for numero in intercalar_por_tribunal(pendentes)
+            }
+            for futuro in as_completed(futuros):
+                numero = futuros[futuro]
+                try:
+                    snapshot, error = futuro.result()
+                except ExcecaoPrazoEsgotado:
+                    # Cliente desistiu: as consultas restantes são canceladas
+                    raise
+                except Exception as e:
+                    logger.error(f"Erro na consulta em lote de {numero}: {str(e)}")
+                    snapshot, error = None, str(e)
+                if error:
+                    yield item(numero, erro='MNI_ERROR', mensagem=error)
+                else:
+                    yield item(numero, snapshot)
+        finally:
+            # Cliente desconectado: consultas ainda não iniciadas são canceladas
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    yield linha_ndjson({'resumo': dict(
+        contagem, total=len(numeros), tempoMs=round((time.monotonic() - inicio) * 1000, 1)
+    )})
+
+@registrar_executor('copia_integral', obrigatorios=('processo',))
+def executar_copia_integral(contexto):
+    """Job: gera a cópia integral do processo; o PDF fica como artefato do job"""
+    numero_processo = contexto.parametros['processo']
+    politica_nao_pdf = contexto.parametros.get('nao_pdf', 'omitir')
+    if politica_nao_pdf not in POLITICAS_NAO_PDF:
+        raise ValueError(f"nao_pdf deve ser um de: {', '.join(POLITICAS_NAO_PDF)}")
     
-    logger.warning(f"Tribunal não mapeado para código: {codigo_tribunal}")
-    # URL padrão do CNJ para testes
-    return 'https://wwwh.cnj.jus.br/pjemni-2x/intercomunicacao?wsdl'
+    snapshot, error = obter_snapshot_processo(numero_processo, contexto.cpf, contexto.senha)
+    if error:
+        raise ExcecaoConsultaMNI(error)
+    contexto.verificar_cancelamento()
+    
+    caminho, omitidos = gerar_copia_integral(
+        numero_processo, snapshot.processo, contexto.cpf, contexto.senha, politica_nao_pdf
+    )
+    if not caminho:
+        raise ValueError('Nenhum documento PDF disponível para a cópia integral')
+    return {'omitidos': omitidos}, caminho
 
-def consultar_processo_mni(numero_processo, cpf=None, senha=None):
-    """Consulta processo via MNI/SOAP"""
+@registrar_executor('lote', obrigatorios=('processos',))
+def executar_consulta_lote(contexto):
+    """Job: consulta em lote sem limite de quantidade; o NDJSON fica como artefato do job"""
+    numeros = list(dict.fromkeys(str(numero).strip() for numero in contexto.parametros['processos']))
+    campos = parse_campos(contexto.parametros.get('fields'))
+    
+    os.makedirs(contexto.diretorio, exist_ok=True)
+    caminho = os.path.join(contexto.diretorio, 'resultado.ndjson')
+    linhas = gerar_consulta_lote(numeros, contexto.cpf, contexto.senha, campos)
+    try:
+        with open(caminho, 'wb') as f:
+            for concluidos, linha in enumerate(linhas, 1):
+                f.write(linha)
+                contexto.progresso({'concluidos': min(concluidos, len(numeros)), 'total': len(numeros)})
+                contexto.verificar_cancelamento()
+    finally:
+        linhas.close()
+    
+    # A última linha do lote é o resumo
+    return json.loads(linha)['resumo'], caminho
+
+def consultar_avisos_pendentes(cpf=None, senha=None):
+    """Avisos pendentes do usuário, do estado local mantido pelo agendador (avisos.py)"""
     try:
-        # Usar credenciais fornecidas ou padrão
         cpf = cpf or app.config['MNI_CPF']
         senha = senha or app.config['MNI_SENHA']
         
         if not cpf or not senha:
             return None, "Credenciais não fornecidas"
         
-        # Obter URL WSDL apropriada
-        wsdl_url = get_wsdl_url(numero_processo)
-        logger.info(f"Usando WSDL: {wsdl_url}")
-        
-        # Criar cliente SOAP
-        transport = Transport(timeout=30)
-        client = Client(wsdl=wsdl_url, transport=transport)
-        
-        # Fazer a consulta
-        response = client.service.consultarProcesso(
-            idConsultante=cpf,
-            senhaConsultante=senha,
-            numeroProcesso=numero_processo,
-            movimentos=True,
-            incluirCabecalho=True,
-            incluirDocumentos=True
-        )
-        
-        return response, None
-        
-    except Exception as e:
-        logger.error(f"Erro ao consultar MNI: {str(e)}")
-        return None, str(e)
-
-def consultar_avisos_pendentes(cpf, senha):
-    """Consulta avisos pendentes do usuário"""
-    try:
-        # Por enquanto retorna mock - implementar quando necessário
-        return [], None
+        return avisos_pendentes.consultar(cpf, senha), None
     except Exception as e:
+        logger.error(f"Erro ao consultar avisos pendentes: {str(e)}")
         return None, str(e)
 
 def baixar_documento_mni(numero_processo, id_documento, cpf=None, senha=None):
@@ -166,248 +242,6 @@ def baixar_documento_mni(numero_processo, id_documento, cpf=None, senha=None):
     except Exception as e:
         return None, str(e)
 
-def parse_processo_response(response):
-    """Parse da resposta SOAP para JSON com todos os detalhes"""
-    try:
-        processo_data = {
-            'sucesso': True,
-            'processo': {
-                'dadosBasicos': {},
-                'documentos': [],
-                'polos': [],
-                'movimentos': [],
-                'assuntos': [],
-                'resumo': {}
-            }
-        }
-        
-        # Extrair dados básicos
-        if hasattr(response, 'processo'):
-            proc = response.processo
-            
-            # Dados básicos
-            if hasattr(proc, 'dadosBasicos'):
-                dados = proc.dadosBasicos
-                processo_data['processo']['dadosBasicos'] = {
-                    'numero': getattr(dados, 'numero', ''),
-                    'classeProcessualNome': getattr(dados, 'classeProcessualNome', ''),
-                    'classeProcessualCodigo': getattr(dados, 'codigoClasseProcessual', ''),
-                    'dataAjuizamento': str(getattr(dados, 'dataAjuizamento', '')),
-                    'valorCausa': float(getattr(dados, 'valorCausa', 0)),
-                    'nivelSigilo': int(getattr(dados, 'nivelSigilo', 0)),
-                    'orgaoJulgador': {
-                        'nome': getattr(dados.orgaoJulgador, 'nomeOrgao', '') if hasattr(dados, 'orgaoJulgador') else '',
-                        'codigo': getattr(dados.orgaoJulgador, 'codigoOrgao', '') if hasattr(dados, 'orgaoJulgador') else '',
-                        'instancia': getattr(dados.orgaoJulgador, 'instancia', 'ORIG') if hasattr(dados, 'orgaoJulgador') else 'ORIG'
-                    },
-                    'prioridade': getattr(dados, 'prioridade', ''),
-                    'competencia': getattr(dados, 'competencia', '')
-                }
-                
-                # Assuntos
-                if hasattr(dados, 'assunto') and dados.assunto:
-                    for assunto in dados.assunto:
-                        processo_data['processo']['assuntos'].append({
-                            'codigo': getattr(assunto, 'codigoNacional', ''),
-                            'descricao': getattr(assunto, 'descricao', ''),
-                            'principal': getattr(assunto, 'principal', False)
-                        })
-            
-            # Documentos
-            if hasattr(proc, 'documento') and proc.documento:
-                for doc in proc.documento:
-                    doc_data = {
-                        'idDocumento': getattr(doc, 'idDocumento', ''),
-                        'tipoDocumentoNome': getattr(doc, 'tipoDocumento', ''),
-                        'tipoDocumentoCodigo': getattr(doc, 'tipoDocumentoCodigo', ''),
-                        'descricao': getattr(doc, 'descricao', ''),
-                        'dataHoraInclusao': str(getattr(doc, 'dataHora', '')),
-                        'mimetype': getattr(doc, 'mimetype', 'application/pdf'),
-                        'nivelSigilo': int(getattr(doc, 'nivelSigilo', 0)),
-                        'hash': getattr(doc, 'hash', ''),
-                        'tamanho': getattr(doc, 'tamanho', 0)
-                    }
-                    
-                    # Documentos vinculados (anexos)
-                    if hasattr(doc, 'documentoVinculado') and doc.documentoVinculado:
-                        doc_data['documentosVinculados'] = []
-                        for vinc in doc.documentoVinculado:
-                            doc_data['documentosVinculados'].append({
-                                'idDocumento': getattr(vinc, 'idDocumento', ''),
-                                'tipoDocumentoNome': getattr(vinc, 'tipoDocumento', ''),
-                                'descricao': getattr(vinc, 'descricao', '')
-                            })
-                    
-                    processo_data['processo']['documentos'].append(doc_data)
-            
-            # Polos
-            if hasattr(proc, 'polo') and proc.polo:
-                for polo in proc.polo:
-                    polo_data = {
-                        'polo': getattr(polo, 'polo', ''),
-                        'parte': []
-                    }
-                    
-                    if hasattr(polo, 'parte') and polo.parte:
-                        for parte in polo.parte:
-                            parte_data = {
-                                'nome': getattr(parte, 'nome', ''),
-                                'tipoPessoa': getattr(parte, 'tipoPessoa', ''),
-                                'numeroDocumentoPrincipal': getattr(parte, 'numeroDocumentoPrincipal', ''),
-                                'dataNascimento': str(getattr(parte, 'dataNascimento', '')) if hasattr(parte, 'dataNascimento') else '',
-                                'nomeGenitor': getattr(parte, 'nomeGenitor', ''),
-                                'nomeGenitora': getattr(parte, 'nomeGenitora', '')
-                            }
-                            
-                            # Endereço
-                            if hasattr(parte, 'endereco'):
-                                end = parte.endereco
-                                parte_data['endereco'] = {
-                                    'cep': getattr(end, 'cep', ''),
-                                    'logradouro': getattr(end, 'logradouro', ''),
-                                    'numero': getattr(end, 'numero', ''),
-                                    'complemento': getattr(end, 'complemento', ''),
-                                    'bairro': getattr(end, 'bairro', ''),
-                                    'cidade': getattr(end, 'cidade', ''),
-                                    'estado': getattr(end, 'estado', '')
-                                }
-                            
-                            # Representantes (advogados)
-                            if hasattr(parte, 'representanteProcessual') and parte.representanteProcessual:
-                                parte_data['advogados'] = []
-                                for rep in parte.representanteProcessual:
-                                    parte_data['advogados'].append({
-                                        'nome': getattr(rep, 'nome', ''),
-                                        'inscricao': getattr(rep, 'inscricao', ''),
-                                        'numeroDocumentoPrincipal': getattr(rep, 'numeroDocumentoPrincipal', ''),
-                                        'tipoRepresentante': getattr(rep, 'tipoRepresentante', '')
-                                    })
-                            
-                            polo_data['parte'].append(parte_data)
-                    
-                    processo_data['processo']['polos'].append(polo_data)
-            
-            # Movimentos processuais
-            if hasattr(proc, 'movimento') and proc.movimento:
-                for mov in proc.movimento:
-                    mov_data = {
-                        'dataHora': str(getattr(mov, 'dataHora', '')),
-                        'descricao': getattr(mov, 'descricao', ''),
-                        'tipoMovimento': getattr(mov, 'tipoMovimento', ''),
-                        'complemento': []
-                    }
-                    
-                    # Complementos do movimento
-                    if hasattr(mov, 'complemento') and mov.complemento:
-                        for comp in mov.complemento:
-                            mov_data['complemento'].append({
-                                'nome': getattr(comp, 'nome', ''),
-                                'descricao': getattr(comp, 'descricao', '')
-                            })
-                    
-                    processo_data['processo']['movimentos'].append(mov_data)
-                
-                # Ordenar movimentos por data (mais recente primeiro)
-                processo_data['processo']['movimentos'].sort(
-                    key=lambda x: x['dataHora'], 
-                    reverse=True
-                )
-            
-            # Gerar resumo do processo
-            processo_data['processo']['resumo'] = gerar_resumo_processo(processo_data['processo'])
-        
-        return processo_data
-        
-    except Exception as e:
-        logger.error(f"Erro ao fazer parse da resposta: {str(e)}")
-        return {
-            'sucesso': False,
-            'erro': 'PARSE_ERROR',
-            'mensagem': f'Erro ao processar resposta: {str(e)}'
-        }
-
-def gerar_resumo_processo(processo):
-    """Gera um resumo analítico do processo"""
-    resumo = {
-        'situacao': 'EM_ANDAMENTO',
-        'temSentenca': False,
-        'temRecurso': False,
-        'temAcordao': False,
-        'faseAtual': 'CONHECIMENTO',
-        'ultimasMovimentacoes': [],
-        'proximosPassos': [],
-        'analise': ''
-    }
-    
-    # Analisar movimentos para determinar situação
-    movimentos = processo.get('movimentos', [])
-    
-    palavras_sentenca = ['sentença', 'sentenca', 'julgado', 'procedente', 'improcedente', 'extinto']
-    palavras_recurso = ['recurso', 'apelação', 'apelacao', 'agravo', 'embargos']
-    palavras_acordao = ['acórdão', 'acordao', 'turma', 'câmara', 'camara']
-    palavras_transito = ['trânsito', 'transito', 'transitado', 'arquivado']
-    
-    for mov in movimentos[:20]:  # Analisar últimos 20 movimentos
-        desc_lower = mov['descricao'].lower()
-        
-        # Verificar sentença
-        if any(palavra in desc_lower for palavra in palavras_sentenca):
-            resumo['temSentenca'] = True
-            resumo['faseAtual'] = 'SENTENCIADO'
-        
-        # Verificar recurso
-        if any(palavra in desc_lower for palavra in palavras_recurso):
-            resumo['temRecurso'] = True
-            resumo['faseAtual'] = 'RECURSAL'
-        
-        # Verificar acórdão
-        if any(palavra in desc_lower for palavra in palavras_acordao):
-            resumo['temAcordao'] = True
-            resumo['faseAtual'] = 'SEGUNDA_INSTANCIA'
-        
-        # Verificar trânsito em julgado
-        if any(palavra in desc_lower for palavra in palavras_transito):
-            resumo['situacao'] = 'ARQUIVADO'
-            resumo['faseAtual'] = 'TRANSITADO_JULGADO'
-    
-    # Últimas 5 movimentações
-    resumo['ultimasMovimentacoes'] = movimentos[:5] if movimentos else []
-    
-    # Análise textual
-    instancia = processo['dadosBasicos']['orgaoJulgador']['instancia']
-    if instancia == 'ORIG':
-        instancia_texto = '1ª instância'
-    elif instancia == 'RECURSAL':
-        instancia_texto = '2ª instância'
-    else:
-        instancia_texto = instancia
-    
-    resumo['analise'] = f"Processo em tramitação na {instancia_texto}. "
-    
-    if resumo['temSentenca']:
-        resumo['analise'] += "Já foi proferida sentença. "
-    
-    if resumo['temRecurso']:
-        resumo['analise'] += "Há recurso interposto. "
-    
-    if resumo['temAcordao']:
-        resumo['analise'] += "Já houve julgamento em 2º grau. "
-    
-    if resumo['situacao'] == 'ARQUIVADO':
-        resumo['analise'] += "Processo arquivado/transitado em julgado. "
-    
-    # Próximos passos possíveis
-    if not resumo['temSentenca']:
-        resumo['proximosPassos'].append("Aguardar sentença de 1º grau")
-    elif resumo['temSentenca'] and not resumo['temRecurso']:
-        resumo['proximosPassos'].append("Prazo para recurso")
-    elif resumo['temRecurso'] and not resumo['temAcordao']:
-        resumo['proximosPassos'].append("Aguardar julgamento do recurso")
-    elif resumo['temAcordao']:
-        resumo['proximosPassos'].append("Verificar possibilidade de recursos aos tribunais superiores")
-    
-    return resumo
-
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -416,25 +250,56 @@ def health_check():
         'timestamp': datetime.now().isoformat()
     })
 
-@app.route('/api/v1/processo/<numero_processo>', methods=['GET'])
-def consultar_processo(numero_processo):
-    """Consulta dados completos do processo"""
+@app.route('/metricas', methods=['GET'])
+def metricas():
+    """Latências do MNI (p50/p90/p99) e timeouts em vigor por endpoint e operação"""
+    return jsonify({
+        'mni': roteador_mni.metricas(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/api/v1/processos/batch', methods=['POST'])
+def consultar_processos_batch():
+    """
+    Consulta vários processos em uma única requisição.
+    Corpo: {"processos": ["<numero>", ...], "fields": "<projeção opcional>"}
+    A resposta é NDJSON: uma linha por processo, na ordem em que ficam prontos
+    (cache primeiro), e uma linha final com o resumo.
+    """
     try:
         cpf = request.headers.get('X-MNI-CPF')
         senha = request.headers.get('X-MNI-SENHA')
         
-        response, error = consultar_processo_mni(numero_processo, cpf, senha)
+        corpo = request.get_json(silent=True) or {}
+        processos = corpo.get('processos')
+        if not isinstance(processos, list) or not processos:
+            return jsonify({
+                'sucesso': False,
+                'erro': 'PARAMETRO_INVALIDO',
+                'mensagem': 'Informe a lista de processos no campo "processos"'
+            }), 400
         
-        if error:
+        numeros = list(dict.fromkeys(str(numero).strip() for numero in processos))
+        if len(numeros) > BATCH_MAX_PROCESSOS:
             return jsonify({
                 'sucesso': False,
-                'erro': 'MNI_ERROR',
-                'mensagem': error
+                'erro': 'PARAMETRO_INVALIDO',
+                'mensagem': f'Máximo de {BATCH_MAX_PROCESSOS} processos por requisição'
             }), 400
         
-        processo_data = parse_processo_response(response)
+        try:
+            campos = parse_campos(corpo.get('fields'))
+        except ValueError as e:
+            return jsonify({
+                'sucesso': False,
+                'erro': 'PARAMETRO_INVALIDO',
+                'mensagem': str(e)
+            }), 400
         
-        return jsonify(processo_data)
+        return Response(
+            stream_with_context(gerador_com_prazo(gerar_consulta_lote(numeros, cpf, senha, campos))),
+            mimetype='application/x-ndjson'
+        )
         
     except Exception as e:
         logger.error(f"Erro na API: {str(e)}")
@@ -451,7 +316,7 @@ def consultar_resumo_processo(numero_processo):
         cpf = request.headers.get('X-MNI-CPF')
         senha = request.headers.get('X-MNI-SENHA')
         
-        response, error = consultar_processo_mni(numero_processo, cpf, senha)
+        snapshot, error = obter_snapshot_processo(numero_processo, cpf, senha)
         
         if error:
             return jsonify({
@@ -460,20 +325,23 @@ def consultar_resumo_processo(numero_processo):
                 'mensagem': error
             }), 400
         
-        processo_data = parse_processo_response(response)
-        
-        if processo_data['sucesso']:
-            return jsonify({
-                'sucesso': True,
-                'numeroProcesso': numero_processo,
-                'dadosBasicos': processo_data['processo']['dadosBasicos'],
-                'resumo': processo_data['processo']['resumo'],
-                'totalDocumentos': len(processo_data['processo']['documentos']),
-                'totalMovimentos': len(processo_data['processo']['movimentos'])
-            })
-        
-        return jsonify(processo_data)
+        etag = calcular_etag(snapshot.digest)
+        nao_modificada = resposta_nao_modificada(etag)
+        if nao_modificada:
+            return nao_modificada
         
+        processo = snapshot.processo
+        return resposta_json({
+            'sucesso': True,
+            'numeroProcesso': numero_processo,
+            'dadosBasicos': processo['dadosBasicos'],
+            'resumo': processo['resumo'],
+            'totalDocumentos': len(processo['documentos']),
+            'totalMovimentos': len(processo['movimentos'])
+        }, etag=etag)
+        
+    except (ExcecaoPrazoEsgotado, ExcecaoSobrecarga):
+        raise
     except Exception as e:
         logger.error(f"Erro na API: {str(e)}")
         return jsonify({
@@ -484,16 +352,29 @@ def consultar_resumo_processo(numero_processo):
 
 @app.route('/api/v1/processo/<numero_processo>/movimentos', methods=['GET'])
 def consultar_movimentos(numero_processo):
-    """Retorna movimentações do processo com filtros"""
+    """
+    Retorna movimentações do processo com filtros por data, tipo e cursor.
+    Com `stream=1`, o JSON é enviado em blocos à medida que é serializado.
+    """
     try:
         cpf = request.headers.get('X-MNI-CPF')
         senha = request.headers.get('X-MNI-SENHA')
         
         # Parâmetros de filtro
-        limite = int(request.args.get('limite', 10))
+        try:
+            limite = ler_limite(request.args.get('limite'), padrao=10)
+            desde = ler_limite_data(request.args.get('desde'))
+            ate = ler_limite_data(request.args.get('ate'), fim_do_dia=True)
+        except ValueError as e:
+            return jsonify({
+                'sucesso': False,
+                'erro': 'PARAMETRO_INVALIDO',
+                'mensagem': str(e)
+            }), 400
         tipo = request.args.get('tipo', '')  # sentenca, recurso, etc
+        cursor = request.args.get('cursor')
         
-        response, error = consultar_processo_mni(numero_processo, cpf, senha)
+        snapshot, error = obter_snapshot_processo(numero_processo, cpf, senha)
         
         if error:
             return jsonify({
@@ -502,27 +383,33 @@ def consultar_movimentos(numero_processo):
                 'mensagem': error
             }), 400
         
-        processo_data = parse_processo_response(response)
-        
-        if processo_data['sucesso']:
-            movimentos = processo_data['processo']['movimentos']
-            
-            # Aplicar filtro por tipo se especificado
-            if tipo:
-                movimentos = [m for m in movimentos if tipo.lower() in m['descricao'].lower()]
-            
-            # Limitar quantidade
-            movimentos = movimentos[:limite]
-            
-            return jsonify({
-                'sucesso': True,
-                'numeroProcesso': numero_processo,
-                'movimentos': movimentos,
-                'total': len(processo_data['processo']['movimentos'])
-            })
+        etag = calcular_etag(snapshot.digest)
+        nao_modificada = resposta_nao_modificada(etag)
+        if nao_modificada:
+            return nao_modificada
         
-        return jsonify(processo_data)
+        try:
+            movimentos, total_filtrado, proximo_cursor = snapshot.movimentos.consultar(
+                desde=desde, ate=ate, tipo=tipo, cursor=cursor, limite=limite
+            )
+        except ValueError as e:
+            return jsonify({
+                'sucesso': False,
+                'erro': 'PARAMETRO_INVALIDO',
+                'mensagem': str(e)
+            }), 400
         
+        return resposta_json({
+            'sucesso': True,
+            'numeroProcesso': numero_processo,
+            'movimentos': movimentos,
+            'total': len(snapshot.movimentos),
+            'totalFiltrado': total_filtrado,
+            'proximoCursor': proximo_cursor
+        }, etag=etag)
+        
+    except (ExcecaoPrazoEsgotado, ExcecaoSobrecarga):
+        raise
     except Exception as e:
         logger.error(f"Erro na API: {str(e)}")
         return jsonify({
@@ -532,22 +419,66 @@ def consultar_movimentos(numero_processo):
         }), 500
 
 @app.route('/api/v1/processo/<numero_processo>/copia-integral', methods=['GET'])
+@sem_compressao
 def baixar_copia_integral(numero_processo):
-    """Baixa cópia integral do processo (todos os documentos em um PDF)"""
+    """
+    Baixa cópia integral do processo (todos os documentos PDF em um único PDF).
+    Parâmetro `nao_pdf`: 'omitir' (padrão) ou 'erro' para documentos que não são PDF.
+    Os IDs omitidos são informados no header X-Documentos-Omitidos.
+    """
     try:
-        cpf = request.headers.get('X-MNI-CPF')
-        senha = request.headers.get('X-MNI-SENHA')
+        cpf = request.headers.get('X-MNI-CPF') or app.config['MNI_CPF']
+        senha = request.headers.get('X-MNI-SENHA') or app.config['MNI_SENHA']
         
-        # Por enquanto, retornar informação sobre como seria implementado
-        # Em produção, isso baixaria todos os documentos e mesclaria em um PDF
+        politica_nao_pdf = request.args.get('nao_pdf', 'omitir')
+        if politica_nao_pdf not in POLITICAS_NAO_PDF:
+            return jsonify({
+                'sucesso': False,
+                'erro': 'PARAMETRO_INVALIDO',
+                'mensagem': f"nao_pdf deve ser um de: {', '.join(POLITICAS_NAO_PDF)}"
+            }), 400
         
-        return jsonify({
-            'sucesso': False,
-            'erro': 'NOT_IMPLEMENTED',
-            'mensagem': 'Download de cópia integral será implementado em breve',
-            'info': 'Esta funcionalidade baixará todos os documentos e mesclará em um único PDF'
-        }), 501
+        snapshot, error = obter_snapshot_processo(numero_processo, cpf, senha)
         
+        if error:
+            return jsonify({
+                'sucesso': False,
+                'erro': 'MNI_ERROR',
+                'mensagem': error
+            }), 400
+        
+        try:
+            caminho, omitidos = gerar_copia_integral(
+                numero_processo, snapshot.processo, cpf, senha, politica_nao_pdf
+            )
+        except ExcecaoDocumentoNaoPdf as e:
+            return jsonify({
+                'sucesso': False,
+                'erro': 'DOCUMENTO_NAO_PDF',
+                'mensagem': str(e),
+                'documentos': e.ids
+            }), 422
+        
+        if not caminho:
+            return jsonify({
+                'sucesso': False,
+                'erro': 'NOT_FOUND',
+                'mensagem': 'Nenhum documento PDF disponível para a cópia integral',
+                'omitidos': omitidos
+            }), 404
+        
+        resposta = send_file(
+            caminho,
+            mimetype='application/pdf',
+            as_attachment=True,
+            download_name=f'copia_integral_{numero_processo}.pdf',
+            conditional=True
+        )
+        resposta.headers['X-Documentos-Omitidos'] = ','.join(omitidos)
+        return resposta
+        
+    except (ExcecaoPrazoEsgotado, ExcecaoSobrecarga):
+        raise
     except Exception as e:
         logger.error(f"Erro na API: {str(e)}")
         return jsonify({
@@ -556,20 +487,35 @@ def baixar_copia_integral(numero_processo):
             'mensagem': str(e)
         }), 500
 
-@app.route('/api/v1/processo/<numero_processo>/documento/<id_documento>', methods=['GET'])
-def baixar_documento(numero_processo, id_documento):
-    """Baixa um documento específico do processo"""
+@app.route('/api/v1/processo/<numero_processo>/documentos.zip', methods=['GET'])
+@sem_compressao
+def baixar_documentos_zip(numero_processo):
+    """
+    Baixa todos os documentos do processo em um arquivo ZIP gerado em streaming.
+    Cada documento entra como <idDocumento><extensão>; o manifest.json lista os
+    metadados de cada documento e os que não puderam ser baixados.
+    """
     try:
-        cpf = request.headers.get('X-MNI-CPF')
-        senha = request.headers.get('X-MNI-SENHA')
+        cpf = request.headers.get('X-MNI-CPF') or app.config['MNI_CPF']
+        senha = request.headers.get('X-MNI-SENHA') or app.config['MNI_SENHA']
         
-        # Por enquanto, retornar placeholder
-        return jsonify({
-            'sucesso': False,
-            'erro': 'NOT_IMPLEMENTED',
-            'mensagem': 'Endpoint de download individual em desenvolvimento'
-        }), 501
+        snapshot, error = obter_snapshot_processo(numero_processo, cpf, senha)
         
+        if error:
+            return jsonify({
+                'sucesso': False,
+                'erro': 'MNI_ERROR',
+                'mensagem': error
+            }), 400
+        
+        return Response(
+            stream_with_context(gerador_com_prazo(gerar_zip_documentos(numero_processo, snapshot.processo, cpf, senha))),
+            mimetype='application/zip',
+            headers={'Content-Disposition': f'attachment; filename=documentos_{numero_processo}.zip'}
+        )
+        
+    except (ExcecaoPrazoEsgotado, ExcecaoSobrecarga):
+        raise
     except Exception as e:
         logger.error(f"Erro na API: {str(e)}")
         return jsonify({
@@ -585,7 +531,7 @@ def listar_avisos_pendentes():
         cpf = request.headers.get('X-MNI-CPF')
         senha = request.headers.get('X-MNI-SENHA')
         
-        avisos, error = consultar_avisos_pendentes(cpf, senha)
+        resultado, error = consultar_avisos_pendentes(cpf, senha)
         
         if error:
             return jsonify({
@@ -594,10 +540,7 @@ def listar_avisos_pendentes():
                 'mensagem': error
             }), 400
         
-        return jsonify({
-            'sucesso': True,
-            'avisos': avisos
-        })
+        return jsonify(dict(resultado, sucesso=True))
         
     except Exception as e:
         logger.error(f"Erro na API: {str(e)}")
@@ -607,6 +550,15 @@ def listar_avisos_pendentes():
             'mensagem': str(e)
         }), 500
 
+# Threads executoras da fila de jobs (após o registro de todos os executores)
+fila_jobs.init_app(app)
+
+# Agendador das verificações dos processos monitorados
+monitor_processos.init_app(app)
+
+# Agendador das atualizações dos avisos pendentes
+avisos_pendentes.iniciar()
+
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
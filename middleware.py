@@ -1,8 +1,22 @@
 from functools import wraps
-from flask import request, jsonify
+from flask import current_app, request, jsonify, g
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
 import logging
+import threading
 import time
+import zlib
 from datetime import datetime
+from config import COMPRESSAO_MIN_BYTES, COMPRESSAO_NIVEL, TOKEN_STREAM_VALIDADE
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard é opcional
+    zstandard = None
 
 logger = logging.getLogger(__name__)
 
@@ -96,6 +110,83 @@ def handle_mni_errors(error_response):
         'status': 500
     }
 
+def require_api_key(f):
+    """
+    Decorator que exige uma API key ativa no header X-API-KEY e a
+    disponibiliza em g.api_key. A chave não é aceita na query string, que
+    acaba em logs de acesso, históricos e cabeçalhos Referer.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        from models import ApiKey
+
+        chave = request.headers.get('X-API-KEY')
+        api_key = ApiKey.query.filter_by(key=chave, is_active=True).first() if chave else None
+        if not api_key:
+            return jsonify({
+                'erro': 'API key inválida',
+                'mensagem': 'Forneça uma API key ativa no header X-API-KEY'
+            }), 401
+
+        api_key.use()
+        g.api_key = api_key
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+def _serializador_token(escopo):
+    # O escopo entra no salt: um token de uma rota não vale em outra
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=f'token-stream:{escopo}')
+
+def emitir_token_stream(api_key, escopo):
+    """
+    Token curto (TOKEN_STREAM_VALIDADE segundos), assinado com a SECRET_KEY,
+    que autentica a api_key apenas nas rotas de `escopo`
+    (ver require_api_key_ou_token)
+    """
+    return _serializador_token(escopo).dumps({'api_key_id': api_key.id})
+
+def require_api_key_ou_token(escopo):
+    """
+    Como require_api_key, mas aceita também um token de emitir_token_stream
+    no parâmetro `token`. Para rotas que o navegador abre sem headers
+    personalizados (EventSource); a API key continua fora da URL.
+    """
+    def decorator(f):
+        autenticada = require_api_key(f)
+
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            from models import ApiKey
+
+            token = request.args.get('token')
+            if request.headers.get('X-API-KEY') or not token:
+                return autenticada(*args, **kwargs)
+
+            try:
+                dados = _serializador_token(escopo).loads(token, max_age=TOKEN_STREAM_VALIDADE)
+            except SignatureExpired:
+                return jsonify({
+                    'erro': 'Token expirado',
+                    'mensagem': 'Solicite um novo token de stream'
+                }), 401
+            except BadSignature:
+                dados = None
+            api_key = ApiKey.query.filter_by(id=dados['api_key_id'], is_active=True).first() if dados else None
+            if not api_key:
+                return jsonify({
+                    'erro': 'Token inválido',
+                    'mensagem': 'Forneça um token de stream válido ou uma API key no header X-API-KEY'
+                }), 401
+
+            api_key.use()
+            g.api_key = api_key
+            return f(*args, **kwargs)
+
+        return decorated_function
+
+    return decorator
+
 def cache_key(numero_processo, operation='consulta'):
     """Gera chave de cache para o processo"""
     return f"processo:{numero_processo}:{operation}"
@@ -135,6 +226,20 @@ class RateLimiter:
 # Instância global do rate limiter
 rate_limiter = RateLimiter()
 
+class LimitesTribunal:
+    """Limite de chamadas simultâneas ao MNI por tribunal (semáforos criados sob demanda)"""
+
+    def __init__(self, maximo):
+        self.maximo = maximo
+        self._semaforos = {}
+        self._lock = threading.Lock()
+
+    def semaforo(self, tribunal):
+        with self._lock:
+            if tribunal not in self._semaforos:
+                self._semaforos[tribunal] = threading.BoundedSemaphore(self.maximo)
+            return self._semaforos[tribunal]
+
 def rate_limit(f):
     """Decorator para aplicar rate limiting"""
     @wraps(f)
@@ -151,3 +256,114 @@ def rate_limit(f):
         return f(*args, **kwargs)
     
     return decorated_function
+
+# Tipos de conteúdo que valem a pena comprimir; binários (PDF, imagens, ZIP)
+# já são comprimidos e ficam de fora
+TIPOS_COMPRIMIVEIS = (
+    'text/',
+    'application/json',
+    'application/x-ndjson',
+    'application/javascript',
+    'application/xml',
+)
+
+
+class _CompressorGzip:
+    def __init__(self):
+        self._c = zlib.compressobj(COMPRESSAO_NIVEL, zlib.DEFLATED, 31)
+
+    def comprimir(self, dados):
+        # Sync flush a cada bloco para não reter dados de respostas em streaming
+        return self._c.compress(dados) + self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def finalizar(self):
+        return self._c.flush()
+
+
+class _CompressorBrotli:
+    def __init__(self):
+        self._c = brotli.Compressor(quality=5)
+
+    def comprimir(self, dados):
+        return self._c.process(dados) + self._c.flush()
+
+    def finalizar(self):
+        return self._c.finish()
+
+
+class _CompressorZstd:
+    def __init__(self):
+        self._c = zstandard.ZstdCompressor(level=3).compressobj()
+
+    def comprimir(self, dados):
+        return self._c.compress(dados) + self._c.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finalizar(self):
+        return self._c.flush()
+
+
+# Codificações suportadas, em ordem de preferência do servidor
+COMPRESSORES = {}
+if zstandard is not None:
+    COMPRESSORES['zstd'] = _CompressorZstd
+if brotli is not None:
+    COMPRESSORES['br'] = _CompressorBrotli
+COMPRESSORES['gzip'] = _CompressorGzip
+
+
+def sem_compressao(f):
+    """Decorator para rotas cujas respostas não devem ser comprimidas (ex.: PDFs)"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.sem_compressao = True
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+
+def _comprimir_stream(blocos, compressor):
+    for bloco in blocos:
+        if bloco:
+            dados = compressor.comprimir(bloco)
+            if dados:
+                yield dados
+    yield compressor.finalizar()
+
+
+def comprimir_resposta(response):
+    """Comprime a resposta conforme o Accept-Encoding do cliente (hook after_request)"""
+    if g.get('sem_compressao') or request.method == 'HEAD':
+        return response
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return response
+    if response.direct_passthrough or 'Content-Encoding' in response.headers:
+        return response
+    if not (response.mimetype or '').startswith(TIPOS_COMPRIMIVEIS):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    codificacao = request.accept_encodings.best_match(list(COMPRESSORES))
+    if not codificacao:
+        return response
+
+    compressor = COMPRESSORES[codificacao]()
+    if response.is_streamed:
+        response.response = _comprimir_stream(response.response, compressor)
+        response.headers.pop('Content-Length', None)
+    else:
+        dados = response.get_data()
+        if len(dados) < COMPRESSAO_MIN_BYTES:
+            return response
+        response.set_data(compressor.comprimir(dados) + compressor.finalizar())
+
+    response.headers['Content-Encoding'] = codificacao
+    # A representação comprimida não é idêntica byte a byte: o ETag passa a ser fraco
+    etag, _ = response.get_etag()
+    if etag:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compressao(app):
+    """Registra a compressão de respostas para todas as rotas da aplicação"""
+    app.after_request(comprimir_resposta)
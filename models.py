@@ -63,3 +63,123 @@ class ApiKey(db.Model):
 
     def __repr__(self):
         return f"<ApiKey {self.key} owned_by={self.user_id}>"
+
+
+class Job(db.Model):
+    """Operação longa executada em segundo plano pela fila de jobs (jobs.py)"""
+    __tablename__ = 'job'
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('user.id'), nullable=False, index=True)
+    api_key_id = db.Column(db.Integer, db.ForeignKey('api_key.id'), nullable=False)
+    tipo = db.Column(db.String(40), nullable=False)
+    parametros = db.Column(db.JSON, nullable=False, default=dict)
+    # Credenciais MNI cifradas com a SECRET_KEY; apagadas ao final do job
+    credenciais = db.Column(db.Text)
+    # pendente -> executando -> concluido | falhou | cancelado
+    status = db.Column(db.String(20), nullable=False, default='pendente', index=True)
+    cancelamento_solicitado = db.Column(db.Boolean, nullable=False, default=False)
+    progresso = db.Column(db.JSON)
+    resultado = db.Column(db.JSON)
+    artefato = db.Column(db.String(500))
+    erro = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+
+    user = db.relationship('User', backref=db.backref('jobs', lazy=True))
+    api_key = db.relationship('ApiKey')
+
+    def to_dict(self):
+        def data(valor):
+            return valor.isoformat() if valor else None
+
+        return {
+            'id': str(self.id),
+            'tipo': self.tipo,
+            'status': self.status,
+            'parametros': self.parametros,
+            'progresso': self.progresso,
+            'resultado': self.resultado,
+            'possuiArtefato': bool(self.artefato),
+            'erro': self.erro,
+            'cancelamentoSolicitado': self.cancelamento_solicitado,
+            'criadoEm': data(self.created_at),
+            'iniciadoEm': data(self.started_at),
+            'finalizadoEm': data(self.finished_at),
+        }
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.tipo} {self.status}>"
+
+
+class ProcessoMonitorado(db.Model):
+    """Processo acompanhado pelo monitoramento de mudanças (monitoramento.py)"""
+    __tablename__ = 'processo_monitorado'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'numero_processo', name='uq_processo_monitorado_usuario'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('user.id'), nullable=False, index=True)
+    numero_processo = db.Column(db.String(25), nullable=False)
+    # Credenciais MNI cifradas com a SECRET_KEY, usadas nas verificações
+    credenciais = db.Column(db.Text)
+    intervalo = db.Column(db.Integer, nullable=False)  # segundos entre verificações
+    ativo = db.Column(db.Boolean, nullable=False, default=True)
+    # Último estado conhecido: chaves dos movimentos e documentos e partes do processo
+    estado = db.Column(db.JSON)
+    verificado_em = db.Column(db.DateTime)
+    completo_em = db.Column(db.DateTime)  # última consulta sem data de referência
+    proxima_verificacao = db.Column(db.DateTime, index=True)
+    falhas_consecutivas = db.Column(db.Integer, nullable=False, default=0)
+    ultimo_erro = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+    user = db.relationship('User', backref=db.backref('processos_monitorados', lazy=True))
+    eventos = db.relationship('EventoMudanca', backref='monitorado', lazy='dynamic',
+                              cascade='all, delete-orphan')
+
+    def to_dict(self):
+        def data(valor):
+            return valor.isoformat() if valor else None
+
+        return {
+            'id': self.id,
+            'processo': self.numero_processo,
+            'intervaloMinutos': self.intervalo // 60,
+            'ativo': self.ativo,
+            'verificadoEm': data(self.verificado_em),
+            'proximaVerificacao': data(self.proxima_verificacao),
+            'falhasConsecutivas': self.falhas_consecutivas,
+            'ultimoErro': self.ultimo_erro,
+            'criadoEm': data(self.created_at),
+        }
+
+    def __repr__(self):
+        return f"<ProcessoMonitorado {self.numero_processo} user={self.user_id}>"
+
+
+class EventoMudanca(db.Model):
+    """Mudança detectada em um processo monitorado (movimento, documento ou parte)"""
+    __tablename__ = 'evento_mudanca'
+    # IDs crescentes: clientes acompanham os eventos a partir do último ID recebido
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    monitorado_id = db.Column(db.Integer, db.ForeignKey('processo_monitorado.id'), nullable=False, index=True)
+    user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('user.id'), nullable=False, index=True)
+    numero_processo = db.Column(db.String(25), nullable=False)
+    # movimento_novo | documento_novo | parte_incluida | parte_removida | parte_alterada
+    tipo = db.Column(db.String(30), nullable=False)
+    dados = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, index=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'processo': self.numero_processo,
+            'tipo': self.tipo,
+            'dados': self.dados,
+            'criadoEm': self.created_at.isoformat() if self.created_at else None,
+        }
+
+    def __repr__(self):
+        return f"<EventoMudanca {self.id} {self.tipo} {self.numero_processo}>"
@@ -0,0 +1,362 @@
+"""
+Monitoramento de processos: verificação periódica e registro de mudanças.
+
+- Cada usuário cadastra os processos que quer acompanhar (models.ProcessoMonitorado),
+  com as credenciais MNI cifradas e o intervalo entre verificações.
+- Um thread agendador busca as verificações vencidas a cada
+  MONITORAMENTO_VARREDURA segundos e as executa em MONITORAMENTO_WORKERS
+  threads, com limite de consultas simultâneas por tribunal. A reserva é
+  atômica, de modo que vários workers do gunicorn podem compartilhar o banco.
+- Para reduzir o tráfego com o MNI, a verificação consulta o processo com data
+  de referência (o tribunal retorna só movimentos e documentos posteriores a
+  ela, além do cabeçalho); a cada MONITORAMENTO_COMPLETA_HORAS é feita uma
+  consulta completa.
+- O estado do processo (chaves dos movimentos e documentos conhecidos e partes)
+  é comparado ao da verificação anterior; cada diferença vira um
+  models.EventoMudanca compacto: movimento_novo, documento_novo,
+  parte_incluida, parte_removida ou parte_alterada. A primeira verificação só
+  registra o estado inicial.
+- Falhas de consulta adiam a próxima verificação com espera exponencial.
+"""
+import datetime
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from config import (CONSULTA_MAX_POR_TRIBUNAL, MONITORAMENTO_COMPLETA_HORAS, MONITORAMENTO_INTERVALO_PADRAO,
+                    MONITORAMENTO_MARGEM_HORAS, MONITORAMENTO_VARREDURA, MONITORAMENTO_WORKERS)
+from controle.exceptions import ExcecaoConsultaMNI
+from credenciais import cifrar_credenciais, decifrar_credenciais
+from database import db
+from funcoes_mni import codigo_tribunal, retorna_processo
+from middleware import LimitesTribunal
+from models import EventoMudanca, ProcessoMonitorado
+from utils import campo_mni, lista_mni
+
+logger = logging.getLogger(__name__)
+
+FORMATO_DATA_MNI = '%Y%m%d%H%M%S'
+
+# Tempo (s) que uma verificação reservada fica fora da fila enquanto executa
+_RESERVA = 600
+
+# Limite de espera após falhas consecutivas: intervalo * 2 ** _MAX_EXPOENTE_FALHAS
+_MAX_EXPOENTE_FALHAS = 4
+
+
+def _agora():
+    return datetime.datetime.utcnow()
+
+
+# ----------------------------------------------------------------------
+# Estado do processo e comparação
+# ----------------------------------------------------------------------
+
+def _texto(valor):
+    return '' if valor is None else str(valor)
+
+
+def _compactar(dados):
+    """Remove campos vazios do resumo de um item"""
+    return {chave: valor for chave, valor in dados.items() if valor not in (None, '', [])}
+
+
+def _resumo_movimento(mov):
+    nacional = campo_mni(mov, 'movimentoNacional')
+    local = campo_mni(mov, 'movimentoLocal')
+    complementos = lista_mni(campo_mni(mov, 'complemento')) + lista_mni(campo_mni(nacional, 'complemento'))
+    return _compactar({
+        'dataHora': _texto(campo_mni(mov, 'dataHora')),
+        'codigoNacional': _texto(campo_mni(nacional, 'codigoNacional')),
+        'codigoLocal': _texto(campo_mni(local, 'codigoMovimento')),
+        'descricao': _texto(campo_mni(local, 'descricao') or campo_mni(mov, 'descricao')),
+        'complementos': [_texto(c) for c in complementos if c],
+    })
+
+
+def _chave_movimento(mov, resumo):
+    """Identificador do movimento no tribunal ou, na falta dele, data + código + complementos"""
+    identificador = campo_mni(mov, 'identificadorMovimento')
+    if identificador:
+        return _texto(identificador)
+    assinatura = '|'.join(resumo.get('complementos', []) + [resumo.get('descricao', '')])
+    codigo = resumo.get('codigoNacional') or resumo.get('codigoLocal', '')
+    return f"{resumo.get('dataHora', '')}|{codigo}|{hashlib.sha1(assinatura.encode('utf-8')).hexdigest()[:10]}"
+
+
+def _documentos(documentos, id_principal=None):
+    for doc in documentos:
+        id_documento = _texto(campo_mni(doc, 'idDocumento'))
+        if id_documento:
+            yield id_documento, _compactar({
+                'idDocumento': id_documento,
+                'idDocumentoPrincipal': id_principal or _texto(campo_mni(doc, 'idDocumentoVinculado')),
+                'tipoDocumento': _texto(campo_mni(doc, 'tipoDocumento')),
+                'descricao': _texto(campo_mni(doc, 'descricao')),
+                'dataHora': _texto(campo_mni(doc, 'dataHora')),
+                'mimetype': _texto(campo_mni(doc, 'mimetype')),
+            })
+        yield from _documentos(lista_mni(campo_mni(doc, 'documentoVinculado')), id_documento or None)
+
+
+def _partes(polos):
+    partes = {}
+    for polo in polos:
+        tipo_polo = _texto(campo_mni(polo, 'polo'))
+        for parte in lista_mni(campo_mni(polo, 'parte')):
+            pessoa = campo_mni(parte, 'pessoa', parte)
+            nome = _texto(campo_mni(pessoa, 'nome'))
+            documento = _texto(campo_mni(pessoa, 'numeroDocumentoPrincipal'))
+            advogados = sorted(
+                _texto(campo_mni(adv, 'nome'))
+                for adv in lista_mni(campo_mni(parte, 'advogado')) if campo_mni(adv, 'nome')
+            )
+            partes[f'{tipo_polo}|{documento or nome}'] = _compactar({
+                'polo': tipo_polo,
+                'nome': nome,
+                'documento': documento,
+                'advogados': advogados,
+            })
+    return partes
+
+
+def extrair_estado(resposta):
+    """
+    Movimentos, documentos (por chave) e partes da resposta do consultarProcesso.
+    Lança ExcecaoConsultaMNI se a consulta não teve sucesso.
+    """
+    if not campo_mni(resposta, 'sucesso', True):
+        raise ExcecaoConsultaMNI(campo_mni(resposta, 'mensagem') or 'Consulta ao MNI sem sucesso')
+    processo = campo_mni(resposta, 'processo')
+    if processo is None:
+        raise ExcecaoConsultaMNI('Resposta do MNI sem processo')
+
+    movimentos = {}
+    for mov in lista_mni(campo_mni(processo, 'movimento')):
+        resumo = _resumo_movimento(mov)
+        movimentos[_chave_movimento(mov, resumo)] = resumo
+
+    dados_basicos = campo_mni(processo, 'dadosBasicos', processo)
+    return {
+        'movimentos': movimentos,
+        'documentos': dict(_documentos(lista_mni(campo_mni(processo, 'documento')))),
+        'partes': _partes(lista_mni(campo_mni(dados_basicos, 'polo'))),
+    }
+
+
+def comparar_estados(anterior, atual):
+    """
+    Compara o estado salvo com o extraído da consulta. Retorna a lista de
+    eventos (tipo, dados) e o novo estado a salvar. Movimentos e documentos
+    são acumulados (uma consulta com data de referência só traz os recentes);
+    as partes vêm sempre completas no cabeçalho.
+    """
+    datas = [item['dataHora'] for grupo in ('movimentos', 'documentos')
+             for item in atual[grupo].values() if item.get('dataHora')]
+    novo_estado = {
+        'movimentos': sorted(set((anterior or {}).get('movimentos', [])) | set(atual['movimentos'])),
+        'documentos': sorted(set((anterior or {}).get('documentos', [])) | set(atual['documentos'])),
+        'partes': atual['partes'],
+        'ultimaDataHora': max(datas + [(anterior or {}).get('ultimaDataHora', '')]),
+    }
+    if anterior is None:
+        # Primeira verificação: apenas o estado inicial
+        return [], novo_estado
+
+    eventos = []
+    conhecidos = set(anterior['movimentos'])
+    novos = [resumo for chave, resumo in atual['movimentos'].items() if chave not in conhecidos]
+    eventos.extend(('movimento_novo', resumo) for resumo in sorted(novos, key=lambda m: m.get('dataHora', '')))
+
+    conhecidos = set(anterior['documentos'])
+    eventos.extend(
+        ('documento_novo', resumo) for id_documento, resumo in atual['documentos'].items()
+        if id_documento not in conhecidos
+    )
+
+    partes_anteriores = anterior.get('partes', {})
+    for chave, parte in atual['partes'].items():
+        if chave not in partes_anteriores:
+            eventos.append(('parte_incluida', parte))
+        elif partes_anteriores[chave] != parte:
+            eventos.append(('parte_alterada', {'antes': partes_anteriores[chave], 'depois': parte}))
+    eventos.extend(
+        ('parte_removida', parte) for chave, parte in partes_anteriores.items()
+        if chave not in atual['partes']
+    )
+    return eventos, novo_estado
+
+
+def data_referencia(estado):
+    """Data de referência da consulta parcial: a mais recente conhecida menos a margem"""
+    try:
+        ultima = datetime.datetime.strptime((estado or {}).get('ultimaDataHora', '')[:14], FORMATO_DATA_MNI)
+    except ValueError:
+        return None
+    return (ultima - datetime.timedelta(hours=MONITORAMENTO_MARGEM_HORAS)).strftime(FORMATO_DATA_MNI)
+
+
+# ----------------------------------------------------------------------
+# Agendador
+# ----------------------------------------------------------------------
+
+# Limite por tribunal compartilhado pelas verificações em andamento
+limites_monitoramento = LimitesTribunal(CONSULTA_MAX_POR_TRIBUNAL)
+
+
+class MonitorProcessos:
+    """Agendador das verificações dos processos monitorados"""
+
+    def __init__(self):
+        self.app = None
+        self.workers = 0
+        self._executor = None
+        self._parar = threading.Event()
+        # Avisa os streams de eventos (SSE) desta instância sobre novas mudanças
+        self._novos_eventos = threading.Condition()
+        self.versao_eventos = 0
+
+    def init_app(self, app, workers=MONITORAMENTO_WORKERS):
+        self.app = app
+        self.workers = workers
+        if workers <= 0:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='monitoramento')
+        threading.Thread(target=self._laco, name='monitoramento-agendador', daemon=True).start()
+
+    # ------------------------------------------------------------------
+    # Operações (usadas pelas rotas)
+    # ------------------------------------------------------------------
+
+    def registrar(self, api_key, numero_processo, cpf, senha, intervalo_minutos=MONITORAMENTO_INTERVALO_PADRAO):
+        """
+        Passa a monitorar o processo para o dono da `api_key`. Se já monitorado,
+        atualiza credenciais e intervalo e reativa. Retorna (monitorado, criado).
+        """
+        monitorado = ProcessoMonitorado.query.filter_by(
+            user_id=api_key.user_id, numero_processo=numero_processo
+        ).first()
+        criado = monitorado is None
+        if criado:
+            monitorado = ProcessoMonitorado(user_id=api_key.user_id, numero_processo=numero_processo)
+            db.session.add(monitorado)
+        monitorado.credenciais = cifrar_credenciais(self.app.config['SECRET_KEY'], cpf, senha)
+        monitorado.intervalo = intervalo_minutos * 60
+        monitorado.ativo = True
+        monitorado.falhas_consecutivas = 0
+        monitorado.proxima_verificacao = _agora()
+        db.session.commit()
+        return monitorado, criado
+
+    def aguardar_eventos(self, versao, timeout):
+        """
+        Aguarda até `timeout` segundos por mudanças registradas nesta instância
+        depois da `versao` informada. Retorna a versão atual (igual à informada
+        se o tempo esgotou).
+        """
+        with self._novos_eventos:
+            self._novos_eventos.wait_for(lambda: self.versao_eventos != versao, timeout)
+            return self.versao_eventos
+
+    def _notificar_eventos(self):
+        with self._novos_eventos:
+            self.versao_eventos += 1
+            self._novos_eventos.notify_all()
+
+    def remover(self, monitorado):
+        """Deixa de monitorar o processo, apagando os eventos registrados"""
+        db.session.delete(monitorado)
+        db.session.commit()
+
+    # ------------------------------------------------------------------
+    # Execução
+    # ------------------------------------------------------------------
+
+    def _reservar_vencidos(self, limite):
+        """Reserva atomicamente até `limite` verificações vencidas; retorna os IDs"""
+        agora = _agora()
+        candidatos = db.session.query(ProcessoMonitorado.id, ProcessoMonitorado.proxima_verificacao).filter(
+            ProcessoMonitorado.ativo.is_(True), ProcessoMonitorado.proxima_verificacao <= agora
+        ).order_by(ProcessoMonitorado.proxima_verificacao).limit(limite).all()
+
+        reservados = []
+        for monitorado_id, proxima in candidatos:
+            reservado = db.session.query(ProcessoMonitorado).filter(
+                ProcessoMonitorado.id == monitorado_id, ProcessoMonitorado.proxima_verificacao == proxima
+            ).update({'proxima_verificacao': agora + datetime.timedelta(seconds=_RESERVA)},
+                     synchronize_session=False)
+            db.session.commit()
+            if reservado:
+                reservados.append(monitorado_id)
+        return reservados
+
+    def _laco(self):
+        while not self._parar.is_set():
+            try:
+                with self.app.app_context():
+                    reservados = self._reservar_vencidos(self.workers * 2)
+                if reservados:
+                    wait([self._executor.submit(self.verificar, monitorado_id) for monitorado_id in reservados])
+                    continue
+            except Exception:
+                logger.exception("Erro no agendador do monitoramento")
+            self._parar.wait(MONITORAMENTO_VARREDURA)
+
+    def verificar(self, monitorado_id):
+        """Consulta o processo, registra as mudanças e agenda a próxima verificação"""
+        with self.app.app_context():
+            monitorado = db.session.get(ProcessoMonitorado, monitorado_id)
+            if monitorado is None or not monitorado.ativo:
+                return None
+
+            agora = _agora()
+            completa = (
+                monitorado.estado is None or monitorado.completo_em is None
+                or agora - monitorado.completo_em >= datetime.timedelta(hours=MONITORAMENTO_COMPLETA_HORAS)
+            )
+            referencia = None if completa else data_referencia(monitorado.estado)
+            cpf, senha = decifrar_credenciais(self.app.config['SECRET_KEY'], monitorado.credenciais)
+            numero = monitorado.numero_processo
+
+            try:
+                if not cpf or not senha:
+                    raise ExcecaoConsultaMNI('Credenciais MNI indisponíveis; cadastre o processo novamente')
+                with limites_monitoramento.semaforo(codigo_tribunal(numero)):
+                    resposta = retorna_processo(numero, cpf=cpf, senha=senha, cache=False,
+                                                incluir_documentos=True, data_referencia=referencia)
+                eventos, estado = comparar_estados(monitorado.estado, extrair_estado(resposta))
+            except Exception as e:
+                logger.warning(f"Falha ao verificar o processo monitorado {numero}: {str(e)}")
+                monitorado.falhas_consecutivas += 1
+                monitorado.ultimo_erro = str(e)
+                espera = monitorado.intervalo * 2 ** min(monitorado.falhas_consecutivas, _MAX_EXPOENTE_FALHAS)
+                monitorado.proxima_verificacao = agora + datetime.timedelta(seconds=espera)
+                db.session.commit()
+                return None
+
+            for tipo, dados in eventos:
+                db.session.add(EventoMudanca(
+                    monitorado_id=monitorado.id,
+                    user_id=monitorado.user_id,
+                    numero_processo=numero,
+                    tipo=tipo,
+                    dados=dados,
+                ))
+            monitorado.estado = estado
+            monitorado.verificado_em = agora
+            if completa:
+                monitorado.completo_em = agora
+            monitorado.falhas_consecutivas = 0
+            monitorado.ultimo_erro = None
+            monitorado.proxima_verificacao = agora + datetime.timedelta(seconds=monitorado.intervalo)
+            db.session.commit()
+
+            if eventos:
+                logger.info(f"Processo monitorado {numero}: {len(eventos)} mudança(s)")
+                self._notificar_eventos()
+            return len(eventos)
+
+
+# Instância global do monitoramento
+monitor_processos = MonitorProcessos()
@@ -0,0 +1,233 @@
+"""
+Índice de movimentações processuais.
+
+As movimentações de um processo são mantidas ordenadas pela data/hora já
+convertida (mais recente primeiro), com um vetor de chaves para buscas por
+intervalo de datas via bisect e um índice invertido de termos (descrição,
+tipo, complementos e categorias) para o filtro `tipo`.
+"""
+import bisect
+import heapq
+import re
+import unicodedata
+from datetime import datetime
+
+from paginacao import codificar_cursor, decodificar_cursor
+
+# Palavras-chave que caracterizam cada categoria de movimentação
+CATEGORIAS_MOVIMENTO = {
+    'sentenca': ['sentença', 'sentenca', 'julgado', 'procedente', 'improcedente', 'extinto'],
+    'recurso': ['recurso', 'apelação', 'apelacao', 'agravo', 'embargos'],
+    'acordao': ['acórdão', 'acordao', 'turma', 'câmara', 'camara'],
+    'transito': ['trânsito', 'transito', 'transitado', 'arquivado'],
+}
+
+# Chave temporal usada para movimentações com data ausente ou inválida
+SEM_DATA = -1
+
+_FORMATOS_NUMERICOS = {
+    14: '%Y%m%d%H%M%S',
+    12: '%Y%m%d%H%M',
+    8: '%Y%m%d',
+}
+
+_RE_TERMO = re.compile(r'\w+')
+
+
+def normalizar_texto(texto):
+    """Converte o texto para minúsculas e remove acentos"""
+    texto = unicodedata.normalize('NFKD', str(texto or '').lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+def extrair_termos(texto):
+    """Retorna os termos normalizados de um texto"""
+    return _RE_TERMO.findall(normalizar_texto(texto))
+
+
+def parse_data_hora(valor):
+    """
+    Converte a data/hora do MNI para datetime.
+    Aceita o formato AAAAMMDDHHMMSS (e variações mais curtas) e ISO 8601.
+    Retorna None se o valor estiver vazio ou for inválido.
+    """
+    if isinstance(valor, datetime):
+        return valor.replace(tzinfo=None)
+
+    texto = str(valor or '').strip()
+    if not texto or texto == 'None':
+        return None
+
+    if texto.isdigit():
+        formato = _FORMATOS_NUMERICOS.get(len(texto))
+        if not formato:
+            return None
+        try:
+            return datetime.strptime(texto, formato)
+        except ValueError:
+            return None
+
+    try:
+        # O horário do MNI é o local do tribunal; o fuso é descartado
+        return datetime.fromisoformat(texto.replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def chave_temporal(valor):
+    """Retorna a data/hora como inteiro AAAAMMDDHHMMSS, ou SEM_DATA se inválida"""
+    data = parse_data_hora(valor)
+    if data is None:
+        return SEM_DATA
+    return int(data.strftime('%Y%m%d%H%M%S'))
+
+
+def ler_limite_data(valor, fim_do_dia=False):
+    """
+    Lê os parâmetros `desde`/`ate` da query string como chave temporal.
+    Datas sem horário cobrem o dia inteiro quando `fim_do_dia` é True.
+    Lança ValueError se a data for inválida.
+    """
+    if not valor:
+        return None
+    data = parse_data_hora(valor)
+    if data is None:
+        raise ValueError(f'Data inválida: {valor}')
+    somente_data = len(re.sub(r'\D', '', valor)) == 8
+    if fim_do_dia and somente_data:
+        data = data.replace(hour=23, minute=59, second=59)
+    return int(data.strftime('%Y%m%d%H%M%S'))
+
+
+def ordenar_movimentos(movimentos):
+    """Ordena as movimentações pela data/hora convertida, mais recente primeiro"""
+    return sorted(movimentos, key=lambda m: chave_temporal(m.get('dataHora')), reverse=True)
+
+
+def termos_movimento(mov):
+    """Retorna o conjunto de termos indexados para uma movimentação"""
+    partes = [mov.get('descricao', ''), mov.get('tipoMovimento', '')]
+    for comp in mov.get('complemento') or []:
+        if isinstance(comp, dict):
+            partes.extend([comp.get('nome', ''), comp.get('descricao', '')])
+        else:
+            partes.append(comp)
+
+    texto = normalizar_texto(' '.join(str(p) for p in partes if p))
+    termos = set(_RE_TERMO.findall(texto))
+    for categoria, palavras in CATEGORIAS_MOVIMENTO.items():
+        if any(normalizar_texto(p) in texto for p in palavras):
+            termos.add(categoria)
+    return termos
+
+
+class IndiceMovimentos:
+    """
+    Movimentações de um processo ordenadas por data/hora, com índice invertido.
+
+    A posição de cada movimentação é dada pela chave (-data, -sequencial), em que
+    o sequencial é a ordem cronológica estável da movimentação. Cursores guardam
+    essa chave, e não a posição, de modo que continuam válidos quando novas
+    movimentações chegam ao topo da lista.
+    """
+
+    def __init__(self, movimentos):
+        cronologicos = sorted(
+            enumerate(movimentos),
+            key=lambda item: (chave_temporal(item[1].get('dataHora')), item[0])
+        )
+        ordenados = [
+            (chave_temporal(mov.get('dataHora')), seq, mov)
+            for seq, (_, mov) in enumerate(cronologicos)
+        ]
+        ordenados.reverse()
+
+        self.movimentos = [mov for _, _, mov in ordenados]
+        self._chaves = [(-data, -seq) for data, seq, _ in ordenados]
+
+        self._postings = {}
+        for posicao, mov in enumerate(self.movimentos):
+            for termo in termos_movimento(mov):
+                self._postings.setdefault(termo, []).append(posicao)
+        self._vocabulario = sorted(self._postings)
+
+    def __len__(self):
+        return len(self.movimentos)
+
+    def _intervalo(self, desde=None, ate=None):
+        """Retorna o intervalo [inicio, fim) de posições entre as datas informadas"""
+        inicio = 0 if ate is None else bisect.bisect_left(self._chaves, (-ate, float('-inf')))
+        fim = len(self._chaves) if desde is None else bisect.bisect_left(self._chaves, (-desde + 1, float('-inf')))
+        return inicio, max(inicio, fim)
+
+    def _postings_termo(self, termo):
+        """Lista de posições para um termo; termos ausentes são tratados como prefixo"""
+        if termo in self._postings:
+            return self._postings[termo]
+        i = bisect.bisect_left(self._vocabulario, termo)
+        listas = []
+        while i < len(self._vocabulario) and self._vocabulario[i].startswith(termo):
+            listas.append(self._postings[self._vocabulario[i]])
+            i += 1
+        if len(listas) == 1:
+            return listas[0]
+        return list(_sem_repeticoes(heapq.merge(*listas)))
+
+    def consultar(self, desde=None, ate=None, tipo=None, cursor=None, limite=10):
+        """
+        Consulta as movimentações por intervalo de datas e termos do tipo.
+        Parâmetros:
+          - desde/ate: chaves temporais (ver ler_limite_data), inclusivas
+          - tipo: texto com um ou mais termos; todos devem estar presentes
+          - cursor: valor de `proximoCursor` de uma página anterior
+          - limite: quantidade máxima de movimentações na página
+        Retorna: (movimentos, total_filtrado, proximo_cursor)
+        Lança ValueError se o cursor for inválido.
+        """
+        inicio, fim = self._intervalo(desde, ate)
+        posicao = inicio
+        if cursor:
+            partes = decodificar_cursor(cursor)
+            if len(partes) != 2 or not all(isinstance(p, int) for p in partes):
+                raise ValueError('Cursor inválido')
+            posicao = max(inicio, bisect.bisect_right(self._chaves, (-partes[0], -partes[1])))
+
+        termos = extrair_termos(tipo) if tipo else []
+        if not termos:
+            selecionadas = list(range(posicao, min(fim, posicao + limite + 1)))
+            total = fim - inicio
+        else:
+            listas = sorted((self._postings_termo(t) for t in termos), key=len)
+            base, demais = listas[0], listas[1:]
+
+            def contem(lista, valor):
+                i = bisect.bisect_left(lista, valor)
+                return i < len(lista) and lista[i] == valor
+
+            if not demais:
+                total = bisect.bisect_left(base, fim) - bisect.bisect_left(base, inicio)
+                i = bisect.bisect_left(base, posicao)
+                selecionadas = [p for p in base[i:i + limite + 1] if p < fim]
+            else:
+                candidatas = base[bisect.bisect_left(base, inicio):bisect.bisect_left(base, fim)]
+                filtradas = [p for p in candidatas if all(contem(l, p) for l in demais)]
+                total = len(filtradas)
+                i = bisect.bisect_left(filtradas, posicao)
+                selecionadas = filtradas[i:i + limite + 1]
+
+        proximo_cursor = None
+        if len(selecionadas) > limite:
+            selecionadas = selecionadas[:limite]
+            data, seq = self._chaves[selecionadas[-1]]
+            proximo_cursor = codificar_cursor(-data, -seq)
+
+        return [self.movimentos[p] for p in selecionadas], total, proximo_cursor
+
+
+def _sem_repeticoes(valores):
+    """Remove repetições consecutivas de uma sequência ordenada"""
+    anterior = None
+    for valor in valores:
+        if valor != anterior:
+            yield valor
+            anterior = valor
@@ -0,0 +1,95 @@
+import base64
+import json
+
+
+def codificar_cursor(*partes):
+    """
+    Gera um cursor opaco a partir das partes da chave de ordenação do último item
+    retornado. O cliente apenas devolve o valor recebido em `proximoCursor`.
+    """
+    bruto = json.dumps(list(partes), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(bruto).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """
+    Converte o cursor opaco de volta para a lista de partes da chave.
+    Lança ValueError se o cursor for inválido.
+    """
+    try:
+        preenchimento = '=' * (-len(cursor) % 4)
+        partes = json.loads(base64.urlsafe_b64decode(cursor + preenchimento))
+    except Exception:
+        raise ValueError('Cursor inválido')
+    if not isinstance(partes, list):
+        raise ValueError('Cursor inválido')
+    return partes
+
+
+def ler_limite(valor, padrao=10, maximo=500):
+    """
+    Lê o parâmetro `limite` da query string, aplicando o valor padrão e o teto.
+    Lança ValueError se o valor não for um inteiro positivo.
+    """
+    if valor in (None, ''):
+        return padrao
+    try:
+        limite = int(valor)
+    except (TypeError, ValueError):
+        raise ValueError('Parâmetro limite deve ser um inteiro')
+    if limite < 1:
+        raise ValueError('Parâmetro limite deve ser maior que zero')
+    return min(limite, maximo)
+
+
+class ListaPaginada:
+    """
+    Lista ordenada de itens identificados por um campo (ex.: idDocumento).
+
+    O cursor guarda o identificador e a posição do último item entregue; a
+    posição localiza a página seguinte em O(1) mesmo com identificadores
+    repetidos, e o identificador confere que ela ainda aponta para o mesmo
+    item (se a lista mudou, vale a ocorrência do identificador mais próxima).
+    """
+
+    def __init__(self, itens, campo_id):
+        self.itens = list(itens)
+        self.campo_id = campo_id
+        self._posicoes = {}
+        for posicao, item in enumerate(self.itens):
+            self._posicoes.setdefault(self._id(item), []).append(posicao)
+
+    def _id(self, item):
+        return str(item.get(self.campo_id, ''))
+
+    def __len__(self):
+        return len(self.itens)
+
+    def _posicao_cursor(self, cursor):
+        partes = decodificar_cursor(cursor)
+        if len(partes) not in (1, 2):
+            raise ValueError('Cursor inválido')
+        posicoes = self._posicoes.get(str(partes[0]))
+        if not posicoes:
+            raise ValueError('Cursor inválido')
+        if len(partes) == 1:
+            return posicoes[0]
+        posicao = partes[1]
+        if not isinstance(posicao, int):
+            raise ValueError('Cursor inválido')
+        if posicao in posicoes:
+            return posicao
+        return min(posicoes, key=lambda p: abs(p - posicao))
+
+    def pagina(self, cursor=None, limite=100):
+        """
+        Retorna (itens, proximo_cursor) a partir do cursor informado.
+        Lança ValueError se o cursor for inválido ou o item não existir mais.
+        """
+        inicio = self._posicao_cursor(cursor) + 1 if cursor else 0
+
+        itens = self.itens[inicio:inicio + limite]
+        proximo_cursor = None
+        if inicio + limite < len(self.itens) and itens:
+            proximo_cursor = codificar_cursor(self._id(itens[-1]), inicio + len(itens) - 1)
+        return itens, proximo_cursor
@@ -0,0 +1,123 @@
+"""
+Prazo (deadline) da requisição HTTP, propagado até as chamadas SOAP ao MNI.
+
+- O cliente informa até quando espera pela resposta em `X-Request-Timeout`
+  (segundos a partir do recebimento) ou `X-Request-Deadline` (instante Unix,
+  em segundos); sem cabeçalho vale PRAZO_PADRAO, e nenhum prazo passa de
+  PRAZO_MAXIMO.
+- O prazo fica em um contextvar durante a requisição. As chamadas ao MNI
+  (funcoes_mni) limitam seus timeouts ao tempo restante e, esgotado o prazo,
+  não começam nem continuam esperando vaga no limite do tribunal: levantam
+  ExcecaoPrazoEsgotado e liberam o worker, já que o cliente desistiu.
+- Threads de segundo plano (jobs, monitoramento) não herdam o prazo; para
+  levá-lo a outra thread use contextvars.copy_context() (ex.: pools de
+  downloads e consultas em lote).
+- Respostas em streaming são consumidas depois do fim da view, quando o
+  prazo já foi limpo: envolva o gerador em gerador_com_prazo.
+"""
+import contextvars
+import logging
+import math
+import time
+
+from config import PRAZO_MAXIMO, PRAZO_PADRAO
+from controle.exceptions import ExcecaoPrazoEsgotado
+
+logger = logging.getLogger(__name__)
+
+# Instante (time.monotonic) em que o cliente deixa de esperar; None sem prazo
+_prazo = contextvars.ContextVar('prazo_requisicao', default=None)
+
+
+def ler_prazo(cabecalhos):
+    """
+    Segundos que o cliente ainda espera, pelos cabeçalhos, entre 0 e
+    PRAZO_MAXIMO. Valores inválidos ou não finitos (nan, inf) são ignorados.
+    """
+    segundos = []
+    for nome, converter in (('X-Request-Timeout', float),
+                            ('X-Request-Deadline', lambda valor: float(valor) - time.time())):
+        valor = cabecalhos.get(nome)
+        if not valor:
+            continue
+        try:
+            prazo = converter(valor)
+        except ValueError:
+            prazo = None
+        if prazo is None or not math.isfinite(prazo):
+            logger.debug(f"Cabeçalho {nome} inválido ignorado: {valor}")
+            continue
+        segundos.append(prazo)
+    return max(0.0, min(min(segundos, default=PRAZO_PADRAO), PRAZO_MAXIMO))
+
+
+def definir_prazo(segundos):
+    """Define o prazo do contexto atual para daqui a `segundos` (None remove)"""
+    _prazo.set(None if segundos is None else time.monotonic() + segundos)
+
+
+def restante():
+    """Segundos até o fim do prazo (negativo se esgotado); None sem prazo"""
+    prazo = _prazo.get()
+    return None if prazo is None else prazo - time.monotonic()
+
+
+def verificar_prazo():
+    """Levanta ExcecaoPrazoEsgotado se o prazo do contexto atual já se esgotou"""
+    segundos = restante()
+    if segundos is not None and segundos <= 0:
+        raise ExcecaoPrazoEsgotado('Prazo da requisição esgotado; chamada ao MNI abandonada')
+
+
+def limitar_timeout(timeout):
+    """Limita um timeout (segundos ou tupla conexão/leitura) ao tempo restante do prazo"""
+    segundos = restante()
+    if segundos is None:
+        return timeout
+    verificar_prazo()
+    if isinstance(timeout, tuple):
+        return tuple(min(t, segundos) for t in timeout)
+    return min(timeout, segundos)
+
+
+def gerador_com_prazo(gerador):
+    """
+    Itera `gerador` sob o prazo do contexto atual, capturado agora (na view).
+    O servidor consome o corpo de uma resposta em streaming após o fim da
+    requisição, quando _limpar_prazo já removeu o prazo.
+    """
+    prazo = _prazo.get()
+
+    def gerar():
+        _prazo.set(prazo)
+        try:
+            yield from gerador
+        finally:
+            _prazo.set(None)
+
+    return gerar()
+
+
+def init_prazos(app):
+    """
+    Registra a leitura do prazo no início de cada requisição, a limpeza ao
+    final e a resposta 504 para ExcecaoPrazoEsgotado que chegue ao Flask.
+    """
+    from flask import jsonify, request
+
+    @app.errorhandler(ExcecaoPrazoEsgotado)
+    def _prazo_esgotado(e):
+        logger.warning(f"Requisição abandonada: {str(e)}")
+        return jsonify({
+            'sucesso': False,
+            'erro': 'PRAZO_ESGOTADO',
+            'mensagem': str(e)
+        }), 504
+
+    @app.before_request
+    def _definir_prazo():
+        definir_prazo(ler_prazo(request.headers))
+
+    @app.teardown_request
+    def _limpar_prazo(exc):
+        definir_prazo(None)
@@ -0,0 +1,324 @@
+"""
+Consulta, parse e cache dos processos do MNI.
+
+Compartilhado entre as rotas de main.py e o blueprint da API (routes/api.py):
+obter_snapshot_processo devolve o SnapshotProcesso do cache local ou consulta
+o MNI, faz o parse da resposta e guarda o resultado.
+"""
+import logging
+import os
+
+from busca import indice_busca
+from cache_processos import SnapshotProcesso, cache_processos, chave_credencial
+from controle.exceptions import ExcecaoPrazoEsgotado, ExcecaoSobrecarga
+from funcoes_mni import codigo_tribunal, roteador_mni
+from middleware import cache_key
+from movimentos import CATEGORIAS_MOVIMENTO, ordenar_movimentos
+from tabelas_referencia import tabelas_referencia
+
+logger = logging.getLogger(__name__)
+
+def credenciais_padrao(cpf=None, senha=None):
+    """Credenciais informadas ou, na falta delas, MNI_CPF/MNI_SENHA do ambiente"""
+    # Lidas a cada chamada: o .env só é carregado depois dos imports (main.py)
+    return cpf or os.getenv('MNI_CPF'), senha or os.getenv('MNI_SENHA')
+
+def consultar_processo_mni(numero_processo, cpf=None, senha=None):
+    """Consulta processo via MNI/SOAP"""
+    try:
+        # Usar credenciais fornecidas ou padrão
+        cpf, senha = credenciais_padrao(cpf, senha)
+        
+        if not cpf or not senha:
+            return None, "Credenciais não fornecidas"
+        
+        # Fazer a consulta no endpoint do tribunal (e da instância) do processo
+        response = roteador_mni.executar(numero_processo, lambda client: client.service.consultarProcesso(
+            idConsultante=cpf,
+            senhaConsultante=senha,
+            numeroProcesso=numero_processo,
+            movimentos=True,
+            incluirCabecalho=True,
+            incluirDocumentos=True
+        ))
+        logger.info(f"Processo {numero_processo} consultado em {roteador_mni.para_processo(numero_processo).url}")
+        
+        return response, None
+        
+    except (ExcecaoPrazoEsgotado, ExcecaoSobrecarga):
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao consultar MNI: {str(e)}")
+        return None, str(e)
+
+def chave_snapshot_processo(numero_processo, cpf=None, senha=None):
+    """Chave do processo parseado no cache local, por credencial"""
+    cpf, senha = credenciais_padrao(cpf, senha)
+    return cache_key(numero_processo, f'mni:{chave_credencial(cpf, senha)}')
+
+def obter_snapshot_processo(numero_processo, cpf=None, senha=None):
+    """Obtém o processo parseado do cache local ou, se ausente, consulta o MNI"""
+    cpf, senha = credenciais_padrao(cpf, senha)
+    chave = chave_snapshot_processo(numero_processo, cpf, senha)
+
+    snapshot = cache_processos.obter(chave)
+    if snapshot:
+        logger.debug(f"Processo {numero_processo} servido do cache")
+        return snapshot, None
+
+    response, error = consultar_processo_mni(numero_processo, cpf, senha)
+    if error:
+        return None, error
+
+    processo_data = parse_processo_response(response)
+    if not processo_data['sucesso']:
+        return None, processo_data['mensagem']
+
+    tabelas_referencia.enriquecer_processo(processo_data['processo'], codigo_tribunal(numero_processo))
+    snapshot = SnapshotProcesso(numero_processo, processo_data['processo'])
+    cache_processos.guardar(chave, snapshot)
+    indice_busca.agendar_processo(numero_processo, snapshot.processo, snapshot.digest, chave_credencial(cpf, senha))
+    return snapshot, None
+
+def parse_processo_response(response):
+    """Parse da resposta SOAP para JSON com todos os detalhes"""
+    try:
+        processo_data = {
+            'sucesso': True,
+            'processo': {
+                'dadosBasicos': {},
+                'documentos': [],
+                'polos': [],
+                'movimentos': [],
+                'assuntos': [],
+                'resumo': {}
+            }
+        }
+        
+        # Extrair dados básicos
+        if hasattr(response, 'processo'):
+            proc = response.processo
+            
+            # Dados básicos
+            if hasattr(proc, 'dadosBasicos'):
+                dados = proc.dadosBasicos
+                processo_data['processo']['dadosBasicos'] = {
+                    'numero': getattr(dados, 'numero', ''),
+                    'classeProcessualNome': getattr(dados, 'classeProcessualNome', ''),
+                    'classeProcessualCodigo': getattr(dados, 'classeProcessual', '') or getattr(dados, 'codigoClasseProcessual', ''),
+                    'codigoLocalidade': getattr(dados, 'codigoLocalidade', ''),
+                    'dataAjuizamento': str(getattr(dados, 'dataAjuizamento', '')),
+                    'valorCausa': float(getattr(dados, 'valorCausa', 0)),
+                    'nivelSigilo': int(getattr(dados, 'nivelSigilo', 0)),
+                    'orgaoJulgador': {
+                        'nome': getattr(dados.orgaoJulgador, 'nomeOrgao', '') if hasattr(dados, 'orgaoJulgador') else '',
+                        'codigo': getattr(dados.orgaoJulgador, 'codigoOrgao', '') if hasattr(dados, 'orgaoJulgador') else '',
+                        'instancia': getattr(dados.orgaoJulgador, 'instancia', 'ORIG') if hasattr(dados, 'orgaoJulgador') else 'ORIG'
+                    },
+                    'prioridade': getattr(dados, 'prioridade', ''),
+                    'competencia': getattr(dados, 'competencia', '')
+                }
+                
+                # Assuntos
+                if hasattr(dados, 'assunto') and dados.assunto:
+                    for assunto in dados.assunto:
+                        processo_data['processo']['assuntos'].append({
+                            'codigo': getattr(assunto, 'codigoNacional', ''),
+                            'descricao': getattr(assunto, 'descricao', ''),
+                            'principal': getattr(assunto, 'principal', False)
+                        })
+            
+            # Documentos
+            if hasattr(proc, 'documento') and proc.documento:
+                for doc in proc.documento:
+                    doc_data = {
+                        'idDocumento': getattr(doc, 'idDocumento', ''),
+                        'tipoDocumentoNome': getattr(doc, 'tipoDocumento', ''),
+                        'tipoDocumentoCodigo': getattr(doc, 'tipoDocumentoCodigo', ''),
+                        'descricao': getattr(doc, 'descricao', ''),
+                        'dataHoraInclusao': str(getattr(doc, 'dataHora', '')),
+                        'mimetype': getattr(doc, 'mimetype', 'application/pdf'),
+                        'nivelSigilo': int(getattr(doc, 'nivelSigilo', 0)),
+                        'hash': getattr(doc, 'hash', ''),
+                        'tamanho': getattr(doc, 'tamanho', 0)
+                    }
+                    
+                    # Documentos vinculados (anexos)
+                    if hasattr(doc, 'documentoVinculado') and doc.documentoVinculado:
+                        doc_data['documentosVinculados'] = []
+                        for vinc in doc.documentoVinculado:
+                            doc_data['documentosVinculados'].append({
+                                'idDocumento': getattr(vinc, 'idDocumento', ''),
+                                'tipoDocumentoNome': getattr(vinc, 'tipoDocumento', ''),
+                                'descricao': getattr(vinc, 'descricao', ''),
+                                'hash': getattr(vinc, 'hash', '')
+                            })
+                    
+                    processo_data['processo']['documentos'].append(doc_data)
+            
+            # Polos
+            if hasattr(proc, 'polo') and proc.polo:
+                for polo in proc.polo:
+                    polo_data = {
+                        'polo': getattr(polo, 'polo', ''),
+                        'parte': []
+                    }
+                    
+                    if hasattr(polo, 'parte') and polo.parte:
+                        for parte in polo.parte:
+                            parte_data = {
+                                'nome': getattr(parte, 'nome', ''),
+                                'tipoPessoa': getattr(parte, 'tipoPessoa', ''),
+                                'numeroDocumentoPrincipal': getattr(parte, 'numeroDocumentoPrincipal', ''),
+                                'dataNascimento': str(getattr(parte, 'dataNascimento', '')) if hasattr(parte, 'dataNascimento') else '',
+                                'nomeGenitor': getattr(parte, 'nomeGenitor', ''),
+                                'nomeGenitora': getattr(parte, 'nomeGenitora', '')
+                            }
+                            
+                            # Endereço
+                            if hasattr(parte, 'endereco'):
+                                end = parte.endereco
+                                parte_data['endereco'] = {
+                                    'cep': getattr(end, 'cep', ''),
+                                    'logradouro': getattr(end, 'logradouro', ''),
+                                    'numero': getattr(end, 'numero', ''),
+                                    'complemento': getattr(end, 'complemento', ''),
+                                    'bairro': getattr(end, 'bairro', ''),
+                                    'cidade': getattr(end, 'cidade', ''),
+                                    'estado': getattr(end, 'estado', '')
+                                }
+                            
+                            # Representantes (advogados)
+                            if hasattr(parte, 'representanteProcessual') and parte.representanteProcessual:
+                                parte_data['advogados'] = []
+                                for rep in parte.representanteProcessual:
+                                    parte_data['advogados'].append({
+                                        'nome': getattr(rep, 'nome', ''),
+                                        'inscricao': getattr(rep, 'inscricao', ''),
+                                        'numeroDocumentoPrincipal': getattr(rep, 'numeroDocumentoPrincipal', ''),
+                                        'tipoRepresentante': getattr(rep, 'tipoRepresentante', '')
+                                    })
+                            
+                            polo_data['parte'].append(parte_data)
+                    
+                    processo_data['processo']['polos'].append(polo_data)
+            
+            # Movimentos processuais
+            if hasattr(proc, 'movimento') and proc.movimento:
+                for mov in proc.movimento:
+                    mov_data = {
+                        'dataHora': str(getattr(mov, 'dataHora', '')),
+                        'descricao': getattr(mov, 'descricao', ''),
+                        'tipoMovimento': getattr(mov, 'tipoMovimento', ''),
+                        'complemento': []
+                    }
+                    
+                    # Complementos do movimento
+                    if hasattr(mov, 'complemento') and mov.complemento:
+                        for comp in mov.complemento:
+                            mov_data['complemento'].append({
+                                'nome': getattr(comp, 'nome', ''),
+                                'descricao': getattr(comp, 'descricao', '')
+                            })
+                    
+                    processo_data['processo']['movimentos'].append(mov_data)
+                
+                # Ordenar movimentos por data (mais recente primeiro)
+                processo_data['processo']['movimentos'] = ordenar_movimentos(
+                    processo_data['processo']['movimentos']
+                )
+            
+            # Gerar resumo do processo
+            processo_data['processo']['resumo'] = gerar_resumo_processo(processo_data['processo'])
+        
+        return processo_data
+        
+    except Exception as e:
+        logger.error(f"Erro ao fazer parse da resposta: {str(e)}")
+        return {
+            'sucesso': False,
+            'erro': 'PARSE_ERROR',
+            'mensagem': f'Erro ao processar resposta: {str(e)}'
+        }
+
+def gerar_resumo_processo(processo):
+    """Gera um resumo analítico do processo"""
+    resumo = {
+        'situacao': 'EM_ANDAMENTO',
+        'temSentenca': False,
+        'temRecurso': False,
+        'temAcordao': False,
+        'faseAtual': 'CONHECIMENTO',
+        'ultimasMovimentacoes': [],
+        'proximosPassos': [],
+        'analise': ''
+    }
+    
+    # Analisar movimentos para determinar situação
+    movimentos = processo.get('movimentos', [])
+    
+    palavras_sentenca = CATEGORIAS_MOVIMENTO['sentenca']
+    palavras_recurso = CATEGORIAS_MOVIMENTO['recurso']
+    palavras_acordao = CATEGORIAS_MOVIMENTO['acordao']
+    palavras_transito = CATEGORIAS_MOVIMENTO['transito']
+    
+    for mov in movimentos[:20]:  # Analisar últimos 20 movimentos
+        desc_lower = mov['descricao'].lower()
+        
+        # Verificar sentença
+        if any(palavra in desc_lower for palavra in palavras_sentenca):
+            resumo['temSentenca'] = True
+            resumo['faseAtual'] = 'SENTENCIADO'
+        
+        # Verificar recurso
+        if any(palavra in desc_lower for palavra in palavras_recurso):
+            resumo['temRecurso'] = True
+            resumo['faseAtual'] = 'RECURSAL'
+        
+        # Verificar acórdão
+        if any(palavra in desc_lower for palavra in palavras_acordao):
+            resumo['temAcordao'] = True
+            resumo['faseAtual'] = 'SEGUNDA_INSTANCIA'
+        
+        # Verificar trânsito em julgado
+        if any(palavra in desc_lower for palavra in palavras_transito):
+            resumo['situacao'] = 'ARQUIVADO'
+            resumo['faseAtual'] = 'TRANSITADO_JULGADO'
+    
+    # Últimas 5 movimentações
+    resumo['ultimasMovimentacoes'] = movimentos[:5] if movimentos else []
+    
+    # Análise textual
+    instancia = processo['dadosBasicos']['orgaoJulgador']['instancia']
+    if instancia == 'ORIG':
+        instancia_texto = '1ª instância'
+    elif instancia == 'RECURSAL':
+        instancia_texto = '2ª instância'
+    else:
+        instancia_texto = instancia
+    
+    resumo['analise'] = f"Processo em tramitação na {instancia_texto}. "
+    
+    if resumo['temSentenca']:
+        resumo['analise'] += "Já foi proferida sentença. "
+    
+    if resumo['temRecurso']:
+        resumo['analise'] += "Há recurso interposto. "
+    
+    if resumo['temAcordao']:
+        resumo['analise'] += "Já houve julgamento em 2º grau. "
+    
+    if resumo['situacao'] == 'ARQUIVADO':
+        resumo['analise'] += "Processo arquivado/transitado em julgado. "
+    
+    # Próximos passos possíveis
+    if not resumo['temSentenca']:
+        resumo['proximosPassos'].append("Aguardar sentença de 1º grau")
+    elif resumo['temSentenca'] and not resumo['temRecurso']:
+        resumo['proximosPassos'].append("Prazo para recurso")
+    elif resumo['temRecurso'] and not resumo['temAcordao']:
+        resumo['proximosPassos'].append("Aguardar julgamento do recurso")
+    elif resumo['temAcordao']:
+        resumo['proximosPassos'].append("Verificar possibilidade de recursos aos tribunais superiores")
+    
+    return resumo
@@ -0,0 +1,152 @@
+"""
+Projeção de campos (parâmetro `fields`) sobre os dados do processo.
+
+Exemplo: fields=dadosBasicos.numero,polos.parte.nome,movimentos[0:5]
+  - caminhos separados por vírgula, níveis separados por ponto
+  - listas são percorridas item a item
+  - `[i:j]` ou `[i]` recorta a lista antes de descer ao próximo nível
+  - caminhos fora dos campos conhecidos do formato (CAMPOS_PROCESSO,
+    CAMPOS_CAPA) são recusados, em vez de resultarem em um objeto vazio
+"""
+import re
+
+_RE_SEGMENTO = re.compile(r'^(\w+)(?:\[(-?\d*)(:)?(-?\d*)\])?$')
+
+
+def _campos(*simples, **compostos):
+    """Esquema de um nível: campos simples (None) e campos com subcampos"""
+    return dict(dict.fromkeys(simples), **compostos)
+
+
+_CAMPOS_MOVIMENTO = _campos('dataHora', 'descricao', 'tipoMovimento',
+                            complemento=_campos('nome', 'descricao'))
+
+# Campos do processo no formato de parse_processo_response (processos.py)
+CAMPOS_PROCESSO = _campos(
+    dadosBasicos=_campos(
+        'numero', 'classeProcessualNome', 'classeProcessualCodigo', 'codigoLocalidade',
+        'dataAjuizamento', 'valorCausa', 'nivelSigilo', 'prioridade', 'competencia',
+        orgaoJulgador=_campos('nome', 'codigo', 'instancia'),
+    ),
+    assuntos=_campos('codigo', 'descricao', 'principal'),
+    documentos=_campos(
+        'idDocumento', 'tipoDocumentoNome', 'tipoDocumentoCodigo', 'descricao', 'dataHoraInclusao',
+        'mimetype', 'nivelSigilo', 'hash', 'tamanho',
+        documentosVinculados=_campos('idDocumento', 'tipoDocumentoNome', 'tipoDocumentoCodigo',
+                                     'descricao', 'hash'),
+    ),
+    polos=_campos(
+        'polo',
+        parte=_campos(
+            'nome', 'tipoPessoa', 'numeroDocumentoPrincipal', 'dataNascimento', 'nomeGenitor', 'nomeGenitora',
+            endereco=_campos('cep', 'logradouro', 'numero', 'complemento', 'bairro', 'cidade', 'estado'),
+            advogados=_campos('nome', 'inscricao', 'numeroDocumentoPrincipal', 'tipoRepresentante'),
+        ),
+    ),
+    movimentos=_CAMPOS_MOVIMENTO,
+    resumo=_campos('situacao', 'temSentenca', 'temRecurso', 'temAcordao', 'faseAtual', 'proximosPassos',
+                   'analise', ultimasMovimentacoes=_CAMPOS_MOVIMENTO),
+)
+
+# Campos da capa no formato de extract_capa_processo (utils.py)
+CAMPOS_CAPA = _campos(
+    'numero', 'classeProcessual', 'classeProcessualNome', 'codigoLocalidade', 'dataAjuizamento',
+    'valorCausa', 'nivelSigilo', 'intervencaoMP', 'orgaoJulgador', 'jurisdicao',
+    assuntos=_campos('codigo', 'descricao', 'principal'),
+    polos=_campos('polo', partes=_campos('nome', 'documento', advogados=_campos('nome', 'numeroOAB'))),
+    movimentacoes=_campos('dataHora', 'codigoMovimento', 'descricao', 'complemento'),
+)
+
+
+def parse_campos(campos, esquema=CAMPOS_PROCESSO):
+    """
+    Converte a especificação de campos em uma árvore de projeção.
+    Retorna None quando não há projeção (todos os campos).
+    Lança ValueError se algum caminho for inválido ou não existir no esquema.
+    """
+    if not campos:
+        return None
+
+    arvore = {}
+    for caminho in campos.split(','):
+        caminho = caminho.strip()
+        if not caminho:
+            continue
+
+        nivel = arvore
+        segmentos = caminho.split('.')
+        for i, segmento in enumerate(segmentos):
+            m = _RE_SEGMENTO.match(segmento.strip())
+            if not m:
+                raise ValueError(f'Campo inválido: {caminho}')
+            nome, inicio, separador, fim = m.groups()
+
+            fatia = None
+            if separador:
+                fatia = slice(int(inicio) if inicio else None, int(fim) if fim else None)
+            elif inicio:
+                indice = int(inicio)
+                fatia = slice(indice, indice + 1 if indice != -1 else None)
+            elif '[' in segmento:
+                raise ValueError(f'Campo inválido: {caminho}')
+
+            no = nivel.get(nome)
+            if no is None:
+                no = nivel[nome] = {'fatia': fatia, 'filhos': {}}
+            elif fatia is not None:
+                no['fatia'] = fatia
+
+            if i == len(segmentos) - 1:
+                # Campo pedido por inteiro: prevalece sobre subcampos
+                no['filhos'] = None
+            if no['filhos'] is None:
+                break
+            nivel = no['filhos']
+
+    if esquema is not None:
+        _validar_campos(arvore, esquema)
+    return arvore or None
+
+
+def _validar_campos(arvore, esquema, prefixo=''):
+    """Lança ValueError para o primeiro caminho da árvore ausente do esquema"""
+    for nome, no in arvore.items():
+        caminho = f'{prefixo}{nome}'
+        if nome not in esquema:
+            conhecidos = ', '.join(sorted(esquema))
+            raise ValueError(f'Campo desconhecido: {caminho} (campos disponíveis: {conhecidos})')
+        if no['filhos']:
+            if esquema[nome] is None:
+                raise ValueError(f'Campo desconhecido: {caminho}.{next(iter(no["filhos"]))} '
+                                 f'({caminho} não possui subcampos)')
+            _validar_campos(no['filhos'], esquema[nome], f'{caminho}.')
+
+
+def secoes_raiz(arvore):
+    """Retorna o conjunto de campos do primeiro nível, ou None se não há projeção"""
+    if arvore is None:
+        return None
+    return set(arvore)
+
+
+def aplicar_projecao(dados, arvore):
+    """
+    Monta apenas as partes dos dados pedidas na árvore de projeção.
+    Os dados originais não são alterados; valores não projetados não são copiados.
+    """
+    if arvore is None:
+        return dados
+    if isinstance(dados, list):
+        return [aplicar_projecao(item, arvore) for item in dados]
+    if not isinstance(dados, dict):
+        return dados
+
+    resultado = {}
+    for nome, no in arvore.items():
+        if nome not in dados:
+            continue
+        valor = dados[nome]
+        if no['fatia'] is not None and isinstance(valor, list):
+            valor = valor[no['fatia']]
+        resultado[nome] = aplicar_projecao(valor, no['filhos'])
+    return resultado
@@ -0,0 +1,151 @@
+"""
+Utilitários de resposta HTTP para payloads grandes.
+
+Serialização JSON em streaming: o documento é emitido em blocos a partir de
+um gerador sobre os dados do processo, sem montar a string completa em
+memória. Cada item de lista (movimento, documento) é serializado de uma vez
+pelo encoder mais rápido disponível (orjson, se instalado).
+
+GET condicional: o ETag de uma resposta é derivado do digest do snapshot em
+cache, da rota e dos parâmetros (projeção, paginação), permitindo responder
+304 antes de montar ou serializar qualquer dado.
+"""
+import hashlib
+import json
+
+from flask import Response, jsonify, request
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson é opcional
+    orjson = None
+
+# Tamanho aproximado de cada bloco enviado ao cliente
+TAMANHO_BLOCO_JSON = 64 * 1024
+
+_VALORES_VERDADEIROS = ('1', 'true', 'sim')
+
+
+def _dumps(valor):
+    """Serializa um valor para bytes JSON"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(valor, default=str, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass
+    return json.dumps(valor, ensure_ascii=False, default=str).encode('utf-8')
+
+
+def _partes_json(valor):
+    """Percorre dicionários e listas emitindo os fragmentos JSON em ordem"""
+    if isinstance(valor, dict):
+        yield b'{'
+        for i, (chave, item) in enumerate(valor.items()):
+            if i:
+                yield b','
+            yield _dumps(str(chave))
+            yield b':'
+            yield from _partes_json(item)
+        yield b'}'
+    elif isinstance(valor, (list, tuple)):
+        yield b'['
+        for i, item in enumerate(valor):
+            if i:
+                yield b','
+            if isinstance(item, (list, tuple)):
+                yield from _partes_json(item)
+            else:
+                yield _dumps(item)
+        yield b']'
+    else:
+        yield _dumps(valor)
+
+
+def gerar_json(dados, tamanho_bloco=TAMANHO_BLOCO_JSON):
+    """Gera o JSON de `dados` em blocos de aproximadamente `tamanho_bloco` bytes"""
+    buffer = []
+    tamanho = 0
+    for parte in _partes_json(dados):
+        buffer.append(parte)
+        tamanho += len(parte)
+        if tamanho >= tamanho_bloco:
+            yield b''.join(buffer)
+            buffer = []
+            tamanho = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def linha_ndjson(dados):
+    """Serializa `dados` como uma linha NDJSON (JSON seguido de quebra de linha)"""
+    return _dumps(dados) + b'\n'
+
+
+def mensagem_sse(dados, evento=None, id_evento=None):
+    """Serializa uma mensagem Server-Sent Events (`dados` em JSON numa única linha)"""
+    partes = []
+    if id_evento is not None:
+        partes.append(f'id: {id_evento}\n'.encode('utf-8'))
+    if evento:
+        partes.append(f'event: {evento}\n'.encode('utf-8'))
+    partes.append(b'data: ' + _dumps(dados) + b'\n\n')
+    return b''.join(partes)
+
+
+def quer_stream():
+    """Indica se o cliente pediu a resposta em streaming (?stream=1)"""
+    return request.args.get('stream', '').lower() in _VALORES_VERDADEIROS
+
+
+def resposta_json_stream(dados, status=200):
+    """Resposta Flask que envia `dados` como JSON em streaming"""
+    return Response(gerar_json(dados), status=status, mimetype='application/json')
+
+
+def calcular_etag(digest):
+    """ETag forte para a requisição atual a partir do digest do snapshot"""
+    parametros = '&'.join(
+        f'{chave}={valor}'
+        for chave, valor in sorted(request.args.items(multi=True))
+        if chave != 'stream'
+    )
+    base = f'{digest}|{request.path}|{parametros}'
+    return hashlib.sha256(base.encode('utf-8')).hexdigest()[:32]
+
+
+def _aplicar_cache_headers(resposta, etag):
+    resposta.set_etag(etag)
+    # Dados obtidos com credenciais do cliente: só cache privado, sempre revalidado
+    resposta.headers['Cache-Control'] = 'private, no-cache'
+    return resposta
+
+
+def resposta_nao_modificada(etag):
+    """Retorna uma resposta 304 se o If-None-Match do cliente casa com o ETag, senão None"""
+    if etag and request.if_none_match.contains_weak(etag):
+        return _aplicar_cache_headers(Response(status=304), etag)
+    return None
+
+
+def resposta_texto(texto, etag=None):
+    """Resposta em texto simples (UTF-8), com os cabeçalhos de validação se `etag` for informado"""
+    resposta = Response(texto, mimetype='text/plain')
+    resposta.charset = 'utf-8'
+    if etag:
+        _aplicar_cache_headers(resposta, etag)
+    return resposta
+
+
+def resposta_json(dados, status=200, etag=None):
+    """
+    Resposta JSON em streaming se solicitado pelo cliente, senão via jsonify.
+    Se `etag` for informado, a resposta inclui os cabeçalhos de validação.
+    """
+    if quer_stream():
+        resposta = resposta_json_stream(dados, status=status)
+    else:
+        resposta = jsonify(dados)
+        resposta.status_code = status
+    if etag:
+        _aplicar_cache_headers(resposta, etag)
+    return resposta
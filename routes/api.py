@@ -1,17 +1,36 @@
-from flask import Blueprint, jsonify, send_file, request, g
+from flask import Blueprint, Response, jsonify, send_file, request, g, stream_with_context
 import os
 import logging
+import time
+import uuid
 from funcoes_mni import (
+    codigo_tribunal,
     retorna_processo,
     retorna_documento_processo,
     retorna_peticao_inicial_e_anexos
 )
 from utils import (
-    extract_mni_data,
     extract_capa_processo,
     extract_all_document_ids
 )
-import tempfile
+from busca import indice_busca, montar_consulta
+from cache_processos import SnapshotProcesso, cache_processos, chave_credencial
+from middleware import (cache_key, emitir_token_stream, require_api_key, require_api_key_ou_token, sem_compressao,
+                        validate_processo_number)
+from paginacao import ler_limite
+from processos import obter_snapshot_processo
+from projecao import CAMPOS_CAPA, parse_campos, aplicar_projecao, secoes_raiz
+from documentos import enviar_documento, listar_documentos_ordenados, obter_documento_local
+from jobs import STATUS_FINAIS, fila_jobs, validar_job
+from models import EventoMudanca, Job, ProcessoMonitorado
+from monitoramento import monitor_processos
+from respostas import calcular_etag, mensagem_sse, resposta_json, resposta_nao_modificada, resposta_texto
+from tabelas_referencia import tabelas_referencia
+from textos import extrator_textos, suporta_extracao
+from config import (EVENTOS_STREAM_DURACAO, EVENTOS_STREAM_ESPERA, MONITORAMENTO_INTERVALO_MINIMO,
+                    MONITORAMENTO_INTERVALO_PADRAO, TEXTO_ESPERA, TOKEN_STREAM_VALIDADE)
+from controle.exceptions import ExcecaoIntegridadeDocumento, ExcecaoPrazoEsgotado, ExcecaoSobrecarga
+from database import db
 
 # Configuração de logger
 logger = logging.getLogger(__name__)
@@ -39,13 +58,38 @@ def get_mni_credentials():
     return cpf, senha
 
 
+@api.errorhandler(ExcecaoPrazoEsgotado)
+def prazo_esgotado(e):
+    """Prazo da requisição esgotado durante a chamada ao MNI (ver prazos.py)"""
+    logger.warning(f"API: Requisição abandonada: {str(e)}")
+    return jsonify({
+        'erro': 'Prazo esgotado',
+        'mensagem': str(e)
+    }), 504
+
+
+@api.errorhandler(ExcecaoSobrecarga)
+def sobrecarga(e):
+    """Chamada ao MNI recusada pelo controle de admissão (ver funcoes_mni.ControleAdmissao)"""
+    return jsonify({
+        'erro': 'Serviço sobrecarregado',
+        'mensagem': str(e)
+    }), 503, {'Retry-After': str(e.retry_after)}
+
+
 @api.route('/processo/<num_processo>', methods=['GET'])
 def get_processo(num_processo):
     """
-    Consulta os dados básicos de um processo (sem listar documentos ou conteúdos).
+    Consulta os dados completos do processo (dados básicos, polos, movimentos
+    e documentos), a partir do processo em cache ou do MNI.
     Usa CPF/Senha do MNI (header ou ambiente).
+    Com `limite` (e opcionalmente `cursor_movimentos`/`cursor_documentos`),
+    movimentos e documentos são paginados a partir do processo em cache.
+    O parâmetro opcional `fields` limita os campos retornados e `stream=1`
+    envia o JSON em blocos à medida que é serializado.
+    Responde 304 quando o If-None-Match corresponde ao ETag do processo em cache.
     Exemplo:
-      GET /api/v1/processo/1234567-89.2024.8.17.0001
+      GET /api/v1/processo/1234567-89.2024.8.17.0001?limite=50&fields=dadosBasicos.numero,movimentos
       Headers:
         X-MNI-CPF: 06293234456
         X-MNI-SENHA: Simb@280303
@@ -60,26 +104,71 @@ def get_processo(num_processo):
                 'mensagem': 'Forneça os headers X-MNI-CPF e X-MNI-SENHA'
             }), 401
 
-        resposta = retorna_processo(num_processo, cpf=cpf, senha=senha)
-        if not resposta:
+        cursor_movimentos = request.args.get('cursor_movimentos')
+        cursor_documentos = request.args.get('cursor_documentos')
+        paginar = bool(request.args.get('limite') or cursor_movimentos or cursor_documentos)
+        try:
+            limite = ler_limite(request.args.get('limite'), padrao=100)
+            campos = parse_campos(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({
+                'erro': 'Parâmetro inválido',
+                'mensagem': str(e)
+            }), 400
+
+        snapshot, erro = obter_snapshot_processo(num_processo, cpf, senha)
+        if erro:
             return jsonify({
                 'erro': 'Processo não encontrado',
-                'mensagem': f'Não foi possível obter dados para o processo {num_processo}'
+                'mensagem': erro
             }), 404
 
-        # Extrai dados brutos do MNI e formata
-        dados_brutos = extract_mni_data(resposta)
-        dados_formatados = {
-            'numero': dados_brutos.get('numero'),
-            'classe': dados_brutos.get('classe'),
-            'assunto': dados_brutos.get('assunto'),
-            'valor_causa': dados_brutos.get('valor_causa'),
-            'partes': dados_brutos.get('partes'),
-            'movimentacoes': dados_brutos.get('movimentacoes'),
-            # Adicione outros campos conforme necessário
-        }
-        return jsonify(dados_formatados)
-
+        etag = calcular_etag(snapshot.digest)
+        nao_modificada = resposta_nao_modificada(etag)
+        if nao_modificada:
+            return nao_modificada
+
+        if not paginar:
+            return resposta_json({
+                'sucesso': True,
+                'mensagem': 'Processo consultado com sucesso',
+                'processo': aplicar_projecao(snapshot.processo, campos)
+            }, etag=etag)
+
+        try:
+            movimentos, total_movimentos, proximo_movimentos = snapshot.movimentos.consultar(
+                cursor=cursor_movimentos, limite=limite
+            )
+            documentos, proximo_documentos = snapshot.documentos.pagina(
+                cursor=cursor_documentos, limite=limite
+            )
+        except ValueError as e:
+            return jsonify({
+                'erro': 'Parâmetro inválido',
+                'mensagem': str(e)
+            }), 400
+
+        # Cópia rasa: o snapshot em cache é compartilhado e não deve ser alterado
+        processo = dict(snapshot.processo, movimentos=movimentos, documentos=documentos)
+
+        return resposta_json({
+            'sucesso': True,
+            'mensagem': 'Processo consultado com sucesso',
+            'processo': aplicar_projecao(processo, campos),
+            'paginacao': {
+                'movimentos': {
+                    'total': total_movimentos,
+                    'proximoCursor': proximo_movimentos
+                },
+                'documentos': {
+                    'total': len(snapshot.documentos),
+                    'proximoCursor': proximo_documentos
+                }
+            }
+        }, etag=etag)
+
+    except (ExcecaoPrazoEsgotado, ExcecaoSobrecarga):
+        raise
     except Exception as e:
         logger.error(f"API: Erro ao consultar processo: {str(e)}", exc_info=True)
         return jsonify({
@@ -88,10 +177,30 @@ def get_processo(num_processo):
         }), 500
 
 
+def hash_mni_documento(num_processo, id_documento, cpf, senha):
+    """
+    Hash informado pelo MNI para o documento, usado para conferir o download.
+    Vem da listagem de documentos em cache ou, se ausente, do processo
+    (em cache ou consultado, ficando disponível para os próximos documentos).
+    """
+    snapshot = cache_processos.obter(chave_snapshot_documentos(num_processo, cpf, senha))
+    if snapshot is None:
+        snapshot, _ = obter_snapshot_processo(num_processo, cpf, senha)
+        if snapshot is None:
+            return None
+    for doc in listar_documentos_ordenados(snapshot.processo):
+        if str(doc['idDocumento']) == str(id_documento):
+            return doc.get('hash') or None
+    return None
+
+
 @api.route('/processo/<num_processo>/documento/<id_documento>', methods=['GET'])
+@sem_compressao
 def get_documento(num_processo, id_documento):
     """
     Obtém o binário de um documento específico do processo.
+    O arquivo é servido do armazém local (baixado do MNI na primeira vez),
+    com Content-Type pelo mimetype e suporte a Range/If-Range.
     Uso:
       GET /api/v1/processo/<num_processo>/documento/<id_documento>
       Headers:
@@ -108,21 +217,24 @@ def get_documento(num_processo, id_documento):
                 'mensagem': 'Forneça os headers X-MNI-CPF e X-MNI-SENHA'
             }), 401
 
-        conteudo = retorna_documento_processo(num_processo, id_documento, cpf, senha)
-        if not conteudo:
+        hash_esperado = hash_mni_documento(num_processo, id_documento, cpf, senha)
+        resposta = enviar_documento(num_processo, id_documento, cpf, senha, hash_esperado=hash_esperado)
+        if resposta is None:
             return jsonify({
                 'erro': 'Documento não encontrado',
                 'mensagem': f'ID {id_documento} não encontrado para o processo {num_processo}'
             }), 404
 
-        tmp = tempfile.NamedTemporaryFile(delete=False)
-        tmp.write(conteudo)
-        tmp.flush()
-        tmp.close()
-        return send_file(tmp.name,
-                         as_attachment=True,
-                         attachment_filename=f'{id_documento}.pdf')
+        return resposta
 
+    except (ExcecaoPrazoEsgotado, ExcecaoSobrecarga):
+        raise
+    except ExcecaoIntegridadeDocumento as e:
+        logger.error(f"API: {str(e)}")
+        return jsonify({
+            'erro': 'Documento corrompido',
+            'mensagem': str(e)
+        }), 502
     except Exception as e:
         logger.error(f"API: Erro ao baixar documento: {str(e)}", exc_info=True)
         return jsonify({
@@ -131,6 +243,79 @@ def get_documento(num_processo, id_documento):
         }), 500
 
 
+@api.route('/processo/<num_processo>/documento/<id_documento>/texto', methods=['GET'])
+def get_texto_documento(num_processo, id_documento):
+    """
+    Obtém o texto simples de um documento HTML ou texto do processo.
+    O texto é extraído uma única vez (em segundo plano) e servido do cache;
+    se a extração não terminar em TEXTO_ESPERA segundos, retorna 202 com
+    Retry-After para o cliente consultar novamente.
+    Uso:
+      GET /api/v1/processo/<num_processo>/documento/<id_documento>/texto
+      Headers:
+        X-MNI-CPF: 06293234456
+        X-MNI-SENHA: Simb@280303
+    """
+    try:
+        logger.debug(f"API: Obtendo texto do documento {id_documento} do processo {num_processo}")
+        cpf, senha = get_mni_credentials()
+
+        if not cpf or not senha:
+            return jsonify({
+                'erro': 'Credenciais MNI não fornecidas',
+                'mensagem': 'Forneça os headers X-MNI-CPF e X-MNI-SENHA'
+            }), 401
+
+        hash_esperado = hash_mni_documento(num_processo, id_documento, cpf, senha)
+        local = obter_documento_local(num_processo, id_documento, cpf, senha, hash_esperado)
+        if not local:
+            return jsonify({
+                'erro': 'Documento não encontrado',
+                'mensagem': f'ID {id_documento} não encontrado para o processo {num_processo}'
+            }), 404
+
+        caminho, metadados = local
+        if not suporta_extracao(metadados['mimetype']):
+            return jsonify({
+                'erro': 'Formato não suportado',
+                'mensagem': f"Extração de texto indisponível para documentos {metadados['mimetype']}"
+            }), 415
+
+        etag = metadados['sha256']
+        nao_modificada = resposta_nao_modificada(etag)
+        if nao_modificada:
+            return nao_modificada
+
+        texto = extrator_textos.obter_ou_extrair(
+            caminho, metadados, espera=TEXTO_ESPERA, num_processo=num_processo
+        )
+        if texto is None:
+            resposta = jsonify({
+                'erro': 'Extração em andamento',
+                'mensagem': 'O texto do documento ainda está sendo extraído; tente novamente em instantes'
+            })
+            resposta.status_code = 202
+            resposta.headers['Retry-After'] = '5'
+            return resposta
+
+        return resposta_texto(texto, etag=etag)
+
+    except (ExcecaoPrazoEsgotado, ExcecaoSobrecarga):
+        raise
+    except ExcecaoIntegridadeDocumento as e:
+        logger.error(f"API: {str(e)}")
+        return jsonify({
+            'erro': 'Documento corrompido',
+            'mensagem': str(e)
+        }), 502
+    except Exception as e:
+        logger.error(f"API: Erro ao obter texto do documento: {str(e)}", exc_info=True)
+        return jsonify({
+            'erro': str(e),
+            'mensagem': 'Erro ao obter texto do documento'
+        }), 500
+
+
 @api.route('/processo/<num_processo>/peticao-inicial', methods=['GET'])
 def get_peticao_inicial(num_processo):
     """
@@ -160,6 +345,8 @@ def get_peticao_inicial(num_processo):
 
         return jsonify(dados)
 
+    except (ExcecaoPrazoEsgotado, ExcecaoSobrecarga):
+        raise
     except Exception as e:
         logger.error(f"API: Erro ao consultar petição inicial: {str(e)}", exc_info=True)
         return jsonify({
@@ -168,13 +355,41 @@ def get_peticao_inicial(num_processo):
         }), 500
 
 
+def chave_snapshot_documentos(num_processo, cpf, senha):
+    """Chave da listagem de documentos do processo no cache local, por credencial"""
+    return cache_key(num_processo, f'documentos-ids:{chave_credencial(cpf, senha)}')
+
+
+def obter_snapshot_documentos(num_processo, cpf, senha):
+    """
+    Retorna o snapshot com a lista completa de IDs de documentos do processo,
+    do cache local ou extraída do MNI. Retorna (snapshot, dados_erro).
+    """
+    chave = chave_snapshot_documentos(num_processo, cpf, senha)
+    snapshot = cache_processos.obter(chave)
+    if snapshot:
+        return snapshot, None
+
+    resposta = retorna_processo(num_processo, cpf=cpf, senha=senha)
+    dados = extract_all_document_ids(resposta, num_processo=num_processo, cpf=cpf, senha=senha)
+    if not dados['sucesso']:
+        return None, dados
+
+    tabelas_referencia.enriquecer_documentos(dados['documentos'], codigo_tribunal(num_processo))
+    snapshot = SnapshotProcesso(num_processo, {'documentos': dados['documentos']})
+    cache_processos.guardar(chave, snapshot)
+    return snapshot, None
+
+
 @api.route('/processo/<num_processo>/documentos/ids', methods=['GET'])
 def get_documentos_ids(num_processo):
     """
     Retorna uma lista única com todos os IDs de documentos do processo, incluindo vinculados,
     na ordem em que aparecem no processo.
+    Com `limite` e/ou `cursor`, a lista é paginada a partir do cache local;
+    com `stream=1`, o JSON é enviado em blocos.
     Uso:
-      GET /api/v1/processo/<num_processo>/documentos/ids
+      GET /api/v1/processo/<num_processo>/documentos/ids?limite=100&cursor=<proximoCursor>
       Headers:
         X-MNI-CPF: 06293234456
         X-MNI-SENHA: Simb@280303
@@ -189,10 +404,49 @@ def get_documentos_ids(num_processo):
                 'mensagem': 'Forneça os headers X-MNI-CPF e X-MNI-SENHA'
             }), 401
 
-        resposta = retorna_processo(num_processo, cpf=cpf, senha=senha)
-        dados = extract_all_document_ids(resposta, num_processo=num_processo, cpf=cpf, senha=senha)
-        return jsonify(dados)
-
+        cursor = request.args.get('cursor')
+        try:
+            limite = ler_limite(request.args.get('limite'), padrao=100, maximo=1000)
+        except ValueError as e:
+            return jsonify({
+                'erro': str(e),
+                'mensagem': 'Parâmetros de paginação inválidos'
+            }), 400
+
+        snapshot, dados_erro = obter_snapshot_documentos(num_processo, cpf, senha)
+        if dados_erro:
+            return jsonify(dados_erro)
+
+        etag = calcular_etag(snapshot.digest)
+        nao_modificada = resposta_nao_modificada(etag)
+        if nao_modificada:
+            return nao_modificada
+
+        if not request.args.get('limite') and not cursor:
+            return resposta_json({
+                'sucesso': True,
+                'mensagem': 'Lista de documentos extraída com sucesso',
+                'documentos': snapshot.documentos.itens
+            }, etag=etag)
+
+        try:
+            documentos, proximo_cursor = snapshot.documentos.pagina(cursor=cursor, limite=limite)
+        except ValueError as e:
+            return jsonify({
+                'erro': str(e),
+                'mensagem': 'Parâmetros de paginação inválidos'
+            }), 400
+
+        return resposta_json({
+            'sucesso': True,
+            'mensagem': 'Lista de documentos extraída com sucesso',
+            'documentos': documentos,
+            'total': len(snapshot.documentos),
+            'proximoCursor': proximo_cursor
+        }, etag=etag)
+
+    except (ExcecaoPrazoEsgotado, ExcecaoSobrecarga):
+        raise
     except Exception as e:
         logger.error(f"API: Erro ao consultar lista de IDs de documentos: {str(e)}", exc_info=True)
         return jsonify({
@@ -201,13 +455,37 @@ def get_documentos_ids(num_processo):
         }), 500
 
 
+def obter_snapshot_capa(num_processo, cpf, senha, secoes=None):
+    """
+    Retorna o snapshot da capa do processo (apenas as seções pedidas),
+    do cache local ou extraída do MNI. Retorna (snapshot, dados_erro).
+    """
+    chave_secoes = ','.join(sorted(secoes)) if secoes is not None else '*'
+    chave = cache_key(num_processo, f'capa:{chave_credencial(cpf, senha)}:{chave_secoes}')
+    snapshot = cache_processos.obter(chave)
+    if snapshot:
+        return snapshot, None
+
+    resposta = retorna_processo(num_processo, cpf=cpf, senha=senha, incluir_documentos=False)
+    dados = extract_capa_processo(resposta, secoes=secoes)
+    if not dados.get('sucesso'):
+        return None, dados
+
+    tabelas_referencia.enriquecer_capa(dados['processo'], codigo_tribunal(num_processo))
+    snapshot = SnapshotProcesso(num_processo, dados['processo'], mensagem=dados.get('mensagem', ''))
+    cache_processos.guardar(chave, snapshot)
+    return snapshot, None
+
+
 @api.route('/processo/<num_processo>/capa', methods=['GET'])
 def get_capa_processo(num_processo):
     """
     Retorna apenas os dados da capa do processo (sem documentos),
     incluindo dados básicos, assuntos, polos e movimentações.
+    O parâmetro opcional `fields` limita os campos do processo retornados.
+    Responde 304 quando o If-None-Match corresponde ao ETag da capa em cache.
     Uso:
-      GET /api/v1/processo/<num_processo>/capa
+      GET /api/v1/processo/<num_processo>/capa?fields=numero,polos.partes.nome
       Headers:
         X-MNI-CPF: 06293234456
         X-MNI-SENHA: Simb@280303
@@ -222,13 +500,409 @@ def get_capa_processo(num_processo):
                 'mensagem': 'Forneça os headers X-MNI-CPF e X-MNI-SENHA'
             }), 401
 
-        resposta = retorna_processo(num_processo, cpf=cpf, senha=senha, incluir_documentos=False)
-        dados = extract_capa_processo(resposta)
-        return jsonify(dados)
-
+        try:
+            campos = parse_campos(request.args.get('fields'), CAMPOS_CAPA)
+        except ValueError as e:
+            return jsonify({
+                'erro': 'Parâmetro inválido',
+                'mensagem': str(e)
+            }), 400
+
+        snapshot, dados_erro = obter_snapshot_capa(num_processo, cpf, senha, secoes_raiz(campos))
+        if dados_erro:
+            return jsonify(dados_erro)
+
+        etag = calcular_etag(snapshot.digest)
+        nao_modificada = resposta_nao_modificada(etag)
+        if nao_modificada:
+            return nao_modificada
+
+        return resposta_json({
+            'sucesso': True,
+            'mensagem': snapshot.mensagem,
+            'processo': aplicar_projecao(snapshot.processo, campos)
+        }, etag=etag)
+
+    except (ExcecaoPrazoEsgotado, ExcecaoSobrecarga):
+        raise
     except Exception as e:
         logger.error(f"API: Erro ao consultar capa do processo: {str(e)}", exc_info=True)
         return jsonify({
             'erro': str(e),
             'mensagem': 'Erro ao consultar capa do processo'
         }), 500
+
+
+@api.route('/busca', methods=['GET'])
+@require_api_key
+def get_busca():
+    """
+    Busca textual no índice local (movimentações, descrições de documentos e
+    texto extraído dos documentos dos processos já consultados), sem acessar o MNI.
+    Somente processos consultados com as mesmas credenciais MNI são buscados.
+    Parâmetros: q (obrigatório; `termo*` busca por prefixo), processo, tipo
+    (movimento, documento ou texto) e limite (padrão 20, máximo 100).
+    Uso:
+      GET /api/v1/busca?q=danos morais&tipo=texto
+      Headers:
+        X-API-KEY: <api key>
+        X-MNI-CPF: 06293234456
+        X-MNI-SENHA: Simb@280303
+    """
+    try:
+        cpf, senha = get_mni_credentials()
+        if not cpf or not senha:
+            return jsonify({
+                'erro': 'Credenciais MNI não fornecidas',
+                'mensagem': 'Forneça os headers X-MNI-CPF e X-MNI-SENHA'
+            }), 401
+
+        consulta = montar_consulta(request.args.get('q'))
+        if not consulta:
+            return jsonify({
+                'erro': 'Parâmetro inválido',
+                'mensagem': 'Informe os termos da busca no parâmetro q'
+            }), 400
+
+        tipo = request.args.get('tipo')
+        if tipo and tipo not in ('movimento', 'documento', 'texto'):
+            return jsonify({
+                'erro': 'Parâmetro inválido',
+                'mensagem': 'tipo deve ser movimento, documento ou texto'
+            }), 400
+
+        try:
+            limite = ler_limite(request.args.get('limite'), padrao=20, maximo=100)
+        except ValueError as e:
+            return jsonify({
+                'erro': str(e),
+                'mensagem': 'Parâmetro limite inválido'
+            }), 400
+
+        inicio = time.perf_counter()
+        resultados = indice_busca.buscar(
+            consulta, chave_credencial(cpf, senha), limite, request.args.get('processo'), tipo
+        )
+        return jsonify({
+            'consulta': request.args.get('q'),
+            'total': len(resultados),
+            'tempoMs': round((time.perf_counter() - inicio) * 1000, 2),
+            'resultados': resultados
+        })
+
+    except Exception as e:
+        logger.error(f"API: Erro na busca: {str(e)}", exc_info=True)
+        return jsonify({
+            'erro': str(e),
+            'mensagem': 'Erro ao realizar a busca'
+        }), 500
+
+
+def obter_job_do_usuario(job_id):
+    """Job pelo ID, se pertencer ao usuário dono da API key da requisição"""
+    try:
+        job_uuid = uuid.UUID(job_id)
+    except ValueError:
+        return None
+    job = Job.query.get(job_uuid)
+    if job is None or job.user_id != g.api_key.user_id:
+        return None
+    return job
+
+
+@api.route('/jobs', methods=['POST'])
+@require_api_key
+def post_job():
+    """
+    Enfileira uma operação longa para execução em segundo plano.
+    Tipos: download (processos), copia_integral (processo, nao_pdf) e
+    lote (processos, fields).
+    Uso:
+      POST /api/v1/jobs
+      Body: {"tipo": "download", "parametros": {"processos": ["1234567-89.2024.8.17.0001"]}}
+      Headers:
+        X-API-KEY: <api_key>
+        X-MNI-CPF: 06293234456
+        X-MNI-SENHA: Simb@280303
+    Retorna 202 com o job; a situação é consultada em GET /api/v1/jobs/<id>.
+    """
+    try:
+        cpf, senha = get_mni_credentials()
+
+        if not cpf or not senha:
+            return jsonify({
+                'erro': 'Credenciais MNI não fornecidas',
+                'mensagem': 'Forneça os headers X-MNI-CPF e X-MNI-SENHA'
+            }), 401
+
+        corpo = request.get_json(silent=True) or {}
+        tipo = corpo.get('tipo')
+        parametros = corpo.get('parametros') or {}
+        try:
+            validar_job(tipo, parametros)
+        except ValueError as e:
+            return jsonify({
+                'erro': 'Parâmetro inválido',
+                'mensagem': str(e)
+            }), 400
+
+        job = fila_jobs.criar(g.api_key, tipo, parametros, cpf, senha)
+        logger.debug(f"API: Job {job.id} ({tipo}) enfileirado")
+        return jsonify(job.to_dict()), 202
+
+    except Exception as e:
+        logger.error(f"API: Erro ao criar job: {str(e)}", exc_info=True)
+        return jsonify({
+            'erro': str(e),
+            'mensagem': 'Erro ao criar job'
+        }), 500
+
+
+@api.route('/jobs/<job_id>', methods=['GET'])
+@require_api_key
+def get_job(job_id):
+    """Situação, progresso e resultado de um job do usuário"""
+    job = obter_job_do_usuario(job_id)
+    if not job:
+        return jsonify({
+            'erro': 'Job não encontrado',
+            'mensagem': f'Nenhum job com ID {job_id}'
+        }), 404
+    return jsonify(job.to_dict())
+
+
+@api.route('/jobs/<job_id>/cancelar', methods=['POST'])
+@require_api_key
+def cancelar_job(job_id):
+    """
+    Cancela um job do usuário. Jobs pendentes são cancelados imediatamente;
+    jobs em execução são interrompidos no próximo ponto de verificação.
+    """
+    job = obter_job_do_usuario(job_id)
+    if not job:
+        return jsonify({
+            'erro': 'Job não encontrado',
+            'mensagem': f'Nenhum job com ID {job_id}'
+        }), 404
+    if job.status in STATUS_FINAIS:
+        return jsonify({
+            'erro': 'Job finalizado',
+            'mensagem': f'O job já está {job.status}'
+        }), 409
+    return jsonify(fila_jobs.cancelar(job).to_dict()), 202
+
+
+@api.route('/jobs/<job_id>/artefato', methods=['GET'])
+@require_api_key
+@sem_compressao
+def get_artefato_job(job_id):
+    """Baixa o arquivo gerado por um job concluído (PDF da cópia integral, NDJSON do lote)"""
+    job = obter_job_do_usuario(job_id)
+    if not job or not job.artefato or not os.path.exists(job.artefato):
+        return jsonify({
+            'erro': 'Artefato não encontrado',
+            'mensagem': f'O job {job_id} não possui arquivo disponível'
+        }), 404
+    return send_file(
+        job.artefato,
+        as_attachment=True,
+        download_name=f'{job.tipo}_{job.id}{os.path.splitext(job.artefato)[1]}',
+        conditional=True
+    )
+
+
+@api.route('/monitoramentos', methods=['POST'])
+@require_api_key
+def post_monitoramento():
+    """
+    Passa a monitorar um processo: a cada intervalo, novos movimentos,
+    documentos e mudanças nas partes são registrados como eventos.
+    Uso:
+      POST /api/v1/monitoramentos
+      Body: {"processo": "1234567-89.2024.8.17.0001", "intervaloMinutos": 60}
+      Headers:
+        X-API-KEY: <api_key>
+        X-MNI-CPF: 06293234456
+        X-MNI-SENHA: Simb@280303
+    """
+    try:
+        cpf, senha = get_mni_credentials()
+
+        if not cpf or not senha:
+            return jsonify({
+                'erro': 'Credenciais MNI não fornecidas',
+                'mensagem': 'Forneça os headers X-MNI-CPF e X-MNI-SENHA'
+            }), 401
+
+        corpo = request.get_json(silent=True) or {}
+        numero_processo = str(corpo.get('processo') or '').strip()
+        valido, mensagem = validate_processo_number(numero_processo)
+        if not valido:
+            return jsonify({
+                'erro': 'Parâmetro inválido',
+                'mensagem': mensagem
+            }), 400
+
+        try:
+            intervalo = int(corpo.get('intervaloMinutos') or MONITORAMENTO_INTERVALO_PADRAO)
+        except (TypeError, ValueError):
+            intervalo = 0
+        if intervalo < MONITORAMENTO_INTERVALO_MINIMO:
+            return jsonify({
+                'erro': 'Parâmetro inválido',
+                'mensagem': f'intervaloMinutos deve ser um inteiro maior ou igual a {MONITORAMENTO_INTERVALO_MINIMO}'
+            }), 400
+
+        monitorado, criado = monitor_processos.registrar(g.api_key, numero_processo, cpf, senha, intervalo)
+        logger.debug(f"API: Processo {numero_processo} monitorado (id {monitorado.id})")
+        return jsonify(monitorado.to_dict()), 201 if criado else 200
+
+    except Exception as e:
+        logger.error(f"API: Erro ao cadastrar monitoramento: {str(e)}", exc_info=True)
+        return jsonify({
+            'erro': str(e),
+            'mensagem': 'Erro ao cadastrar monitoramento'
+        }), 500
+
+
+@api.route('/monitoramentos', methods=['GET'])
+@require_api_key
+def get_monitoramentos():
+    """Processos monitorados pelo usuário"""
+    monitorados = ProcessoMonitorado.query.filter_by(user_id=g.api_key.user_id).order_by(ProcessoMonitorado.id).all()
+    return jsonify({'monitoramentos': [monitorado.to_dict() for monitorado in monitorados]})
+
+
+@api.route('/monitoramentos/<int:monitorado_id>', methods=['DELETE'])
+@require_api_key
+def delete_monitoramento(monitorado_id):
+    """Deixa de monitorar o processo (os eventos registrados são apagados)"""
+    monitorado = ProcessoMonitorado.query.get(monitorado_id)
+    if monitorado is None or monitorado.user_id != g.api_key.user_id:
+        return jsonify({
+            'erro': 'Monitoramento não encontrado',
+            'mensagem': f'Nenhum monitoramento com ID {monitorado_id}'
+        }), 404
+    monitor_processos.remover(monitorado)
+    return jsonify({'mensagem': f'Processo {monitorado.numero_processo} não é mais monitorado'})
+
+
+@api.route('/monitoramentos/eventos', methods=['GET'])
+@require_api_key
+def get_eventos_monitoramento():
+    """
+    Mudanças detectadas nos processos monitorados do usuário, em ordem de ID.
+    Parâmetros:
+      desde: retorna apenas eventos com ID maior (o `ultimoId` da resposta anterior)
+      processo: restringe a um processo
+      limite: máximo de eventos (padrão 100, máximo 1000)
+    """
+    try:
+        desde = int(request.args.get('desde', 0))
+        limite = ler_limite(request.args.get('limite'), padrao=100, maximo=1000)
+    except ValueError:
+        return jsonify({
+            'erro': 'Parâmetro inválido',
+            'mensagem': 'desde e limite devem ser inteiros'
+        }), 400
+
+    consulta = EventoMudanca.query.filter(
+        EventoMudanca.user_id == g.api_key.user_id, EventoMudanca.id > desde
+    )
+    if request.args.get('processo'):
+        consulta = consulta.filter(EventoMudanca.numero_processo == request.args['processo'])
+    eventos = consulta.order_by(EventoMudanca.id).limit(limite).all()
+    return jsonify({
+        'eventos': [evento.to_dict() for evento in eventos],
+        'ultimoId': eventos[-1].id if eventos else desde,
+    })
+
+
+# Eventos lidos do banco por consulta no stream
+_LOTE_EVENTOS_STREAM = 200
+
+
+def gerar_eventos_sse(user_id, processos, desde):
+    """
+    Gera as mensagens SSE com os eventos do usuário posteriores a `desde`
+    (restritos a `processos`, se informado). Novos eventos desta instância
+    são enviados assim que registrados; os das demais instâncias, na próxima
+    consulta ao banco (no máximo a cada EVENTOS_STREAM_ESPERA segundos).
+    """
+    inicio = time.monotonic()
+    ultimo = desde
+    versao = monitor_processos.versao_eventos
+    yield f'retry: {int(EVENTOS_STREAM_ESPERA * 1000)}\n\n'.encode('utf-8')
+
+    while time.monotonic() - inicio < EVENTOS_STREAM_DURACAO:
+        consulta = EventoMudanca.query.filter(EventoMudanca.user_id == user_id, EventoMudanca.id > ultimo)
+        if processos:
+            consulta = consulta.filter(EventoMudanca.numero_processo.in_(processos))
+        eventos = [evento.to_dict() for evento in consulta.order_by(EventoMudanca.id).limit(_LOTE_EVENTOS_STREAM)]
+        # Libera a conexão com o banco enquanto o stream aguarda
+        db.session.close()
+
+        for evento in eventos:
+            yield mensagem_sse(evento, evento['tipo'], evento['id'])
+            ultimo = evento['id']
+        if len(eventos) == _LOTE_EVENTOS_STREAM:
+            continue
+
+        nova_versao = monitor_processos.aguardar_eventos(versao, EVENTOS_STREAM_ESPERA)
+        if nova_versao == versao:
+            # Comentário SSE: mantém a conexão aberta em proxies
+            yield b': keep-alive\n\n'
+        versao = nova_versao
+
+
+# Escopo do token de stream aceito no parâmetro `token` (ver middleware.emitir_token_stream)
+_ESCOPO_STREAM_EVENTOS = 'monitoramentos/eventos/stream'
+
+
+@api.route('/monitoramentos/eventos/token', methods=['POST'])
+@require_api_key
+def post_token_eventos_monitoramento():
+    """
+    Emite um token de curta duração que autentica apenas o stream de eventos,
+    para uso no EventSource do navegador (que não envia o header X-API-KEY).
+    Uso:
+      POST /api/v1/monitoramentos/eventos/token
+      new EventSource('/api/v1/monitoramentos/eventos/stream?token=<token>')
+    """
+    return jsonify({
+        'token': emitir_token_stream(g.api_key, _ESCOPO_STREAM_EVENTOS),
+        'expiraEm': TOKEN_STREAM_VALIDADE
+    })
+
+
+@api.route('/monitoramentos/eventos/stream', methods=['GET'])
+@require_api_key_ou_token(_ESCOPO_STREAM_EVENTOS)
+@sem_compressao
+def stream_eventos_monitoramento():
+    """
+    Stream Server-Sent Events com as mudanças dos processos monitorados.
+    Autenticação pelo header X-API-KEY ou, no navegador, pelo parâmetro
+    `token` emitido em POST /monitoramentos/eventos/token.
+    Parâmetros:
+      processos: números separados por vírgula (padrão: todos os monitorados)
+      desde: ID do último evento recebido (o header Last-Event-ID tem precedência)
+    A conexão é encerrada após EVENTOS_STREAM_DURACAO segundos; o EventSource
+    do navegador reconecta sozinho enviando Last-Event-ID.
+    """
+    try:
+        desde = int(request.headers.get('Last-Event-ID') or request.args.get('desde') or 0)
+    except ValueError:
+        return jsonify({
+            'erro': 'Parâmetro inválido',
+            'mensagem': 'Last-Event-ID e desde devem ser inteiros'
+        }), 400
+
+    processos = [numero.strip() for numero in request.args.get('processos', '').split(',') if numero.strip()]
+    resposta = Response(
+        stream_with_context(gerar_eventos_sse(g.api_key.user_id, processos, desde)),
+        mimetype='text/event-stream'
+    )
+    resposta.headers['Cache-Control'] = 'no-cache'
+    # Desativa o buffer de proxies reversos (nginx)
+    resposta.headers['X-Accel-Buffering'] = 'no'
+    return resposta
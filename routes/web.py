@@ -1,10 +1,10 @@
 from flask import Blueprint, render_template, request, send_file, flash
-import tempfile
 import os
 import logging
 from funcoes_mni import retorna_processo, retorna_documento_processo, retorna_peticao_inicial_e_anexos
 from utils import extract_mni_data, extract_capa_processo, extract_all_document_ids
-import core
+from documentos import obter_documento_local
+from middleware import sem_compressao
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -201,27 +201,23 @@ def debug_peticao_inicial():
         return render_template('debug.html')
 
 @web.route('/download_documento/<num_processo>/<num_documento>')
+@sem_compressao
 def download_documento(num_processo, num_documento):
     try:
         logger.debug(f"Attempting to download document {num_documento} from process {num_processo}")
-        resposta = retorna_documento_processo(num_processo, num_documento)
-
-        if 'msg_erro' in resposta:
-            flash(resposta['msg_erro'], 'error')
+        local = obter_documento_local(num_processo, num_documento)
+        if not local:
+            flash(f'Documento {num_documento} não encontrado', 'error')
             return render_template('index.html')
 
-        extensao = core.mime_to_extension.get(resposta['mimetype'], '.bin')
-        temp_dir = tempfile.mkdtemp()
-        file_path = os.path.join(temp_dir, f'{num_documento}{extensao}')
-
-        with open(file_path, 'wb') as f:
-            f.write(resposta['conteudo'])
-
+        caminho, metadados = local
         return send_file(
-            file_path,
-            mimetype=resposta['mimetype'],
+            caminho,
+            mimetype=metadados['mimetype'],
             as_attachment=True,
-            download_name=f'documento_{num_documento}{extensao}'
+            download_name=f"documento_{num_documento}{metadados['extensao']}",
+            conditional=True,
+            etag=metadados['sha256']
         )
 
     except Exception as e:
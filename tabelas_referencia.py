@@ -0,0 +1,240 @@
+"""
+Tabelas de referência do PJe (tipos de documento e classes judiciais)
+carregadas uma vez por tribunal/localidade e indexadas por código.
+
+- Carga: consultarTodosTiposDocumentoProcessual (por tribunal) e
+  consultarClassesJudiciais (por tribunal e localidade) no serviço ConsultaPJe
+  do tribunal (roteador_mni).
+  Cada tabela vira um dicionário código -> descrição, com busca O(1).
+- Validade: TABELAS_TTL segundos. Uma tabela vencida continua sendo usada
+  enquanto é recarregada em segundo plano. Nenhuma consulta ao tribunal
+  bloqueia a requisição: enquanto a primeira carga de uma tabela não termina,
+  os processos são devolvidos sem os nomes.
+- Persistência: cada tabela carregada é gravada em TABELAS_DIR (JSON) e lida
+  de lá após um reinício, sem nova consulta ao tribunal enquanto válida.
+- Falhas: uma tabela que não pôde ser carregada fica vazia e só é tentada de
+  novo após _ESPERA_FALHA segundos, para não repetir a chamada SOAP a cada
+  processo consultado.
+
+O enriquecimento (enriquecer_processo, enriquecer_capa e
+enriquecer_documentos) preenche os nomes de classe processual e de tipo de
+documento a partir dos códigos informados pelo MNI.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from config import TABELAS_DIR, TABELAS_TTL
+from funcoes_mni import roteador_mni
+from utils import campo_mni, lista_mni
+
+logger = logging.getLogger(__name__)
+
+# Segundos até uma nova tentativa de carga de tabela que falhou
+_ESPERA_FALHA = 300
+
+
+def normalizar_codigo(codigo):
+    """Código como texto, sem zeros à esquerda nos códigos numéricos"""
+    codigo = str(codigo if codigo is not None else '').strip()
+    return str(int(codigo)) if codigo.isdigit() else codigo
+
+
+def _indexar(resposta):
+    """Índice código -> descrição de uma lista de itens {codigo, descricao}"""
+    indice = {}
+    for item in lista_mni(resposta):
+        codigo = normalizar_codigo(campo_mni(item, 'codigo'))
+        if codigo:
+            indice[codigo] = str(campo_mni(item, 'descricao', ''))
+    return indice
+
+
+class _Tabela:
+    """Uma tabela indexada e o momento (epoch) da carga"""
+
+    def __init__(self, indice=None, carregada_em=0.0):
+        self.indice = indice or {}
+        self.carregada_em = carregada_em
+        self.tentativa_em = 0.0
+        self.atualizando = False
+
+
+class TabelasReferencia:
+    """Cache das tabelas de referência por tribunal/localidade"""
+
+    def __init__(self, diretorio=TABELAS_DIR, ttl=TABELAS_TTL):
+        self.diretorio = diretorio
+        self.ttl = ttl
+        self._tabelas = {}
+        self._lock = threading.Lock()
+        self._locks_carga = {}
+
+    # ------------------------------------------------------------------
+    # Consulta às tabelas
+    # ------------------------------------------------------------------
+
+    def tipos_documento(self, tribunal=None):
+        """Índice código -> descrição dos tipos de documento do tribunal"""
+        return self._obter(
+            ('tipos_documento', tribunal or ''),
+            lambda cliente: cliente.service.consultarTodosTiposDocumentoProcessual()
+        )
+
+    def classes_judiciais(self, localidade, tribunal=None):
+        """Índice código -> descrição das classes judiciais da localidade (jurisdição)"""
+        return self._obter(
+            ('classes', tribunal or '', normalizar_codigo(localidade)),
+            lambda cliente: cliente.service.consultarClassesJudiciais(
+                arg0={'descricao': '?', 'id': str(localidade)}
+            )
+        )
+
+    def nome_tipo_documento(self, codigo, tribunal=None):
+        return self.tipos_documento(tribunal).get(normalizar_codigo(codigo))
+
+    def nome_classe(self, codigo, localidade, tribunal=None):
+        return self.classes_judiciais(localidade, tribunal).get(normalizar_codigo(codigo))
+
+    def enriquecer_processo(self, processo, tribunal=None):
+        """
+        Preenche, no processo parseado, classeProcessualNome e o
+        tipoDocumentoNome de cada documento (e vinculados) a partir dos
+        códigos. Nomes já preenchidos com texto são mantidos.
+        """
+        dados = processo.get('dadosBasicos') or {}
+        self._nomear_classe(dados, dados.get('classeProcessualCodigo'), tribunal)
+        self.enriquecer_documentos(processo.get('documentos') or [], tribunal)
+        return processo
+
+    def enriquecer_capa(self, capa, tribunal=None):
+        """Preenche classeProcessualNome na capa de extract_capa_processo"""
+        self._nomear_classe(capa, capa.get('classeProcessual'), tribunal)
+        return capa
+
+    def enriquecer_documentos(self, documentos, tribunal=None):
+        """Preenche o tipoDocumentoNome de cada documento (e vinculados) da lista"""
+        if not documentos:
+            return documentos
+        tipos = self.tipos_documento(tribunal)
+        for doc in documentos:
+            for item in [doc] + list(doc.get('documentosVinculados') or []):
+                self._nomear_tipo_documento(item, tipos)
+        return documentos
+
+    def _nomear_classe(self, dados, codigo, tribunal):
+        codigo = normalizar_codigo(codigo)
+        localidade = dados.get('codigoLocalidade')
+        if codigo and localidade and not dados.get('classeProcessualNome'):
+            nome = self.classes_judiciais(localidade, tribunal).get(codigo)
+            if nome:
+                dados['classeProcessualNome'] = nome
+
+    @staticmethod
+    def _nomear_tipo_documento(item, tipos):
+        # O código do tipo vem em `tipoDocumento` (extract_all_document_ids)
+        # ou, no processo parseado, em tipoDocumentoNome
+        codigo = normalizar_codigo(
+            item.get('tipoDocumentoCodigo') or item.get('tipoDocumentoNome') or item.get('tipoDocumento')
+        )
+        if not codigo.isdigit():
+            return
+        item['tipoDocumentoCodigo'] = codigo
+        nome = tipos.get(codigo)
+        if nome:
+            item['tipoDocumentoNome'] = nome
+
+    # ------------------------------------------------------------------
+    # Carga, validade e persistência
+    # ------------------------------------------------------------------
+
+    def _obter(self, chave, consultar):
+        tabela = self._tabelas.get(chave)
+        if tabela is None:
+            tabela = self._carregar_inicial(chave, consultar)
+        elif time.time() - tabela.carregada_em > self.ttl:
+            self._recarregar_em_segundo_plano(chave, tabela, consultar)
+        return tabela.indice
+
+    def _lock_carga(self, chave):
+        with self._lock:
+            return self._locks_carga.setdefault(chave, threading.Lock())
+
+    def _carregar_inicial(self, chave, consultar):
+        """
+        Primeira carga da tabela: do disco, se houver. A consulta ao tribunal
+        (tabela ausente ou vencida) é feita em segundo plano, e até lá a
+        tabela fica vazia ou com o conteúdo do disco.
+        """
+        with self._lock_carga(chave):
+            tabela = self._tabelas.get(chave)
+            if tabela is not None:
+                return tabela
+            tabela = self._ler_disco(chave) or _Tabela()
+            self._tabelas[chave] = tabela
+            if time.time() - tabela.carregada_em > self.ttl:
+                self._recarregar_em_segundo_plano(chave, tabela, consultar)
+            return tabela
+
+    def _recarregar_em_segundo_plano(self, chave, tabela, consultar):
+        with self._lock:
+            if tabela.atualizando or time.time() - tabela.tentativa_em < _ESPERA_FALHA:
+                return
+            tabela.atualizando = True
+
+        def recarregar():
+            try:
+                self._atualizar(chave, tabela, consultar)
+            finally:
+                tabela.atualizando = False
+
+        threading.Thread(target=recarregar, name='tabelas-referencia', daemon=True).start()
+
+    def _atualizar(self, chave, tabela, consultar):
+        """Consulta o tribunal e substitui o índice da tabela (mantido em caso de erro)"""
+        tabela.tentativa_em = time.time()
+        try:
+            with roteador_mni.endpoint(chave[1] or None).chamada(consulta=True) as cliente:
+                indice = _indexar(consultar(cliente))
+        except Exception as e:
+            logger.warning(f"Falha ao carregar a tabela de referência {chave}: {str(e)}")
+            return
+        if not indice:
+            logger.warning(f"Tabela de referência {chave} vazia")
+            return
+        tabela.indice = indice
+        tabela.carregada_em = time.time()
+        self._gravar_disco(chave, tabela)
+        logger.info(f"Tabela de referência {chave} carregada com {len(indice)} itens")
+
+    def _caminho(self, chave):
+        nome = '-'.join(parte.replace('.', '_') or 'padrao' for parte in chave)
+        return os.path.join(self.diretorio, f'{nome}.json')
+
+    def _ler_disco(self, chave):
+        try:
+            with open(self._caminho(chave), encoding='utf-8') as f:
+                dados = json.load(f)
+            return _Tabela(dados['itens'], float(dados['carregadaEm']))
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Tabela de referência {chave} em disco ignorada: {str(e)}")
+            return None
+
+    def _gravar_disco(self, chave, tabela):
+        try:
+            os.makedirs(self.diretorio, exist_ok=True)
+            fd, caminho_tmp = tempfile.mkstemp(dir=self.diretorio, prefix='.parcial-')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'carregadaEm': tabela.carregada_em, 'itens': tabela.indice}, f, ensure_ascii=False)
+            os.replace(caminho_tmp, self._caminho(chave))
+        except OSError as e:
+            logger.warning(f"Não foi possível gravar a tabela de referência {chave}: {str(e)}")
+
+
+# Instância global das tabelas de referência
+tabelas_referencia = TabelasReferencia()
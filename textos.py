@@ -0,0 +1,181 @@
+"""
+Extração de texto simples dos documentos HTML e texto do armazém local.
+
+A extração (trafilatura sobre o HTML das petições) consome CPU e roda em um
+pool de processos, fora dos workers que atendem requisições. O texto extraído
+fica em cache em disco, identificado pelo SHA-256 do documento: o mesmo
+conteúdo nunca é extraído duas vezes, mesmo que apareça em outro processo.
+
+Fluxo:
+  - o download em massa agenda a extração de cada documento gravado
+  - o texto extraído é enviado ao índice de busca (busca.py)
+  - a rota /processo/<n>/documento/<id>/texto serve o texto do cache; se
+    ainda não existir, agenda a extração e aguarda até TEXTO_ESPERA segundos
+"""
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as TempoEsgotado
+from concurrent.futures.process import BrokenProcessPool
+
+from busca import indice_busca
+from config import DOCUMENTOS_DIR, EXTRACAO_WORKERS
+
+try:
+    import trafilatura
+except ImportError:  # pragma: no cover - sem trafilatura, usa o texto bruto do lxml
+    trafilatura = None
+
+logger = logging.getLogger(__name__)
+
+TEXTOS_DIR = os.path.join(DOCUMENTOS_DIR, '_textos')
+
+MIMETYPES_HTML = ('text/html', 'application/xhtml+xml')
+MIMETYPES_TEXTO = ('text/plain',)
+
+
+def suporta_extracao(mimetype):
+    """Indica se há extração de texto para o mimetype"""
+    return mimetype in MIMETYPES_HTML or mimetype in MIMETYPES_TEXTO
+
+
+def _decodificar(conteudo):
+    try:
+        return conteudo.decode('utf-8')
+    except UnicodeDecodeError:
+        return conteudo.decode('latin-1')
+
+
+def _texto_html(conteudo):
+    """Texto principal do HTML; se a trafilatura não extrair nada, todo o texto visível"""
+    if trafilatura is not None:
+        texto = trafilatura.extract(conteudo, include_comments=False, include_tables=True, favor_recall=True)
+        if texto:
+            return texto
+    from lxml import html
+    documento = html.fromstring(conteudo)
+    for elemento in documento.xpath('//script|//style'):
+        elemento.drop_tree()
+    linhas = (linha.strip() for linha in documento.text_content().splitlines())
+    return '\n'.join(linha for linha in linhas if linha)
+
+
+def _extrair_para_cache(caminho, mimetype, destino):
+    """
+    Executado no pool de processos: extrai o texto do documento em `caminho`
+    e grava atomicamente em `destino`. Retorna o tamanho do texto em caracteres.
+    """
+    with open(caminho, 'rb') as f:
+        conteudo = f.read()
+    texto = _texto_html(conteudo) if mimetype in MIMETYPES_HTML else _decodificar(conteudo)
+
+    pasta = os.path.dirname(destino)
+    os.makedirs(pasta, exist_ok=True)
+    fd, caminho_tmp = tempfile.mkstemp(dir=pasta, prefix='.parcial-')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(texto)
+        os.replace(caminho_tmp, destino)
+    except BaseException:
+        os.unlink(caminho_tmp)
+        raise
+    return len(texto)
+
+
+class ExtratorTextos:
+    """Cache de textos extraídos, alimentado por um pool de processos"""
+
+    def __init__(self, diretorio=TEXTOS_DIR, workers=EXTRACAO_WORKERS):
+        self.diretorio = diretorio
+        self.workers = workers
+        self._executor = None
+        self._pendentes = {}
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        if self._executor is None:
+            # forkserver: os processos não herdam locks das threads do servidor
+            metodos = multiprocessing.get_all_start_methods()
+            contexto = multiprocessing.get_context('forkserver' if 'forkserver' in metodos else None)
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=contexto)
+        return self._executor
+
+    def caminho_texto(self, sha256):
+        return os.path.join(self.diretorio, f'{sha256}.txt')
+
+    def obter(self, metadados):
+        """Texto do documento já extraído, ou None"""
+        caminho = self.caminho_texto(metadados['sha256'])
+        try:
+            with open(caminho, encoding='utf-8') as f:
+                texto = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            # Marca o uso do texto para a limpeza do armazém (documentos.CACHES_DERIVADOS)
+            os.utime(caminho)
+        except OSError:
+            pass
+        return texto
+
+    def agendar(self, caminho, metadados, num_processo=None):
+        """
+        Agenda a extração do documento em segundo plano, se suportada e ainda
+        não feita. Com `num_processo`, o texto é indexado para busca ao final.
+        Retorna o Future da extração, ou None se não há o que fazer.
+        """
+        if not suporta_extracao(metadados.get('mimetype')):
+            return None
+        sha256 = metadados['sha256']
+        destino = self.caminho_texto(sha256)
+        with self._lock:
+            futuro = self._pendentes.get(sha256)
+            if futuro is not None:
+                return futuro
+            if os.path.exists(destino):
+                return None
+            try:
+                futuro = self._pool().submit(_extrair_para_cache, caminho, metadados['mimetype'], destino)
+            except BrokenProcessPool:
+                # Um processo do pool morreu (ex.: falta de memória): recria o pool
+                logger.warning("Pool de extração de textos reiniciado")
+                self._executor = None
+                futuro = self._pool().submit(_extrair_para_cache, caminho, metadados['mimetype'], destino)
+            self._pendentes[sha256] = futuro
+        futuro.add_done_callback(lambda f: self._concluir(f, metadados, num_processo))
+        return futuro
+
+    def _concluir(self, futuro, metadados, num_processo):
+        with self._lock:
+            self._pendentes.pop(metadados['sha256'], None)
+        if futuro.cancelled():
+            return
+        if futuro.exception():
+            logger.error(f"Erro ao extrair texto do documento {metadados['sha256']}: {futuro.exception()}")
+        elif num_processo:
+            texto = self.obter(metadados)
+            if texto:
+                indice_busca.agendar_texto(num_processo, metadados['idDocumento'], texto)
+
+    def obter_ou_extrair(self, caminho, metadados, espera=None, num_processo=None):
+        """
+        Texto do documento, extraindo-o se necessário e aguardando até
+        `espera` segundos. Retorna None se a extração não terminar no prazo;
+        erros da extração são propagados.
+        """
+        texto = self.obter(metadados)
+        if texto is not None:
+            return texto
+        futuro = self.agendar(caminho, metadados, num_processo)
+        if futuro is not None:
+            try:
+                futuro.result(timeout=espera)
+            except TempoEsgotado:
+                return None
+        return self.obter(metadados)
+
+
+# Instância global do extrator de textos
+extrator_textos = ExtratorTextos()
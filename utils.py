@@ -4,6 +4,22 @@ from functools import wraps
 # Configure logging
 logger = logging.getLogger(__name__)
 
+def campo_mni(objeto, nome, padrao=None):
+    """Lê um campo da resposta MNI, seja objeto zeep ou dicionário (serialize_object)"""
+    if objeto is None:
+        return padrao
+    if isinstance(objeto, dict):
+        valor = objeto.get(nome, padrao)
+    else:
+        valor = getattr(objeto, nome, padrao)
+    return padrao if valor is None else valor
+
+def lista_mni(valor):
+    """Normaliza um campo repetível da resposta MNI (ausente, único ou lista) para lista"""
+    if valor is None:
+        return []
+    return valor if isinstance(valor, list) else [valor]
+
 def extract_mni_data(resposta):
     """Extrai dados relevantes da resposta MNI de forma segura"""
     try:
@@ -130,6 +146,7 @@ def extract_all_document_ids(resposta, num_processo=None, cpf=None, senha=None):
                     'tipoDocumento': getattr(doc, 'tipoDocumento', ''),
                     'descricao': getattr(doc, 'descricao', ''),
                     'mimetype': getattr(doc, 'mimetype', ''),
+                    'hash': getattr(doc, 'hash', ''),
                 }
                 
                 # Adicionar documento à lista
@@ -190,6 +207,7 @@ def extract_all_document_ids(resposta, num_processo=None, cpf=None, senha=None):
                             'tipoDocumento': '',  # Não temos os metadados para este documento
                             'descricao': f'Documento {id_doc}',
                             'mimetype': '',
+                            'hash': '',
                         })
                 
                 # Substitui a lista de documentos pela final, preservando a ordem do XML
@@ -221,8 +239,15 @@ def extract_all_document_ids(resposta, num_processo=None, cpf=None, senha=None):
             'documentos': []
         }
 
-def extract_capa_processo(resposta):
-    """Extrai apenas os dados da capa do processo, sem incluir os documentos"""
+def extract_capa_processo(resposta, secoes=None):
+    """
+    Extrai apenas os dados da capa do processo, sem incluir os documentos.
+    Se `secoes` for informado (conjunto de campos do processo), as seções
+    pesadas (assuntos, polos, movimentacoes) fora dele não são montadas.
+    """
+    def incluir(secao):
+        return secoes is None or secao in secoes
+
     try:
         logger.debug(f"Iniciando extração da capa do processo. Tipo de resposta: {type(resposta)}")
         logger.debug(f"Atributos disponíveis na resposta: {dir(resposta)}")
@@ -252,6 +277,7 @@ def extract_capa_processo(resposta):
                 
                 dados_processo['numero'] = getattr(dados_basicos, 'numero', '')
                 dados_processo['classeProcessual'] = getattr(dados_basicos, 'classeProcessual', '')
+                dados_processo['codigoLocalidade'] = getattr(dados_basicos, 'codigoLocalidade', '')
                 dados_processo['dataAjuizamento'] = getattr(dados_basicos, 'dataAjuizamento', '')
                 dados_processo['valorCausa'] = getattr(dados_basicos, 'valorCausa', '')
                 dados_processo['nivelSigilo'] = getattr(dados_basicos, 'nivelSigilo', 0)
@@ -265,7 +291,7 @@ def extract_capa_processo(resposta):
                     dados_processo['jurisdicao'] = getattr(orgao, 'codigoOrgao', '')
                 
                 # Verificar assuntos em dadosBasicos
-                if hasattr(dados_basicos, 'assunto'):
+                if hasattr(dados_basicos, 'assunto') and incluir('assuntos'):
                     assuntos = dados_basicos.assunto if isinstance(dados_basicos.assunto, list) else [dados_basicos.assunto]
                     for assunto in assuntos:
                         dados_processo['assuntos'].append({
@@ -275,7 +301,7 @@ def extract_capa_processo(resposta):
                         })
                         
                 # Verificar polos em dadosBasicos
-                if hasattr(dados_basicos, 'polo'):
+                if hasattr(dados_basicos, 'polo') and incluir('polos'):
                     logger.debug("Processando polos do processo em dadosBasicos")
                     polos = dados_basicos.polo if isinstance(dados_basicos.polo, list) else [dados_basicos.polo]
                     
@@ -327,7 +353,7 @@ def extract_capa_processo(resposta):
                         dados_processo['polos'].append(polo_info)
                         
                 # Verificar movimentações em dadosBasicos
-                if hasattr(dados_basicos, 'movimento'):
+                if hasattr(dados_basicos, 'movimento') and incluir('movimentacoes'):
                     logger.debug("Processando movimentações do processo em dadosBasicos")
                     movs = dados_basicos.movimento if isinstance(dados_basicos.movimento, list) else [dados_basicos.movimento]
                     
@@ -367,6 +393,7 @@ def extract_capa_processo(resposta):
                 logger.debug("Buscando dados básicos na raiz do objeto processo")
                 dados_processo['numero'] = getattr(processo, 'numero', '')
                 dados_processo['classeProcessual'] = getattr(processo, 'classeProcessual', '')
+                dados_processo['codigoLocalidade'] = getattr(processo, 'codigoLocalidade', '')
                 dados_processo['dataAjuizamento'] = getattr(processo, 'dataAjuizamento', '')
                 dados_processo['valorCausa'] = getattr(processo, 'valorCausa', '')
                 dados_processo['nivelSigilo'] = getattr(processo, 'nivelSigilo', 0)
@@ -383,7 +410,7 @@ def extract_capa_processo(resposta):
                 logger.debug("Processo não possui atributo orgaoJulgador")
                 
             # Extrair assuntos do processo
-            if hasattr(processo, 'assunto'):
+            if hasattr(processo, 'assunto') and incluir('assuntos'):
                 logger.debug("Processando assuntos do processo")
                 assuntos = processo.assunto if isinstance(processo.assunto, list) else [processo.assunto]
                 for assunto in assuntos:
@@ -394,10 +421,10 @@ def extract_capa_processo(resposta):
                         'principal': getattr(assunto, 'principal', False)
                     })
             else:
-                logger.debug("Processo não possui atributo assunto")
+                logger.debug("Processo sem assuntos ou seção não solicitada")
                 
             # Extrair polos do processo
-            if hasattr(processo, 'polo'):
+            if hasattr(processo, 'polo') and incluir('polos'):
                 logger.debug("Processando polos do processo")
                 polos = processo.polo if isinstance(processo.polo, list) else [processo.polo]
                 
@@ -448,10 +475,10 @@ def extract_capa_processo(resposta):
                     
                     dados_processo['polos'].append(polo_info)
             else:
-                logger.debug("Processo não possui atributo polo")
+                logger.debug("Processo sem polos ou seção não solicitada")
                 
             # Extrair movimentações processuais
-            if hasattr(processo, 'movimento'):
+            if hasattr(processo, 'movimento') and incluir('movimentacoes'):
                 logger.debug("Processando movimentações do processo")
                 movs = processo.movimento if isinstance(processo.movimento, list) else [processo.movimento]
                 
@@ -486,7 +513,7 @@ def extract_capa_processo(resposta):
                     
                     dados_processo['movimentacoes'].append(mov_info)
             else:
-                logger.debug("Processo não possui atributo movimento")
+                logger.debug("Processo sem movimentações ou seção não solicitada")
             
             dados['processo'] = dados_processo
             logger.debug(f"Dados da capa extraídos: {dados}")